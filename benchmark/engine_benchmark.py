@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Network engine benchmark for distributed-compute-locally
+
+Compares the coordinator's two network engines ("thread" and "selector")
+with many simulated workers. A separate process opens one connection per
+simulated worker, registers them all at once (a registration storm) and
+then answers every task assignment with an immediate result, so the
+numbers measure the coordinator's networking rather than task execution.
+
+For each engine and worker count it reports how long the registration
+storm took, map() throughput with trivial tasks, and how many threads
+the coordinator process used.
+
+Usage:
+    python3 engine_benchmark.py [num_tasks]    # default: 20,000 tasks per run
+"""
+
+import multiprocessing
+import selectors
+import socket
+import sys
+import threading
+import time
+
+import logging
+logging.disable(logging.CRITICAL)  # Suppress coordinator log noise
+
+from distributed_compute import Coordinator
+from distributed_compute.protocol import Protocol, MessageType, FrameDecoder
+
+# ── Config ───────────────────────────────────────────────────────────────────
+NUM_TASKS = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+WORKER_COUNTS = [10, 100, 500, 1000]
+ENGINES = ["thread", "selector"]
+SLOTS_PER_WORKER = 4
+BASE_PORT = 5700
+
+
+def noop(x):
+    return x
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SIMULATED WORKERS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def send(sock, message_type, payload):
+    """Send one message on a non-blocking socket."""
+    sock.setblocking(True)
+    try:
+        Protocol.send_message(sock, message_type, payload)
+    finally:
+        sock.setblocking(False)
+
+
+def run_simulated_workers(port, num_workers, done):
+    """
+    Connect num_workers simulated workers and serve them until done is set.
+
+    Every task is answered with None straight away; results are sent as one
+    RESULT_BATCH per received message, like a worker's result batcher.
+    """
+    selector = selectors.DefaultSelector()
+    worker_ids = {}
+
+    # Registration storm: connect and register every worker before reading any reply
+    for i in range(num_workers):
+        sock = socket.create_connection(("localhost", port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        Protocol.send_message(sock, MessageType.REGISTER_WORKER, {
+            "name": f"sim-{i}",
+            "max_concurrent_tasks": SLOTS_PER_WORKER,
+            "prefetch_depth": SLOTS_PER_WORKER,
+            "cpu_count": 1,
+            "memory_total": 1 << 30,
+            "memory_available": 1 << 30,
+            "codecs": ["zlib"],
+        })
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ, FrameDecoder())
+
+    while not done.is_set():
+        for key, _ in selector.select(timeout=0.2):
+            sock, decoder = key.fileobj, key.data
+            try:
+                messages = decoder.receive(sock)
+            except (ConnectionError, OSError):
+                selector.unregister(sock)
+                sock.close()
+                continue
+
+            tasks = []
+            for message_type, payload in messages:
+                if message_type == MessageType.WORKER_REGISTERED:
+                    worker_ids[sock] = payload["worker_id"]
+                elif message_type == MessageType.TASK_ASSIGNMENT:
+                    tasks.append(payload)
+                elif message_type == MessageType.TASK_BATCH:
+                    tasks.extend(payload["tasks"])
+                elif message_type == MessageType.SHUTDOWN:
+                    done.set()
+
+            if tasks:
+                results = [(MessageType.TASK_RESULT, {
+                    "task_id": task["task_id"],
+                    "result": None,
+                    "worker_id": worker_ids[sock],
+                    "execution_time": 0.0,
+                }) for task in tasks]
+                try:
+                    send(sock, MessageType.RESULT_BATCH, {"results": results})
+                except OSError:
+                    pass
+
+    for key in list(selector.get_map().values()):
+        key.fileobj.close()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BENCHMARK
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def run_engine(engine, num_workers, port):
+    """Returns (registration seconds, tasks/s, coordinator threads)."""
+    coordinator = Coordinator(port=port, engine=engine)
+    coordinator.start_server()
+
+    done = multiprocessing.Event()
+    simulator = multiprocessing.Process(
+        target=run_simulated_workers, args=(port, num_workers, done), daemon=True
+    )
+    start = time.perf_counter()
+    simulator.start()
+    while len(coordinator.workers) < num_workers:
+        time.sleep(0.001)
+    registration_time = time.perf_counter() - start
+    threads = threading.active_count()
+
+    start = time.perf_counter()
+    results = coordinator.map(noop, range(NUM_TASKS), timeout=600)
+    rate = NUM_TASKS / (time.perf_counter() - start)
+    assert len(results) == NUM_TASKS
+
+    coordinator.stop_server()
+    done.set()
+    simulator.join(timeout=10)
+    return registration_time, rate, threads
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════════════════════
+
+if __name__ == "__main__":
+    print("\n" + "=" * 68)
+    print("  COORDINATOR NETWORK ENGINE BENCHMARK")
+    print("=" * 68)
+    print(f"  Tasks per run: {NUM_TASKS:,}  |  Slots per simulated worker: {SLOTS_PER_WORKER}")
+    print(f"\n  {'Workers':>8} {'Engine':>9} {'Registration':>13} {'Throughput':>14} {'Threads':>8}")
+    print(f"  {'─'*8} {'─'*9} {'─'*13} {'─'*14} {'─'*8}")
+
+    port = BASE_PORT
+    for num_workers in WORKER_COUNTS:
+        for engine in ENGINES:
+            registration_time, rate, threads = run_engine(engine, num_workers, port)
+            port += 1
+            print(f"  {num_workers:>8} {engine:>9} {registration_time:>12.2f}s "
+                  f"{rate:>10,.0f}/s {threads:>8}")
+
+    print(f"{'='*68}\n")
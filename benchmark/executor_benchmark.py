@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Execution backend benchmark for distributed-compute-locally
+
+Measures the per-task overhead of a worker's execution backends on the
+workloads of benchmark.py, plus a no-op task that is nothing but overhead.
+Each backend runs one task at a time on a single worker, so the time
+beyond the sequential baseline is what the backend adds per task:
+
+  thread        — tasks run on a thread in the worker process
+  process       — warm child processes that keep functions and imports
+  process-cold  — a fresh child for every task (max_tasks_per_child=1),
+                  paying process startup and function unpickling each time
+
+Usage:
+    python3 executor_benchmark.py [num_tasks]    # default: 8 tasks per workload
+"""
+
+import sys
+import time
+
+import logging
+logging.disable(logging.CRITICAL)  # Suppress coordinator/worker log noise
+
+from distributed_compute import Coordinator, Worker
+from benchmark import nas_ep_task, mandelbrot_task, sha256_task
+
+# ── Config ───────────────────────────────────────────────────────────────────
+NUM_TASKS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+NUM_NOOP_TASKS = 2000
+BASE_PORT = 5800
+
+BACKENDS = [
+    ("thread", {"executor": "thread"}),
+    ("process", {"executor": "process"}),
+    ("process-cold", {"executor": "process", "max_tasks_per_child": 1}),
+]
+
+
+def noop_task(x):
+    return x
+
+
+def run_sequential(func, tasks):
+    start = time.perf_counter()
+    for t in tasks:
+        func(t)
+    return time.perf_counter() - start
+
+
+def run_backend(func, tasks, port, options):
+    """Returns the seconds one single-slot worker with the given backend takes."""
+    coordinator = Coordinator(port=port)
+    coordinator.start_server()
+    worker = Worker("localhost", port, max_concurrent_tasks=1, prefetch_depth=1, **options)
+    worker.start()
+    while len(coordinator.workers) < 1:
+        time.sleep(0.01)
+
+    start = time.perf_counter()
+    coordinator.map(func, tasks, timeout=600)
+    elapsed = time.perf_counter() - start
+
+    coordinator.stop_server()
+    worker.stop()
+    return elapsed
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════════════════════
+
+if __name__ == "__main__":
+    workloads = [
+        ("No-op", noop_task, list(range(NUM_NOOP_TASKS))),
+        ("NAS EP", nas_ep_task, list(range(NUM_TASKS))),
+        ("Mandelbrot", mandelbrot_task, list(range(NUM_TASKS))),
+        ("SHA-256 Search", sha256_task, list(range(NUM_TASKS))),
+    ]
+
+    print("\n" + "=" * 68)
+    print("  EXECUTION BACKEND OVERHEAD BENCHMARK")
+    print("=" * 68)
+    print(f"  Tasks per workload: {NUM_TASKS} ({NUM_NOOP_TASKS:,} for no-op)  |  One task at a time")
+    print(f"\n  {'Workload':<16} {'Backend':<13} {'Time':>9} {'Overhead/task':>15}")
+    print(f"  {'─'*16} {'─'*13} {'─'*9} {'─'*15}")
+
+    port = BASE_PORT
+    for name, func, tasks in workloads:
+        baseline = run_sequential(func, tasks)
+        print(f"  {name:<16} {'sequential':<13} {baseline:>8.2f}s {'':>15}")
+        for backend, options in BACKENDS:
+            elapsed = run_backend(func, tasks, port, options)
+            port += 1
+            overhead_ms = (elapsed - baseline) / len(tasks) * 1000
+            print(f"  {'':<16} {backend:<13} {elapsed:>8.2f}s {overhead_ms:>12.2f} ms")
+
+    print(f"{'='*68}\n")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Scheduler micro-benchmark for distributed-compute-locally
+
+Measures how many task assignments per second the coordinator's scheduler
+makes as the number of workers grows. No sockets are involved: simulated
+workers are registered directly and the assignments they are sent are
+discarded. Every run is compared with the previous scheduler, which
+re-sorted all workers after every assignment.
+
+Usage:
+    python3 scheduler_benchmark.py [num_tasks]    # default: 100,000 tasks
+"""
+
+import sys
+import time
+
+import logging
+logging.disable(logging.CRITICAL)  # Suppress coordinator log noise
+
+from distributed_compute import Coordinator
+from distributed_compute.coordinator import WorkerInfo
+from distributed_compute.job import Job
+from distributed_compute.task import Task, TaskStatus
+
+# ── Config ───────────────────────────────────────────────────────────────────
+NUM_TASKS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+WORKER_COUNTS = [1, 10, 100, 500, 1000]
+SLOTS_PER_WORKER = 4
+# The old scheduler is too slow to run on the full task count with many workers
+LEGACY_TASK_LIMIT = 20_000
+
+
+def square(x):
+    return x * x
+
+
+def make_coordinator(num_workers, num_tasks):
+    """Coordinator with simulated workers and a queue of num_tasks tasks."""
+    coordinator = Coordinator(port=0)
+    func_hash = coordinator.function_registry.register(square)
+
+    # Enough prefetch capacity that a single distribution pass assigns everything
+    prefetch = -(-num_tasks // num_workers)
+    for i in range(num_workers):
+        worker = WorkerInfo(f"worker-{i}", None, f"sim-{i}", SLOTS_PER_WORKER, prefetch=prefetch)
+        coordinator.workers[worker.worker_id] = worker
+        coordinator._worker_index.update(worker)
+
+    job = Job("job-0")
+    coordinator.jobs[job.job_id] = job
+    for i in range(num_tasks):
+        task = Task(func=square, args=(i,), task_id=job.task_id(f"task-{i}"))
+        task.job_id = job.job_id
+        task.func_hash = func_hash
+        coordinator.task_queue.push(job, task)
+        coordinator.pending_tasks[task.task_id] = task
+    return coordinator
+
+
+def legacy_distribute(coordinator):
+    """The previous scheduler: re-sort every worker after each assignment."""
+    available_workers = [
+        w for w in coordinator.workers.values()
+        if w.is_alive and w.current_tasks < w.capacity
+    ]
+    available_workers.sort(key=lambda w: w.current_tasks / w.max_tasks)
+
+    assignments = {}
+    while coordinator.task_queue and available_workers:
+        task = coordinator.task_queue.pop()
+        worker = available_workers[0]
+        task.status = TaskStatus.ASSIGNED
+        task.worker_id = worker.worker_id
+        worker.in_flight[task.task_id] = task
+        assignments.setdefault(worker.worker_id, (worker, []))[1].append(task)
+
+        available_workers.sort(key=lambda w: w.current_tasks / w.max_tasks)
+        available_workers = [w for w in available_workers if w.current_tasks < w.capacity]
+
+    for worker, tasks in assignments.values():
+        coordinator._send_tasks(worker, tasks)
+
+
+def measure(distribute, num_workers, num_tasks):
+    """Assignments per second for one distribution pass."""
+    coordinator = make_coordinator(num_workers, num_tasks)
+    start = time.perf_counter()
+    distribute(coordinator)
+    elapsed = time.perf_counter() - start
+    assert not coordinator.task_queue
+    return num_tasks / elapsed
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════════════════════
+
+if __name__ == "__main__":
+    legacy_tasks = min(NUM_TASKS, LEGACY_TASK_LIMIT)
+
+    print("\n" + "=" * 60)
+    print("  SCHEDULER MICRO-BENCHMARK")
+    print("=" * 60)
+    print(f"  Tasks: {NUM_TASKS:,} (old scheduler: {legacy_tasks:,})  |  Slots per worker: {SLOTS_PER_WORKER}")
+    print(f"\n  {'Workers':>8} {'Heap index':>16} {'Old (re-sort)':>16} {'Speedup':>9}")
+    print(f"  {'─'*8} {'─'*16} {'─'*16} {'─'*9}")
+
+    for num_workers in WORKER_COUNTS:
+        rate = measure(lambda c: c._distribute_tasks(), num_workers, NUM_TASKS)
+        legacy_rate = measure(legacy_distribute, num_workers, legacy_tasks)
+        print(f"  {num_workers:>8} {rate:>12,.0f}/s {legacy_rate:>12,.0f}/s {rate / legacy_rate:>8.1f}x")
+
+    print(f"{'='*60}\n")
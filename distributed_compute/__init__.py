@@ -4,6 +4,7 @@ DistributedCompute - A library for distributing computational workloads across m
 
 from .coordinator import Coordinator
 from .worker import Worker
+from .objects import ObjectRef
 from .exceptions import (
     DistributedComputeError,
     WorkerConnectionError,
@@ -15,6 +16,7 @@ __version__ = "0.1.7"
 __all__ = [
     "Coordinator",
     "Worker",
+    "ObjectRef",
     "DistributedComputeError",
     "WorkerConnectionError",
     "TaskExecutionError",
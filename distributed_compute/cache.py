@@ -0,0 +1,292 @@
+"""
+Coordinator-side memoization of task results.
+"""
+
+import hashlib
+import os
+import threading
+import types
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+import cloudpickle
+
+
+class _CanonicalSet(tuple):
+    """The elements of a set in a canonical order, standing in for the set in item keys."""
+
+    __slots__ = ()
+
+
+class _CanonicalFrozenset(_CanonicalSet):
+    __slots__ = ()
+
+
+def _canonical(item: Any) -> Any:
+    """
+    Replace the sets and frozensets inside an item with canonically ordered tuples.
+
+    Set iteration order depends on string hash randomization, so the same
+    set pickles differently in different processes. Only built-in
+    containers are walked; sets inside other objects still pickle in
+    process-specific order, and such items miss the on-disk store after a
+    coordinator restart.
+    """
+    item_type = type(item)
+    if item_type is set or item_type is frozenset:
+        elements = sorted((_canonical(element) for element in item), key=cloudpickle.dumps)
+        return (_CanonicalSet if item_type is set else _CanonicalFrozenset)(elements)
+    if item_type is list or item_type is tuple:
+        return item_type(_canonical(element) for element in item)
+    if item_type is dict:
+        return {_canonical(key): _canonical(value) for key, value in item.items()}
+    return item
+
+
+def _global_names(code: types.CodeType) -> set:
+    """Names a code object and the code nested in it may look up as globals."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+
+def _hash_code(code: types.CodeType, digest):
+    """Hash what a code object does, leaving out its file name and line numbers."""
+    digest.update(code.co_code)
+    digest.update(repr((
+        code.co_name, code.co_argcount, code.co_kwonlyargcount, code.co_flags,
+        code.co_names, code.co_varnames, code.co_freevars, code.co_cellvars,
+    )).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _hash_code(const, digest)
+        else:
+            digest.update(cloudpickle.dumps(_canonical(const)))
+
+
+def _hash_value(value: Any, digest, seen: set):
+    """Hash a value a function refers to, following functions and classes by their contents."""
+    if isinstance(value, types.FunctionType):
+        _hash_function(value, digest, seen)
+    elif isinstance(value, types.ModuleType):
+        digest.update(value.__name__.encode())
+    elif isinstance(value, type):
+        digest.update(value.__qualname__.encode())
+        if id(value) in seen or value.__module__ == "builtins":
+            return
+        seen.add(id(value))
+        for name, attribute in sorted(vars(value).items()):
+            if isinstance(attribute, (types.FunctionType, classmethod, staticmethod, property)):
+                digest.update(name.encode())
+                _hash_value(getattr(attribute, "__func__", getattr(attribute, "fget", attribute)), digest, seen)
+    else:
+        digest.update(cloudpickle.dumps(_canonical(value)))
+
+
+def _hash_function(func: types.FunctionType, digest, seen: set):
+    """Hash a function by its code, defaults, closure and the globals it references."""
+    digest.update(func.__qualname__.encode())
+    if id(func) in seen:
+        return  # Recursion
+    seen.add(id(func))
+
+    _hash_code(func.__code__, digest)
+    _hash_value(func.__defaults__, digest, seen)
+    _hash_value(func.__kwdefaults__, digest, seen)
+    for cell in func.__closure__ or ():
+        try:
+            _hash_value(cell.cell_contents, digest, seen)
+        except ValueError:
+            pass  # Empty cell
+    for name in sorted(_global_names(func.__code__)):
+        if name in func.__globals__:
+            digest.update(name.encode())
+            _hash_value(func.__globals__[name], digest, seen)
+
+
+class ResultCache:
+    """
+    Results of earlier tasks, keyed by a hash of the function and the item.
+
+    Results are kept pickled, so every hit returns a fresh copy that callers
+    may modify. The in-memory LRU holds max_entries results. With a
+    directory, they are also written to an on-disk store of files named by
+    their key, bounded to max_disk_bytes with the least recently used files
+    evicted first, so results survive coordinator restarts. Only successful
+    results that can be pickled are stored.
+    """
+
+    def __init__(self, max_entries: int = 10000, directory: Optional[str] = None,
+                 max_disk_bytes: int = 1024 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of results to keep in memory
+            directory: Directory of the on-disk store, or None to keep results in memory only
+            max_disk_bytes: Maximum total size of the on-disk store (default: 1GB)
+        """
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()  # key -> pickled result
+        self._files = OrderedDict()  # key -> size of its file, least recently used first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._scan()
+
+    @staticmethod
+    def function_key(func: Callable, func_hash: str) -> str:
+        """
+        Hash a task function for use in result keys.
+
+        The serialized function is no stable key: it names the module the
+        function was loaded as, and holds constant sets in a process-specific
+        order, while functions serialized by reference have the same blob
+        whatever their code. Plain functions are therefore hashed by their
+        code, defaults, closure and referenced globals, following the
+        functions and classes they use, so that only edits change the key.
+        Other callables, and functions referencing values that cannot be
+        pickled, are keyed by their serialized blob's hash.
+        """
+        if isinstance(func, types.FunctionType):
+            digest = hashlib.sha256()
+            try:
+                _hash_function(func, digest, set())
+                return digest.hexdigest()
+            except Exception:
+                pass
+        return hashlib.sha256(func_hash.encode()).hexdigest()
+
+    @staticmethod
+    def key(function_key: str, item: Any) -> str:
+        """Return the key of the result of applying a function to an item."""
+        return hashlib.sha256(function_key.encode() + cloudpickle.dumps(_canonical(item))).hexdigest()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Look up a result. Returns (found, result)."""
+        with self._lock:
+            blob = self._results.get(key)
+            if blob is not None:
+                self._results.move_to_end(key)
+            on_disk = key in self._files
+
+        if blob is None and on_disk:
+            try:
+                with open(self._path(key), "rb") as f:
+                    blob = f.read()
+            except OSError:
+                with self._lock:
+                    self._forget_file(key)
+            else:
+                with self._lock:
+                    if key in self._files:
+                        self._files.move_to_end(key)
+                    self._remember(key, blob)
+
+        if blob is not None:
+            try:
+                result = cloudpickle.loads(blob)
+            except Exception:
+                pass  # E.g. a class of the result can no longer be imported
+            else:
+                with self._lock:
+                    self.hits += 1
+                return True, result
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def put(self, key: str, result: Any):
+        """Store a result in memory and, if there is a directory, on disk."""
+        try:
+            blob = cloudpickle.dumps(result)
+        except Exception:
+            return  # Unpicklable results are not cached
+
+        with self._lock:
+            self._remember(key, blob)
+            if not self.directory or key in self._files:
+                return
+        if len(blob) > self.max_disk_bytes:
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial file
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(blob)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            if key not in self._files:
+                self._files[key] = len(blob)
+                self._disk_bytes += len(blob)
+            self._evict()
+
+    def get_stats(self) -> dict:
+        """Get the cache's size and hit counts."""
+        with self._lock:
+            return {
+                "entries": len(self._results),
+                "disk_entries": len(self._files),
+                "disk_bytes": self._disk_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _remember(self, key: str, blob: bytes):
+        """Add a pickled result to the in-memory LRU. Lock held."""
+        self._results[key] = blob
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def _evict(self):
+        """Remove the least recently used files until the store fits max_disk_bytes. Lock held."""
+        while self._disk_bytes > self.max_disk_bytes:
+            oldest = next(iter(self._files))
+            self._forget_file(oldest)
+            try:
+                os.remove(self._path(oldest))
+            except OSError:
+                pass
+
+    def _forget_file(self, key: str):
+        """Drop a file from the disk index. Lock held."""
+        size = self._files.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _scan(self):
+        """Index the files of an existing store, least recently modified first."""
+        files = []
+        for prefix in os.listdir(self.directory):
+            subdirectory = os.path.join(self.directory, prefix)
+            if not os.path.isdir(subdirectory):
+                continue
+            for name in os.listdir(subdirectory):
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(subdirectory, name))
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, name, stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._files[key] = size
+            self._disk_bytes += size
+        self._evict()
@@ -12,6 +12,7 @@ import time
 import threading
 import os
 import logging
+import hashlib
 import importlib.util
 from datetime import datetime
 from distributed_compute import Coordinator, Worker
@@ -103,14 +104,14 @@ def animate_text(text, color=Colors.CYAN, delay=0.03):
     print()
 
 
-def run_coordinator_cli(port=5555, password=None):
+def run_coordinator_cli(port=5555, password=None, engine="thread", cache_dir=None):
     """Run coordinator with beautiful CLI monitoring."""
     print_logo()
     
     print(f"{Colors.BOLD}Coordinator Mode{Colors.RESET}\n")
     print(f"{Colors.GRAY}→{Colors.RESET} Initializing", end='', flush=True)
     
-    coordinator = Coordinator(port=port, verbose=False, password=password)
+    coordinator = Coordinator(port=port, verbose=False, password=password, engine=engine, cache_dir=cache_dir)
     coordinator.start_server()
     
     for _ in range(3):
@@ -165,7 +166,8 @@ def _load_task_module(path: str):
     if not os.path.isfile(path):
         raise FileNotFoundError(f"File not found: {path}")
 
-    module_name = f"distcompute_task_{int(time.time() * 1000)}"
+    # Named after the file, so that reloading it gives its functions the same identity
+    module_name = f"distcompute_task_{hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:12]}"
     spec = importlib.util.spec_from_file_location(module_name, path)
     if not spec or not spec.loader:
         raise ImportError(f"Unable to load module from {path}")
@@ -263,22 +265,45 @@ def _interactive_prompt_loop(coordinator: Coordinator, stop_event: threading.Eve
                         worker_table.add_column("CPU %", justify="right")
                         worker_table.add_column("Tasks Done", justify="right")
                         worker_table.add_column("Active", justify="right")
+                        worker_table.add_column("Slots Busy", justify="right")
+                        worker_table.add_column("Queued", justify="right")
                         
                         for w in stats['worker_details']:
                             cpu = f"{w.get('cpu_percent', 0):.1f}%"
                             tasks = str(w.get('tasks_completed', 0))
                             active = str(w.get('current_tasks', 0))
-                            worker_table.add_row(w['name'], cpu, tasks, active)
+                            slots = f"{w.get('running_tasks', 0)}/{w.get('max_tasks', 0)}"
+                            queued = str(w.get('queued_tasks', 0))
+                            worker_table.add_row(w['name'], cpu, tasks, active, slots, queued)
                         
                         console.print(worker_table)
+                    
+                    # Show jobs that are still running
+                    if stats.get('jobs'):
+                        console.print()
+                        job_table = Table(title="Active Jobs", show_header=True, header_style="bold cyan")
+                        job_table.add_column("Job", style="cyan")
+                        job_table.add_column("Weight", justify="right")
+                        job_table.add_column("Queued", justify="right")
+                        job_table.add_column("Running", justify="right")
+                        job_table.add_column("Done", justify="right")
+                        
+                        for j in stats['jobs']:
+                            job_table.add_row(
+                                j['job_id'], f"{j['weight']:g}", str(j['tasks_queued']),
+                                str(j['tasks_running']), str(j['tasks_completed'])
+                            )
+                        
+                        console.print(job_table)
                     console.print()
                 else:
-                    print(f"Workers: {stats['workers']}, Pending: {stats['tasks_pending']}, Completed: {stats['tasks_completed']}")
+                    print(f"Workers: {stats['workers']}, Pending: {stats['tasks_pending']}, Completed: {stats['tasks_completed']}, Jobs: {len(stats['jobs'])}")
                 continue
             if raw == "help":
                 if console:
                     console.print(Panel(
                         "[cyan bold]run <file.py>[/cyan bold] - Execute a task file across workers\n"
+                        "[cyan bold]run <file.py> --cache[/cyan bold] - Reuse results of earlier runs\n"
                         "[cyan bold]status[/cyan bold]        - Show cluster status\n"
                         "[cyan bold]help[/cyan bold]          - Show this help message\n"
                         "[cyan bold]exit[/cyan bold]          - Shutdown coordinator",
@@ -288,12 +313,16 @@ def _interactive_prompt_loop(coordinator: Coordinator, stop_event: threading.Eve
                 else:
                     print(f"\n{Colors.BOLD}Available commands:{Colors.RESET}")
                     print(f"  {Colors.CYAN}run <file.py>{Colors.RESET} - Execute a task file across workers")
+                    print(f"  {Colors.CYAN}run <file.py> --cache{Colors.RESET} - Reuse results of earlier runs")
                     print(f"  {Colors.CYAN}status{Colors.RESET}        - Show cluster status")
                     print(f"  {Colors.CYAN}help{Colors.RESET}          - Show this help message")
                     print(f"  {Colors.CYAN}exit{Colors.RESET}          - Shutdown coordinator\n")
                 continue
             if raw.startswith("run "):
                 path = raw.split(" ", 1)[1].strip()
+                cache = path.endswith(" --cache")
+                if cache:
+                    path = path[:-len(" --cache")].strip()
                 try:
                     task_func, iterable = _load_task_module(path)
                     workers = coordinator.get_stats()['workers']
@@ -301,7 +330,7 @@ def _interactive_prompt_loop(coordinator: Coordinator, stop_event: threading.Eve
                         console.print(f"[cyan]Running {path} across {workers} worker(s)...[/cyan]")
                     else:
                         print(f"{Colors.CYAN}Running {path} across {workers} workers...{Colors.RESET}")
-                    results = coordinator.map(task_func, list(iterable))
+                    results = list(coordinator.imap(task_func, iterable, cache=cache))
                     if console:
                         console.print(f"[green]✓[/green] Results: {results}\n")
                     else:
@@ -353,7 +382,7 @@ def _use_prompt_toolkit() -> bool:
     return True
 
 
-def run_worker_cli(host='localhost', port=5555, name=None, password=None):
+def run_worker_cli(host='localhost', port=5555, name=None, password=None, executor='thread'):
     """Run worker with beautiful CLI monitoring."""
     print_logo()
     
@@ -365,9 +394,9 @@ def run_worker_cli(host='localhost', port=5555, name=None, password=None):
     worker = Worker(
         coordinator_host=host,
         coordinator_port=port,
-        max_concurrent_tasks=2,
         name=worker_name,
-        password=password
+        password=password,
+        executor=executor
     )
     
     worker_thread = threading.Thread(target=worker.start, daemon=True)
@@ -599,11 +628,14 @@ def print_usage():
     print_header("🖥️  DISTRIBUTED COMPUTE CLI")
     
     print(f"{Colors.BOLD}USAGE:{Colors.RESET}")
-    print(f"  {Colors.CYAN}distcompute coordinator [port] [--password <password>]{Colors.RESET}")
+    print(f"  {Colors.CYAN}distcompute coordinator [port] [--password <password>] [--engine <type>] [--cache-dir <dir>]{Colors.RESET}")
     print(f"    Start coordinator with live monitoring")
+    print(f"    Engine: thread (default), selector (one event loop for thousands of workers)")
+    print(f"    Cache dir: keep results of 'run <file.py> --cache' on disk across restarts")
     print()
-    print(f"  {Colors.CYAN}distcompute worker <host> [port] [name] [--password <password>]{Colors.RESET}")
+    print(f"  {Colors.CYAN}distcompute worker <host> [port] [name] [--password <password>] [--executor <type>]{Colors.RESET}")
     print(f"    Start worker and connect to coordinator (host defaults to localhost)")
+    print(f"    Executor: thread (default), process (one child per CPU core), inline")
     print()
     print(f"  {Colors.CYAN}distcompute demo{Colors.RESET}")
     print(f"    Run interactive demo with live monitoring")
@@ -623,6 +655,9 @@ def print_usage():
     print(f"  {Colors.DIM}# Start worker with password{Colors.RESET}")
     print(f"  distcompute worker 192.168.1.100 5555 my-worker --password mySecretPass123")
     print()
+    print(f"  {Colors.DIM}# Start worker that uses every CPU core for CPU-bound tasks{Colors.RESET}")
+    print(f"  distcompute worker 192.168.1.100 --executor process")
+    print()
     print(f"  {Colors.DIM}# Run demo{Colors.RESET}")
     print(f"  distcompute demo")
     print()
@@ -639,6 +674,8 @@ def main():
         if command == "coordinator":
             port = 5555
             password = None
+            engine = "thread"
+            cache_dir = None
             
             # Parse arguments
             args = sys.argv[2:]
@@ -647,6 +684,12 @@ def main():
                 if args[i] == "--password" and i + 1 < len(args):
                     password = args[i + 1]
                     i += 2
+                elif args[i] == "--engine" and i + 1 < len(args):
+                    engine = args[i + 1]
+                    i += 2
+                elif args[i] == "--cache-dir" and i + 1 < len(args):
+                    cache_dir = args[i + 1]
+                    i += 2
                 elif args[i].startswith("--"):
                     i += 1  # Skip unknown flags
                 else:
@@ -657,13 +700,14 @@ def main():
                         pass
                     i += 1
             
-            run_coordinator_cli(port, password)
+            run_coordinator_cli(port, password, engine, cache_dir)
         
         elif command == "worker":
             host = "localhost"
             port = 5555
             name = None
             password = None
+            executor = "thread"
             
             # Parse arguments
             args = sys.argv[2:]
@@ -673,6 +717,9 @@ def main():
                 if args[i] == "--password" and i + 1 < len(args):
                     password = args[i + 1]
                     i += 2
+                elif args[i] == "--executor" and i + 1 < len(args):
+                    executor = args[i + 1]
+                    i += 2
                 elif args[i].startswith("--"):
                     i += 1  # Skip unknown flags
                 else:
@@ -690,7 +737,7 @@ def main():
             if len(positional) > 2:
                 name = positional[2]
             
-            run_worker_cli(host, port, name, password)
+            run_worker_cli(host, port, name, password, executor)
         
         elif command == "demo":
             run_demo_with_monitoring()
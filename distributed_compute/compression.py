@@ -0,0 +1,302 @@
+"""
+Compression codecs and per-connection adaptive codec selection.
+"""
+
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import lz4.frame as _lz4
+except ImportError:
+    _lz4 = None
+
+try:
+    import zstandard as _zstd
+except ImportError:
+    _zstd = None
+
+
+# Messages smaller than this are never compressed adaptively (16KB)
+MIN_ADAPTIVE_SIZE = 16 * 1024
+# Exploration compresses with a non-optimal option; only do it on messages up to 1MB
+MAX_EXPLORE_SIZE = 1024 * 1024
+# Every Nth eligible message re-measures another option
+EXPLORE_INTERVAL = 16
+# Send windows that push less than this through the link say nothing about its speed (64KB)
+MIN_LINK_SAMPLE_SIZE = 64 * 1024
+# Assumed link speed until one has been measured (100 Mbit/s)
+DEFAULT_LINK_SPEED = 12.5 * 1024 * 1024
+# Weight of the newest sample in the moving averages
+EWMA_ALPHA = 0.3
+
+
+class Codec:
+    """A compression algorithm that can be negotiated between peers."""
+
+    name = None
+    codec_id = None  # Stored in the frame flags; 0 keeps frames readable by older peers
+    default_level = None
+    levels = ()  # Levels the adaptive selector chooses between
+
+    def compress(self, data, level: int) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data) -> bytes:
+        raise NotImplementedError
+
+
+class ZlibCodec(Codec):
+    name = "zlib"
+    codec_id = 0
+    default_level = 6
+    levels = (1, 6, 9)
+
+    def compress(self, data, level: int) -> bytes:
+        return zlib.compress(data, level)
+
+    def decompress(self, data) -> bytes:
+        return zlib.decompress(data)
+
+
+class Lz4Codec(Codec):
+    name = "lz4"
+    codec_id = 1
+    default_level = 0
+    levels = (0,)
+
+    def compress(self, data, level: int) -> bytes:
+        return _lz4.compress(data, compression_level=level)
+
+    def decompress(self, data) -> bytes:
+        return _lz4.decompress(data)
+
+
+class ZstdCodec(Codec):
+    name = "zstd"
+    codec_id = 2
+    default_level = 3
+    levels = (1, 9)
+
+    def compress(self, data, level: int) -> bytes:
+        return _zstd.ZstdCompressor(level=level).compress(data)
+
+    def decompress(self, data) -> bytes:
+        return _zstd.ZstdDecompressor().decompress(data)
+
+
+CODECS: Dict[str, Codec] = {ZlibCodec.name: ZlibCodec()}
+if _lz4 is not None:
+    CODECS[Lz4Codec.name] = Lz4Codec()
+if _zstd is not None:
+    CODECS[ZstdCodec.name] = ZstdCodec()
+
+CODECS_BY_ID: Dict[int, Codec] = {codec.codec_id: codec for codec in CODECS.values()}
+
+# A compression option is a (codec name, level) pair
+Option = Tuple[str, int]
+
+
+def available_codecs() -> List[str]:
+    """Names of the codecs importable here, fastest first."""
+    preference = ["zstd", "lz4", "zlib"]
+    return [name for name in preference if name in CODECS]
+
+
+def negotiate_codecs(local: List[str], remote: List[str]) -> List[str]:
+    """Codecs supported by both peers, in local preference order. zlib is always included."""
+    common = [name for name in local if name in remote and name in CODECS]
+    if "zlib" not in common:
+        common.append("zlib")
+    return common
+
+
+def parse_option(name: str) -> Optional[Option]:
+    """
+    Parse a compression option such as "zlib", "zlib-9", "lz4" or "zstd-1".
+
+    Returns:
+        (codec name, level), or None for "none"
+
+    Raises:
+        ValueError: If the codec is unknown
+    """
+    if name == "none":
+        return None
+    codec_name, _, level = name.partition("-")
+    codec = CODECS.get(codec_name)
+    if codec is None:
+        if codec_name in ("lz4", "zstd"):
+            raise ValueError(f"Compression codec '{codec_name}' is not installed")
+        raise ValueError(f"Unknown compression option '{name}'")
+    return codec_name, int(level) if level else codec.default_level
+
+
+def validate_option(name: Optional[str]):
+    """Raise ValueError unless name is None, "auto", "none" or a known codec option."""
+    if name is None or name == "auto":
+        return
+    parse_option(name)
+
+
+def compress(data, option: Option) -> Tuple[bytes, int]:
+    """
+    Compress data with an option.
+
+    Returns:
+        (compressed data, codec id)
+    """
+    codec = CODECS[option[0]]
+    return codec.compress(data, option[1]), codec.codec_id
+
+
+def decompress(data, codec_id: int) -> bytes:
+    """Decompress data produced by the codec with the given id."""
+    codec = CODECS_BY_ID.get(codec_id)
+    if codec is None:
+        raise ValueError(f"Received data compressed with unsupported codec id {codec_id}")
+    return codec.decompress(data)
+
+
+class AdaptiveCompressor:
+    """
+    Chooses a compression option per message for one connection.
+
+    Keeps moving averages of each option's compression ratio and speed, and
+    of the link speed. A write returns as soon as the data is in the
+    socket's send buffer, so the link is measured over windows of
+    back-to-back writes: everything written beyond what the send buffer
+    absorbs had to cross the link while the window was open. A message is compressed with
+    the option that minimizes the estimated compress-and-transmit time. On a
+    fast LAN that is usually no compression at all, and on a slow link it is
+    the strongest codec. Incompressible data never wins because its ratio
+    stays near 1.
+    """
+
+    def __init__(self, codecs: Optional[List[str]] = None, send_buffer: int = 0):
+        """
+        Initialize the compressor.
+
+        Args:
+            codecs: Negotiated codec names (default: every codec available locally)
+            send_buffer: Size of the connection's socket send buffer in bytes
+        """
+        self.send_buffer = send_buffer
+        self.codecs = [name for name in (codecs or available_codecs()) if name in CODECS]
+        self.options: List[Option] = [
+            (name, level) for name in self.codecs for level in CODECS[name].levels
+        ]
+        self._ratio: Dict[Option, float] = {}  # option -> uncompressed / compressed size
+        self._speed: Dict[Option, float] = {}  # option -> uncompressed bytes per second
+        self._link_speed: Optional[float] = None  # bytes per second on the wire
+        self._window_start: Optional[float] = None  # When the current send window opened
+        self._window_bytes = 0  # Bytes written in the current send window
+        self._eligible = 0
+        self._explore_index = 0
+        self._lock = threading.Lock()
+
+    def resolve(self, name: str) -> Optional[Option]:
+        """Resolve a named option, falling back to zlib if the peer lacks the codec."""
+        option = parse_option(name)
+        if option is not None and option[0] not in self.codecs:
+            return "zlib", CODECS["zlib"].default_level
+        return option
+
+    def choose(self, size: int) -> Optional[Option]:
+        """
+        Pick the option for a message of the given serialized size.
+
+        Returns:
+            (codec name, level), or None to send uncompressed
+        """
+        if size < MIN_ADAPTIVE_SIZE or not self.options:
+            return None
+
+        with self._lock:
+            self._eligible += 1
+            if size <= MAX_EXPLORE_SIZE:
+                # Measure every option once, then keep re-measuring occasionally
+                for option in self.options:
+                    if option not in self._ratio:
+                        return option
+                if self._eligible % EXPLORE_INTERVAL == 0:
+                    self._explore_index = (self._explore_index + 1) % len(self.options)
+                    return self.options[self._explore_index]
+
+            link_speed = self._link_speed or DEFAULT_LINK_SPEED
+            best_option = None
+            best_cost = size / link_speed
+            for option, ratio in self._ratio.items():
+                cost = size / self._speed[option] + size / (ratio * link_speed)
+                if cost < best_cost:
+                    best_option, best_cost = option, cost
+            return best_option
+
+    def record_compression(self, option: Option, original_size: int, compressed_size: int,
+                           seconds: float):
+        """Record how an option performed on one message."""
+        ratio = original_size / max(compressed_size, 1)
+        speed = original_size / max(seconds, 1e-9)
+        with self._lock:
+            self._ratio[option] = _ewma(self._ratio.get(option), ratio)
+            self._speed[option] = _ewma(self._speed.get(option), speed)
+
+    def open_window(self):
+        """Start a send window before writing, unless one is already open."""
+        with self._lock:
+            if self._window_start is None:
+                self._window_start = time.perf_counter()
+                self._window_bytes = 0
+
+    def record_written(self, num_bytes: int):
+        """Count bytes written to the socket in the current send window."""
+        with self._lock:
+            self._window_bytes += num_bytes
+
+    def close_window(self):
+        """End the send window once nothing is left to write, and sample the link speed from it."""
+        with self._lock:
+            if self._window_start is None:
+                return
+            seconds = time.perf_counter() - self._window_start
+            num_bytes = self._window_bytes - self.send_buffer
+            self._window_start = None
+        self.record_send(num_bytes, seconds)
+
+    def record_send(self, num_bytes: int, seconds: float):
+        """Record that num_bytes crossed the link in the given time, to estimate the link speed."""
+        if num_bytes < MIN_LINK_SAMPLE_SIZE or seconds <= 0:
+            return
+        with self._lock:
+            self._link_speed = _ewma(self._link_speed, num_bytes / seconds)
+
+    def get_stats(self) -> dict:
+        """Current estimates, for diagnostics."""
+        with self._lock:
+            return {
+                "codecs": list(self.codecs),
+                "link_speed": self._link_speed,
+                "options": {
+                    f"{name}-{level}": {
+                        "ratio": self._ratio[(name, level)],
+                        "speed": self._speed[(name, level)],
+                    }
+                    for name, level in self._ratio
+                },
+            }
+
+
+def _ewma(previous: Optional[float], sample: float) -> float:
+    if previous is None:
+        return sample
+    return previous + EWMA_ALPHA * (sample - previous)
+
+
+def timed_compress(data, option: Option, compressor: Optional[AdaptiveCompressor]) -> Tuple[bytes, int]:
+    """Compress data and feed the measurement back to the compressor, if any."""
+    start = time.perf_counter()
+    compressed, codec_id = compress(data, option)
+    if compressor is not None:
+        compressor.record_compression(option, len(data), len(compressed), time.perf_counter() - start)
+    return compressed, codec_id
@@ -2,39 +2,120 @@
 Coordinator node implementation.
 """
 
+import inspect
 import socket
 import threading
 import time
 import logging
+import itertools
 from collections import deque
-from typing import List, Callable, Any, Optional
+from typing import List, Callable, Any, Iterable, Iterator, Optional, Tuple, Union
 import queue
 
 from .protocol import Protocol, MessageType
 from .task import Task, TaskStatus
-from .exceptions import TimeoutError as DistributedTimeoutError
+from .job import Job
+from .exceptions import DistributedComputeError, TimeoutError as DistributedTimeoutError
 from .auth import AuthManager
+from .registry import FunctionRegistry
+from .objects import ObjectRef, ObjectStore, find_refs
+from .cache import ResultCache
+from .scheduling import AsyncWorkerIndex, JobQueue, WorkerIndex
+from .selector_engine import SelectorEngine
+from .compression import AdaptiveCompressor, available_codecs, negotiate_codecs, validate_option
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Batches per worker slot when map() is called with chunk_size="auto"
+AUTO_CHUNKS_PER_SLOT = 4
+# Batch size for chunk_size="auto" while no worker has connected yet
+AUTO_CHUNK_SIZE_NO_WORKERS = 16
+# Default imap() window: tasks in flight per worker slot, and the minimum in tasks
+IMAP_TASKS_PER_SLOT = 2
+MIN_IMAP_WINDOW = 64
+# Minimum seconds between scans for work stealing and stragglers once the queue is empty
+REBALANCE_INTERVAL = 0.05
+# A running task is a straggler after SPECULATION_FACTOR times its job's
+# SPECULATION_PERCENTILE task latency, and never before SPECULATION_MIN_TIME seconds
+SPECULATION_PERCENTILE = 0.9
+SPECULATION_FACTOR = 1.5
+SPECULATION_MIN_TIME = 1.0
+# Seconds between checks that some connected worker can run a waiting async job's tasks
+ASYNC_SLOTS_CHECK_INTERVAL = 1.0
+# Maximum number of task assignments packed into one TASK_BATCH frame
+MAX_TASKS_PER_BATCH = 256
+# WorkerInfo attributes that workers report in heartbeats; heartbeats carry only changed ones
+HEARTBEAT_ATTRIBUTES = (
+    "tasks_completed", "tasks_failed", "cpu_percent", "memory_available", "running_tasks", "queued_tasks",
+)
+
 
 class WorkerInfo:
     """Information about a connected worker."""
     
-    def __init__(self, worker_id: str, socket: socket.socket, name: str, max_tasks: int):
+    def __init__(self, worker_id: str, socket: socket.socket, name: str, max_tasks: int,
+                 codecs: Optional[List[str]] = None, prefetch: int = 0, async_slots: int = 0):
         self.worker_id = worker_id
         self.socket = socket
         self.name = name
         self.max_tasks = max_tasks
-        self.current_tasks = 0
+        self.prefetch = prefetch  # Extra tasks kept queued on the worker beyond its slots
+        self.async_slots = async_slots  # Coroutine tasks the worker's event loop runs at once
+        self.async_tasks = 0  # Coroutine tasks among in_flight
+        # Adaptive codec choice for this link
+        self.compressor = AdaptiveCompressor(codecs, send_buffer=Protocol.send_buffer_size(socket))
+        self.in_flight = {}  # task_id -> Task assigned to this worker, in assignment order
         self.tasks_completed = 0
         self.tasks_failed = 0
-        self.last_heartbeat = time.time()
+        self.last_seen = time.time()  # When the last frame of any kind arrived from the worker
         self.cpu_percent = 0.0
         self.memory_available = 0
+        self.running_tasks = 0  # Busy execution slots, as of the last heartbeat
+        self.queued_tasks = 0  # Tasks waiting in the worker's run queue, as of the last heartbeat
         self.is_alive = True
+        self.known_functions = set()  # Function hashes already shipped to this worker
+        self.known_objects = set()  # Shared object hashes already shipped to this worker
+        self.revoking = set()  # Task ids asked back with TASK_REVOKE, awaiting acknowledgement
+        self.outbox = queue.Queue()  # Messages waiting to be written to this worker
+        self.writer = None  # Writer thread (threaded engine)
+        self.on_queued = None  # Called after each queued message (selector engine)
+    
+    def send(self, msg_type: str, payload: dict, compress: Optional[str] = None):
+        """Queue a message; it is written outside the coordinator lock."""
+        self.outbox.put((msg_type, payload, compress))
+        if self.on_queued:
+            self.on_queued(self)
+    
+    def close(self):
+        """Queue the end of the outbox; the connection closes once it has been written."""
+        self.outbox.put(None)
+        if self.on_queued:
+            self.on_queued(self)
+    
+    def add_task(self, task: Task):
+        """Record a task assigned to this worker."""
+        self.in_flight[task.task_id] = task
+        if task.is_async:
+            self.async_tasks += 1
+    
+    def remove_task(self, task_id: str) -> Optional[Task]:
+        """Forget a task that left this worker; returns it, or None if it was not assigned here."""
+        task = self.in_flight.pop(task_id, None)
+        if task is not None and task.is_async:
+            self.async_tasks -= 1
+        return task
+    
+    @property
+    def current_tasks(self) -> int:
+        """Number of tasks assigned to this worker's execution slots that have not finished."""
+        return len(self.in_flight) - self.async_tasks
+    
+    @property
+    def capacity(self) -> int:
+        """Maximum number of tasks assigned to this worker at once, running or queued."""
+        return self.max_tasks + self.prefetch
 
 
 class Coordinator:
@@ -49,6 +130,12 @@ class Coordinator:
         verbose: bool = False,
         worker_timeout: float = 30.0,
         password: Optional[str] = None,
+        engine: str = "thread",
+        task_history: int = 1000,
+        speculation: bool = True,
+        cache_size: int = 10000,
+        cache_dir: Optional[str] = None,
+        cache_max_bytes: int = 1024 * 1024 * 1024,
     ):
         """
         Initialize the coordinator.
@@ -59,11 +146,26 @@ class Coordinator:
             verbose: Enable verbose logging
             worker_timeout: Seconds before marking a worker as dead
             password: Optional password for worker authentication
+            engine: Network engine: "thread" (default) runs one thread per worker
+                    connection, "selector" runs all connections on one event loop
+                    and scales to thousands of workers
+            task_history: Number of finished tasks to keep compact records of in
+                          task_history (0 keeps none); results are never retained
+            speculation: Start backup copies of straggling tasks on idle workers
+                         at the end of a job; the first result wins
+            cache_size: Number of results of map(..., cache=True) jobs to keep in memory
+            cache_dir: Directory to also keep cached results in, so they survive restarts
+            cache_max_bytes: Maximum size of cache_dir, least recently used results
+                             evicted first (default: 1GB)
         """
+        if engine not in ("thread", "selector"):
+            raise ValueError(f"Unknown engine '{engine}', expected 'thread' or 'selector'")
         self.host = host
         self.port = port
         self.verbose = verbose
         self.worker_timeout = worker_timeout
+        self.engine = engine
+        self.speculation = speculation
         
         # Initialize authentication
         self.auth_manager = AuthManager(password)
@@ -74,13 +176,29 @@ class Coordinator:
             logger.setLevel(logging.DEBUG)
         
         self.workers = {}  # worker_id -> WorkerInfo
-        self.task_queue = deque()
+        self._worker_ids = itertools.count()
+        self._worker_index = WorkerIndex()  # Workers with free capacity, least loaded first
+        self._async_index = AsyncWorkerIndex()  # Workers with free async slots, least loaded first
+        self.jobs = {}  # job_id -> Job
+        self._job_ids = itertools.count()
+        self.task_queue = JobQueue()  # Queued tasks of every job, handed out by fair share
+        self.async_task_queue = JobQueue()  # The same for jobs of coroutine functions
         self.pending_tasks = {}  # task_id -> Task
-        self.completed_tasks = {}  # task_id -> Task
-        self.result_queue = queue.Queue()
+        self.task_history = deque(maxlen=task_history)  # TaskRecords of recently finished tasks
+        self._tasks_completed = 0
+        self._tasks_failed = 0
+        self._tasks_stolen = 0
+        self._tasks_speculated = 0
+        self.function_registry = FunctionRegistry()
+        self.object_store = ObjectStore()
+        self.result_cache = ResultCache(cache_size, cache_dir, cache_max_bytes)
         
         self._lock = threading.Lock()
+        self._dispatch_needed = threading.Event()  # Set when tasks or worker capacity appear
+        self._last_rebalance = 0.0
+        self._rebalance_pending = False  # _rebalance() must run again after REBALANCE_INTERVAL
         self._server_socket = None
+        self._selector_engine = None
         self._running = False
         self._threads = []
     
@@ -102,14 +220,20 @@ class Coordinator:
             pass
         
         self._server_socket.bind((self.host, self.port))
-        self._server_socket.listen(5)
+        self._server_socket.listen(socket.SOMAXCONN)
         
         self._running = True
         
         logger.info(f"Coordinator listening on {self.host}:{self.port}")
         
         # Start accepting connections in a separate thread
-        accept_thread = threading.Thread(target=self._accept_workers, daemon=True)
+        if self.engine == "selector":
+            self._selector_engine = SelectorEngine(self)
+            accept_thread = threading.Thread(
+                target=self._selector_engine.run, args=(self._server_socket,), daemon=True
+            )
+        else:
+            accept_thread = threading.Thread(target=self._accept_workers, daemon=True)
         accept_thread.start()
         self._threads.append(accept_thread)
         
@@ -117,20 +241,36 @@ class Coordinator:
         health_thread = threading.Thread(target=self._check_worker_health, daemon=True)
         health_thread.start()
         self._threads.append(health_thread)
+        
+        # Start task dispatcher thread
+        dispatch_thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+        dispatch_thread.start()
+        self._threads.append(dispatch_thread)
     
     def stop_server(self):
         """Stop the coordinator server."""
         logger.info("Stopping coordinator server...")
         self._running = False
+        self._dispatch_needed.set()  # Let the dispatcher exit
         
         # Notify all workers to shutdown
         with self._lock:
-            for worker_id, worker in list(self.workers.items()):
-                try:
-                    Protocol.send_message(worker.socket, MessageType.SHUTDOWN, {})
-                    worker.socket.close()
-                except:
-                    pass
+            workers = list(self.workers.values())
+            for worker in workers:
+                worker.send(MessageType.SHUTDOWN, {})
+                worker.close()
+        
+        if self._selector_engine:
+            self._selector_engine.stop()
+            self._threads[0].join(timeout=2.0)
+        
+        for worker in workers:
+            if worker.writer:
+                worker.writer.join(timeout=1.0)
+            try:
+                worker.socket.close()
+            except:
+                pass
         
         if self._server_socket:
             self._server_socket.close()
@@ -142,128 +282,495 @@ class Coordinator:
         func: Callable,
         iterable: List[Any],
         timeout: Optional[float] = None,
-        chunk_size: int = 1,
+        chunk_size: Union[int, str] = 1,
         on_progress: Optional[Callable[[int, int], None]] = None,
         on_task_complete: Optional[Callable[[int, Any], None]] = None,
         max_retries: int = 0,
+        compression: Optional[str] = None,
+        weight: float = 1.0,
+        cache: bool = False,
     ) -> List[Any]:
         """
         Distribute function execution across workers (similar to multiprocessing.Pool.map).
         
+        Each call runs as its own job, so several threads or clients can call
+        map() on one coordinator at the same time. While jobs compete for
+        workers, each gets a share of the worker slots proportional to its weight.
+        
         Args:
-            func: Function to apply to each item
+            func: Function to apply to each item; ``async def`` functions run
+                  concurrently on the workers' event loops
             iterable: List of items to process
             timeout: Maximum time to wait for all results (in seconds)
-            chunk_size: Number of items per task (not yet implemented)
-            on_progress: Callback function(completed, total) called after each task completes
-            on_task_complete: Callback function(task_index, result) called when each task finishes
-            max_retries: Maximum number of times to retry a failed task (default: 0, no retries)
+            chunk_size: Number of items per task, or "auto" to size batches from the
+                        number of connected worker slots
+            on_progress: Callback function(completed, total) called after each item completes
+            on_task_complete: Callback function(item_index, result) called when each item finishes
+            max_retries: Maximum number of times to retry a failed item (default: 0, no retries)
+            compression: Compression for this job's task and result messages: None or "auto"
+                         to choose adaptively per connection, "none", or a codec option such
+                         as "zlib", "zlib-9", "lz4" or "zstd"
+            weight: Relative share of worker slots for this job while other jobs are running
+            cache: Answer items this function already produced a result for from the
+                   coordinator's result cache, and cache the results of the rest
         
         Returns:
             List of results in the same order as the input iterable
         
         Raises:
             TimeoutError: If timeout is exceeded
+            ValueError: If chunk_size, compression or weight is invalid
+            DistributedComputeError: If func is an ``async def`` function and workers are
+                                     connected but none of them runs such tasks
         """
+        validate_option(compression)
+        job = Job(f"job-{next(self._job_ids)}", weight)
+        
         # Start server if not already running
         if not self._running:
             self.start_server()
-            time.sleep(0.5)  # Give server time to start
-        
-        # Create tasks
-        tasks = []
-        for i, item in enumerate(iterable):
-            task = Task(func=func, args=(item,), task_id=f"task-{i}")
-            task.max_retries = max_retries
-            tasks.append(task)
+        
+        items = list(iterable)
+        total = len(items)
+        chunk_size = self._resolve_chunk_size(chunk_size, total)
+        
+        start_time = time.time()
+        results = [None] * total
+        completed = 0
+        
+        # Submit everything at once; results come back in completion order
+        for index, value in self._run_job(
+            job, func, items, chunk_size, window=None, timeout=timeout, timeout_per_result=False,
+            max_retries=max_retries, compression=compression, ordered=False, cache=cache
+        ):
+            results[index] = value
+            completed += 1
+            
+            # Call progress callbacks
+            if on_progress:
+                try:
+                    on_progress(completed, total)
+                except Exception as e:
+                    logger.error(f"Progress callback error: {e}")
             
+            if on_task_complete:
+                try:
+                    on_task_complete(index, value)
+                except Exception as e:
+                    logger.error(f"Task complete callback error: {e}")
+            
+            if self.verbose:
+                logger.info(f"Progress: {completed}/{total} tasks completed")
+        
+        logger.info(f"All tasks completed in {time.time() - start_time:.2f}s")
+        
+        return results
+    
+    def imap(
+        self,
+        func: Callable,
+        iterable: Iterable[Any],
+        chunk_size: Union[int, str] = 1,
+        window: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_retries: int = 0,
+        compression: Optional[str] = None,
+        weight: float = 1.0,
+        cache: bool = False,
+    ) -> Iterator[Any]:
+        """
+        Lazy version of map() that yields results in input order as they arrive.
+        
+        Items are pulled from the iterable only as results are consumed: at
+        most `window` items are submitted and not yet yielded at any time.
+        Unbounded or on-disk datasets can therefore be processed with constant
+        coordinator memory. Results that finish ahead of an earlier item wait
+        in a reorder buffer, which the window also bounds.
+        
+        Stopping iteration early (or closing the generator) cancels the job.
+        
+        Args:
+            func: Function to apply to each item; ``async def`` functions run
+                  concurrently on the workers' event loops
+            iterable: Any iterable, including generators and unbounded streams
+            chunk_size: Number of items per task; "auto" needs an iterable with a length
+            window: Maximum number of items in flight (default: a few tasks per worker slot)
+            timeout: Maximum time to wait for each result (in seconds)
+            max_retries: Maximum number of times to retry a failed item (default: 0, no retries)
+            compression: Compression for this job's messages, as for map()
+            weight: Relative share of worker slots for this job while other jobs are running
+            cache: Use and fill the coordinator's result cache, as for map()
+        
+        Returns:
+            Generator of results in the same order as the input iterable
+        
+        Raises:
+            TimeoutError: If no result arrives within timeout
+            ValueError: If chunk_size, window, compression or weight is invalid
+            DistributedComputeError: If func is an ``async def`` function and workers are
+                                     connected but none of them runs such tasks
+        """
+        return self._stream(
+            func, iterable, chunk_size, window, timeout, max_retries, compression, weight, cache, ordered=True
+        )
+    
+    def imap_unordered(
+        self,
+        func: Callable,
+        iterable: Iterable[Any],
+        chunk_size: Union[int, str] = 1,
+        window: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_retries: int = 0,
+        compression: Optional[str] = None,
+        weight: float = 1.0,
+        cache: bool = False,
+    ) -> Iterator[Any]:
+        """
+        Like imap(), but yield each result as soon as it finishes, in completion order.
+        
+        There is no reorder buffer, so one slow item does not hold back the rest.
+        """
+        return self._stream(
+            func, iterable, chunk_size, window, timeout, max_retries, compression, weight, cache, ordered=False
+        )
+    
+    def _stream(self, func, iterable, chunk_size, window, timeout, max_retries, compression, weight,
+                cache: bool, ordered: bool) -> Iterator[Any]:
+        """Validate imap() arguments up front and return the job's result generator."""
+        validate_option(compression)
+        job = Job(f"job-{next(self._job_ids)}", weight)
+        
+        if chunk_size == "auto":
+            if not hasattr(iterable, "__len__"):
+                raise ValueError("chunk_size='auto' needs an iterable with a length")
+            chunk_size = self._resolve_chunk_size(chunk_size, len(iterable))
+        else:
+            chunk_size = self._resolve_chunk_size(chunk_size, 0)
+        
+        if window is None:
             with self._lock:
-                self.task_queue.append(task)
-                self.pending_tasks[task.task_id] = task
+                if inspect.iscoroutinefunction(func):
+                    slots = sum(w.async_slots for w in self.workers.values() if w.is_alive)
+                else:
+                    slots = sum(w.capacity for w in self.workers.values() if w.is_alive)
+            window = chunk_size * max(slots * IMAP_TASKS_PER_SLOT, MIN_IMAP_WINDOW)
+        elif not isinstance(window, int) or window < 1:
+            raise ValueError(f"window must be a positive integer, got {window!r}")
         
-        logger.info(f"Created {len(tasks)} tasks")
+        # Start server if not already running
+        if not self._running:
+            self.start_server()
         
-        # Distribute tasks to workers
-        self._distribute_tasks()
+        results = self._run_job(
+            job, func, iterable, chunk_size, window=window, timeout=timeout, timeout_per_result=True,
+            max_retries=max_retries, compression=compression, ordered=ordered, cache=cache
+        )
+        return (value for _, value in results)
+    
+    def _resolve_chunk_size(self, chunk_size: Union[int, str], num_items: int) -> int:
+        """Turn the chunk_size argument of map() into a concrete batch size."""
+        if chunk_size == "auto":
+            with self._lock:
+                slots = sum(w.max_tasks for w in self.workers.values() if w.is_alive)
+            if not slots:
+                # Splitting by slots would leave a handful of huge batches for whoever joins
+                return max(min(AUTO_CHUNK_SIZE_NO_WORKERS, num_items), 1)
+            # Same heuristic as multiprocessing.Pool: a few batches per slot
+            chunk_size, extra = divmod(num_items, slots * AUTO_CHUNKS_PER_SLOT)
+            if extra:
+                chunk_size += 1
+            return max(chunk_size, 1)
         
-        # Wait for results
-        start_time = time.time()
-        results = {}
-        task_index_map = {task.task_id: i for i, task in enumerate(tasks)}
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise ValueError(f"chunk_size must be a positive integer or 'auto', got {chunk_size!r}")
+        return chunk_size
+    
+    def _run_job(
+        self,
+        job: Job,
+        func: Callable,
+        iterable: Iterable[Any],
+        chunk_size: int,
+        window: Optional[int],
+        timeout: Optional[float],
+        timeout_per_result: bool,
+        max_retries: int,
+        compression: Optional[str],
+        ordered: bool,
+        cache: bool = False,
+    ) -> Iterator[Tuple[int, Any]]:
+        """
+        Run a job over an iterable, yielding (item_index, result) as items finish.
+        
+        The iterable is consumed lazily: at most `window` items (None for no
+        limit) are submitted and not yet yielded. With ordered, results are
+        held in a reorder buffer and yielded in input order. A failed item
+        yields None once its retries are used up. Closing the generator
+        cancels whatever is left of the job.
+        
+        With cache, items found in the result cache are answered without
+        being sent to a worker, and successful results are added to it.
         
-        while len(results) < len(tasks):
-            if timeout and (time.time() - start_time) > timeout:
-                raise DistributedTimeoutError(f"Timeout exceeded: {len(results)}/{len(tasks)} tasks completed")
+        Like any job, a job of a coroutine function waits while no worker is
+        connected. It fails once workers are connected but none of them has
+        async slots, instead of waiting for one forever.
+        """
+        # Serialize the function once; tasks only carry its hash
+        func_hash = self.function_registry.register(func)
+        job.is_async = inspect.iscoroutinefunction(func)
+        task_queue = self._queue_for(job)
+        with self._lock:
+            self.jobs[job.job_id] = job
+        
+        try:
+            if job.is_async:
+                self._check_async_slots()
+            source = enumerate(iterable)
+            exhausted = False
+            inputs = {}  # item index -> item, until the item is final (needed for retries)
+            task_items = {}  # task_id -> indices of the items the task covers
+            item_retries = {}  # item index -> retries used so far
+            reorder = {}  # item index -> result that finished ahead of next_index (ordered only)
+            cache_keys = {}  # item index -> result cache key, until the item is final (cache only)
+            hits = []  # (item index, result) answered from the result cache, not yet yielded
+            function_key = ResultCache.function_key(func, func_hash) if cache else None
+            next_index = 0
+            submitted = 0
+            yielded = 0
             
-            try:
-                task_id, result, error = self.result_queue.get(timeout=1.0)
+            def submit(indices: List[int], task_id: str, retry_count: int = 0):
+                task_id = job.task_id(task_id)
+                if chunk_size > 1:
+                    task = Task(func=func, args=([inputs[i] for i in indices],), task_id=task_id)
+                    task.batch = True
+                else:
+                    task = Task(func=func, args=(inputs[indices[0]],), task_id=task_id)
+                task.job_id = job.job_id
+                task.func_hash = func_hash
+                task.max_retries = max_retries
+                task.retry_count = retry_count
+                task.compression = compression
+                task.is_async = job.is_async
+                task_items[task_id] = indices
                 
-                if error:
-                    # Check if the task can be retried
-                    task_obj = self.completed_tasks.get(task_id)
-                    if task_obj and task_obj.can_retry():
-                        task_obj.retry_count += 1
-                        task_obj.status = TaskStatus.PENDING
-                        task_obj.error = None
-                        task_obj.worker_id = None
-                        logger.info(f"Retrying task {task_id[:8]} (attempt {task_obj.retry_count}/{task_obj.max_retries})")
-                        with self._lock:
-                            del self.completed_tasks[task_id]
-                            self.pending_tasks[task_id] = task_obj
-                            self.task_queue.append(task_obj)
-                        self._distribute_tasks()
-                        continue
+                with self._lock:
+                    task_queue.push(job, task)
+                    self.pending_tasks[task_id] = task
+                    job.pending.add(task_id)
+                    job.tasks_submitted += 1
+                self._dispatch_needed.set()
+            
+            def emit(finished: List[Tuple[int, Any]]):
+                nonlocal next_index, yielded
+                for index, value in finished:
+                    if ordered:
+                        reorder[index] = value
+                        while next_index in reorder:
+                            yield next_index, reorder.pop(next_index)
+                            next_index += 1
+                            yielded += 1
                     else:
-                        logger.error(f"Task {task_id[:8]} failed: {error}")
-                        results[task_id] = None
-                else:
-                    results[task_id] = result
+                        yield index, value
+                        yielded += 1
+            
+            deadline = time.time() + timeout if timeout else None
+            
+            while True:
+                # Keep the window full
+                while not exhausted and (window is None or submitted - yielded < window):
+                    batch = list(itertools.islice(source, chunk_size))
+                    if not batch:
+                        exhausted = True
+                        break
+                    submitted += len(batch)
+                    if cache:
+                        misses = []
+                        for index, item in batch:
+                            key = ResultCache.key(function_key, item)
+                            found, value = self.result_cache.get(key)
+                            if found:
+                                hits.append((index, value))
+                            else:
+                                cache_keys[index] = key
+                                misses.append((index, item))
+                        batch = misses
+                        if not batch:
+                            continue
+                    for index, item in batch:
+                        inputs[index] = item
+                    submit([index for index, _ in batch], f"task-{batch[0][0]}")
                 
-                # Call progress callbacks
-                completed = len(results)
-                total = len(tasks)
+                if exhausted and yielded == submitted:
+                    break
                 
-                if on_progress:
-                    try:
-                        on_progress(completed, total)
-                    except Exception as e:
-                        logger.error(f"Progress callback error: {e}")
+                if hits:
+                    finished, hits = hits, []
+                    yield from emit(finished)
+                    if timeout and timeout_per_result:
+                        deadline = time.time() + timeout
+                    continue
                 
-                if on_task_complete:
-                    try:
-                        task_idx = task_index_map.get(task_id, -1)
-                        on_task_complete(task_idx, results[task_id])
-                    except Exception as e:
-                        logger.error(f"Task complete callback error: {e}")
-                    
-                if self.verbose:
-                    logger.info(f"Progress: {completed}/{total} tasks completed")
+                remaining = None
+                if deadline:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise DistributedTimeoutError(
+                            f"Timeout exceeded: {yielded} items completed, {submitted - yielded} outstanding"
+                        )
+                
+                if job.is_async:
+                    # Wake up now and then to notice if no worker can run the tasks
+                    remaining = min(remaining or ASYNC_SLOTS_CHECK_INTERVAL, ASYNC_SLOTS_CHECK_INTERVAL)
+                try:
+                    task_id, result, error = job.results.get(timeout=remaining)
+                except queue.Empty:
+                    if job.is_async:
+                        self._check_async_slots()
+                    continue
+                
+                indices = task_items.pop(task_id, None)
+                if indices is None:
+                    continue
+                
+                # Batches report one (ok, value) outcome per item; a task-level error fails them all
+                if error:
+                    outcomes = [(False, error)] * len(indices)
+                elif chunk_size > 1:
+                    outcomes = result
+                else:
+                    outcomes = [(True, result)]
+                
+                retry = []
+                finished = []
+                for index, (ok, value) in zip(indices, outcomes):
+                    if not ok:
+                        # Check if the item can be retried
+                        attempt = item_retries.get(index, 0)
+                        if attempt < max_retries:
+                            item_retries[index] = attempt + 1
+                            logger.info(f"Retrying item {index} (attempt {attempt + 1}/{max_retries})")
+                            retry.append(index)
+                            continue
+                        logger.error(f"Task {task_id} failed on item {index}: {value}")
+                        value = None
                     
-            except queue.Empty:
-                # Check if we need to redistribute tasks from dead workers
-                self._redistribute_failed_tasks()
-                continue
+                    # The item is final; drop our references to its input
+                    del inputs[index]
+                    item_retries.pop(index, None)
+                    key = cache_keys.pop(index, None)
+                    if key is not None and ok:
+                        self.result_cache.put(key, value)
+                    finished.append((index, value))
+                
+                if retry:
+                    for start in range(0, len(retry), chunk_size):
+                        retry_indices = retry[start:start + chunk_size]
+                        attempt = item_retries[retry_indices[0]]
+                        submit(retry_indices, f"task-{retry_indices[0]}-retry-{attempt}", retry_count=attempt)
+                
+                yield from emit(finished)
+                
+                if finished and timeout and timeout_per_result:
+                    deadline = time.time() + timeout
+        finally:
+            self._finish_job(job)
+            self.function_registry.release(func_hash)
+    
+    
+    def _finish_job(self, job: Job):
+        """
+        Forget a finished, failed, timed-out or abandoned job and drop its unfinished tasks.
         
-        # Return results in original order
-        ordered_results = [results[task.task_id] for task in tasks]
+        Tasks of the job still queued on workers are revoked; ones already
+        running finish, and their results are ignored.
+        """
+        with self._lock:
+            self.jobs.pop(job.job_id, None)
+            self._queue_for(job).remove(job)
+            revoke = {}  # worker_id -> ids of the job's tasks it holds
+            for task_id in job.pending:
+                task = self.pending_tasks.pop(task_id)
+                for worker_id in task.holders:
+                    revoke.setdefault(worker_id, []).append(task_id)
+            job.pending.clear()
+            for worker_id, task_ids in revoke.items():
+                worker = self.workers.get(worker_id)
+                if worker is None or not worker.is_alive:
+                    continue
+                task_ids = [task_id for task_id in task_ids if task_id not in worker.revoking]
+                if task_ids:
+                    worker.revoking.update(task_ids)
+                    worker.send(MessageType.TASK_REVOKE, {"task_ids": task_ids})
+    
+    def _check_async_slots(self):
+        """Raise if workers are connected but none of them runs ``async def`` tasks."""
+        with self._lock:
+            workers = [worker for worker in self.workers.values() if worker.is_alive]
+        if workers and not any(worker.async_slots > 0 for worker in workers):
+            raise DistributedComputeError(
+                "No connected worker runs async def tasks; workers from before async support have no async slots"
+            )
+    
+    def _queue_for(self, job: Job) -> JobQueue:
+        """Return the queue a job's tasks wait in: coroutine functions use the workers' async slots."""
+        return self.async_task_queue if job.is_async else self.task_queue
+    
+    def scatter(self, obj: Any) -> ObjectRef:
+        """
+        Place a large object that many tasks share in the object store.
         
-        logger.info(f"All tasks completed in {time.time() - start_time:.2f}s")
+        Pass the returned ref to map() in the items, or capture it in the task
+        function. Each worker receives the object once, just before its first
+        task that needs it, and tasks see the object itself instead of the ref.
+        
+        Args:
+            obj: The object to share
         
-        return ordered_results
+        Returns:
+            A lightweight reference to the object
+        """
+        return self.object_store.put(obj)
+    
+    def broadcast(self, obj: Any) -> ObjectRef:
+        """
+        Like scatter(), but ship the object to every connected worker right away.
+        
+        Workers that connect later still receive it on first use.
+        """
+        ref = self.scatter(obj)
+        with self._lock:
+            for worker in self.workers.values():
+                if worker.is_alive:
+                    self._push_objects(worker, [ref.object_hash])
+        return ref
+    
+    def release(self, ref: ObjectRef):
+        """Drop an object from the store once the tasks using it are done."""
+        self.object_store.release(ref.object_hash)
     
     def get_stats(self) -> dict:
         """Get statistics about the coordinator and workers."""
         with self._lock:
             stats = {
                 "workers": len([w for w in self.workers.values() if w.is_alive]),
-                "tasks_pending": len(self.task_queue) + len(self.pending_tasks),
-                "tasks_completed": len(self.completed_tasks),
+                "tasks_pending": len(self.task_queue) + len(self.async_task_queue) + len(self.pending_tasks),
+                "tasks_completed": self._tasks_completed,
+                "tasks_failed": self._tasks_failed,
+                "tasks_stolen": self._tasks_stolen,
+                "tasks_speculated": self._tasks_speculated,
+                "result_cache": self.result_cache.get_stats(),
+                "jobs": [job.get_stats() for job in self.jobs.values()],
                 "worker_details": [
                     {
                         "name": w.name,
                         "tasks_completed": w.tasks_completed,
                         "tasks_failed": w.tasks_failed,
                         "current_tasks": w.current_tasks,
+                        "max_tasks": w.max_tasks,
+                        "running_tasks": w.running_tasks,
+                        "queued_tasks": w.queued_tasks,
+                        "async_tasks": w.async_tasks,
                         "cpu_percent": w.cpu_percent,
                     }
                     for w in self.workers.values() if w.is_alive
@@ -312,7 +819,6 @@ class Coordinator:
                     daemon=True
                 )
                 worker_thread.start()
-                self._threads.append(worker_thread)
                 
             except socket.timeout:
                 continue
@@ -321,8 +827,8 @@ class Coordinator:
                     logger.error(f"Error accepting connection: {e}")
     
     def _handle_worker(self, client_socket: socket.socket, address: tuple):
-        """Handle communication with a worker."""
-        worker_id = None
+        """Handle communication with a worker on its own thread (threaded engine)."""
+        worker = None
         
         try:
             # Receive initial message
@@ -337,109 +843,169 @@ class Coordinator:
                 client_socket.close()
                 return
             
-            # Extract worker info and password
-            worker_name = payload.get("name", "unknown")
-            worker_password = payload.get("password")
-            
-            # Check authentication (only if auth is enabled)
-            if self.auth_manager:
-                can_connect, reason = self.auth_manager.can_worker_connect(worker_name, worker_password)
-                
-                if not can_connect:
-                    logger.warning(f"Worker {worker_name} from {address} authentication failed: {reason}")
-                    Protocol.send_message(client_socket, MessageType.AUTH_FAILED, {
-                        "reason": reason
-                    })
-                    client_socket.close()
-                    return
-                
-                if self.auth_manager.password:
-                    logger.info(f"Worker {worker_name} authenticated successfully")
-            
-            # Register worker
-            worker_id = f"worker-{len(self.workers)}-{int(time.time())}"
-            worker = WorkerInfo(
-                worker_id=worker_id,
-                socket=client_socket,
-                name=worker_name,
-                max_tasks=payload["max_concurrent_tasks"]
-            )
-            
-            with self._lock:
-                self.workers[worker_id] = worker
-            
-            # Register connection with auth manager (only if auth is enabled)
-            if self.auth_manager:
-                self.auth_manager.register_connection(worker_name)
-            
-            logger.info(f"Registered worker: {worker.name} (ID: {worker_id})")
-            
-            # Send registration confirmation
-            Protocol.send_message(client_socket, MessageType.WORKER_REGISTERED, {
-                "worker_id": worker_id
-            })
+            worker = self._register_worker(client_socket, address, payload)
+            if worker is None:
+                return
             
-            # Don't call _distribute_tasks() here - it will be called from map()
-            # This prevents deadlock between sending tasks and receiving messages
+            worker.writer = threading.Thread(target=self._write_to_worker, args=(worker,), daemon=True)
+            worker.writer.start()
             
             # Listen for messages from worker
             while self._running and worker.is_alive:
                 try:
                     msg_type, payload = Protocol.receive_message(client_socket, timeout=5.0)
                 except socket.timeout:
-                    # No message yet; keep worker alive and try distributing tasks
-                    self._distribute_tasks()
                     continue
                 
                 if msg_type is None:
-                    # Connection closed or empty read
-                    continue
-                
-                if msg_type == MessageType.HEARTBEAT:
-                    self._handle_heartbeat(worker_id, payload)
-                
-                elif msg_type == MessageType.TASK_RESULT:
-                    self._handle_task_result(worker_id, payload)
-                    # After task completion, try to send more tasks
-                    self._distribute_tasks()
-                
-                elif msg_type == MessageType.TASK_ERROR:
-                    self._handle_task_error(worker_id, payload)
-                    # After task error, try to redistribute
-                    self._distribute_tasks()
+                    # Connection closed; requeue the worker's tasks right away
+                    logger.warning(f"Worker {worker.name} closed the connection")
+                    break
                 
-                elif msg_type == MessageType.SHUTDOWN:
-                    logger.info(f"Worker {worker.name} disconnecting")
+                if not self._handle_worker_message(worker, msg_type, payload):
                     break
         except Exception as e:
             logger.error(f"Error handling worker: {e}")
         finally:
-            if worker_id:
-                with self._lock:
-                    if worker_id in self.workers:
-                        worker = self.workers[worker_id]
-                        worker.is_alive = False
-                        # Unregister from auth manager
-                        if self.auth_manager:
-                            self.auth_manager.unregister_connection(worker.name)
-                logger.info(f"Worker {worker_id} disconnected")
+            if worker:
+                self._worker_disconnected(worker)
             
             try:
                 client_socket.close()
             except:
                 pass
     
-    def _handle_heartbeat(self, worker_id: str, payload: dict):
-        """Handle heartbeat message from worker."""
+    def _register_worker(self, client_socket: socket.socket, address: tuple, payload: dict,
+                         on_queued: Optional[Callable[[WorkerInfo], None]] = None,
+                         on_rejected: Optional[Callable[[str, dict], None]] = None) -> Optional[WorkerInfo]:
+        """
+        Authenticate and register a worker from its REGISTER_WORKER payload.
+        
+        The WORKER_REGISTERED reply is queued as the first message of the
+        worker's outbox, ahead of any task the dispatcher assigns.
+        
+        Args:
+            client_socket: The worker's connection
+            address: The worker's address
+            payload: Registration payload
+            on_queued: Hook for engines without writer threads, see WorkerInfo.on_queued
+            on_rejected: Hook for engines without writer threads: called with the
+                         AUTH_FAILED reply instead of sending it and closing the socket
+        
+        Returns:
+            The registered worker, or None if authentication failed
+        """
+        # Extract worker info and password
+        worker_name = payload.get("name", "unknown")
+        worker_password = payload.get("password")
+        
+        # Check authentication (only if auth is enabled)
+        if self.auth_manager:
+            can_connect, reason = self.auth_manager.can_worker_connect(worker_name, worker_password)
+            
+            if not can_connect:
+                logger.warning(f"Worker {worker_name} from {address} authentication failed: {reason}")
+                if on_rejected:
+                    on_rejected(MessageType.AUTH_FAILED, {"reason": reason})
+                    return None
+                Protocol.send_message(client_socket, MessageType.AUTH_FAILED, {
+                    "reason": reason
+                })
+                client_socket.close()
+                return None
+            
+            if self.auth_manager.password:
+                logger.info(f"Worker {worker_name} authenticated successfully")
+        
+        # Register worker; peers that predate codec negotiation only speak zlib
+        worker_id = f"worker-{next(self._worker_ids)}-{int(time.time())}"
+        codecs = negotiate_codecs(available_codecs(), payload.get("codecs", ["zlib"]))
+        worker = WorkerInfo(
+            worker_id=worker_id,
+            socket=client_socket,
+            name=worker_name,
+            max_tasks=payload["max_concurrent_tasks"],
+            codecs=codecs,
+            prefetch=payload.get("prefetch_depth", 0),
+            async_slots=payload.get("async_concurrency", 0)
+        )
+        worker.on_queued = on_queued
+        
+        # Queue registration confirmation before anything else for the worker
+        worker.send(MessageType.WORKER_REGISTERED, {
+            "worker_id": worker_id,
+            "codecs": codecs
+        })
+        
+        with self._lock:
+            self.workers[worker_id] = worker
+            self._reindex(worker)
+        
+        # Register connection with auth manager (only if auth is enabled)
+        if self.auth_manager:
+            self.auth_manager.register_connection(worker_name)
+        
+        logger.info(f"Registered worker: {worker.name} (ID: {worker_id})")
+        
+        # Give the new worker any queued tasks
+        self._dispatch_needed.set()
+        return worker
+    
+    def _handle_worker_message(self, worker: WorkerInfo, msg_type: str, payload: dict) -> bool:
+        """
+        Handle one message from a registered worker.
+        
+        Returns:
+            False if the worker is disconnecting
+        """
+        worker_id = worker.worker_id
+        worker.last_seen = time.time()  # Any frame shows the worker is alive
+        
+        if msg_type == MessageType.HEARTBEAT:
+            self._apply_heartbeat(worker, payload)
+        
+        elif msg_type == MessageType.TASK_RESULT:
+            self._handle_task_result(worker_id, payload)
+        
+        elif msg_type == MessageType.TASK_ERROR:
+            self._handle_task_error(worker_id, payload)
+        
+        elif msg_type == MessageType.RESULT_BATCH:
+            self._handle_result_batch(worker_id, payload)
+            if "heartbeat" in payload:
+                self._apply_heartbeat(worker, payload["heartbeat"])
+        
+        elif msg_type == MessageType.FUNCTION_MISSING:
+            self._handle_function_missing(worker_id, payload)
+        
+        elif msg_type == MessageType.OBJECT_MISSING:
+            self._handle_object_missing(worker_id, payload)
+        
+        elif msg_type == MessageType.TASKS_REVOKED:
+            self._handle_tasks_revoked(worker_id, payload)
+        
+        elif msg_type == MessageType.SHUTDOWN:
+            logger.info(f"Worker {worker.name} disconnecting")
+            return False
+        
+        return True
+    
+    def _worker_disconnected(self, worker: WorkerInfo):
+        """Clean up after a worker's connection ended, requeueing its tasks."""
         with self._lock:
-            if worker_id in self.workers:
-                worker = self.workers[worker_id]
-                worker.last_heartbeat = time.time()
-                worker.current_tasks = payload.get("current_tasks", 0)
-                worker.tasks_completed = payload.get("tasks_completed", 0)
-                worker.tasks_failed = payload.get("tasks_failed", 0)
-                worker.cpu_percent = payload.get("cpu_percent", 0.0)
-                worker.memory_available = payload.get("memory_available", 0)
+            if worker.is_alive:
+                self._mark_worker_dead(worker)
+        logger.info(f"Worker {worker.worker_id} disconnected")
+    
+    def _apply_heartbeat(self, worker: WorkerInfo, fields: dict):
+        """
+        Update a worker's reported state from the heartbeat fields that changed.
+        
+        These attributes are only read for statistics, so no lock is taken.
+        """
+        for key in HEARTBEAT_ATTRIBUTES:
+            if key in fields:
+                setattr(worker, key, fields[key])
     
     def _handle_task_result(self, worker_id: str, payload: dict):
         """Handle task result from worker."""
@@ -447,48 +1013,183 @@ class Coordinator:
         result = payload["result"]
         
         with self._lock:
-            if task_id in self.pending_tasks:
-                task = self.pending_tasks[task_id]
-                task.result = result
+            # Only the first result counts; a losing speculative copy's result is dropped
+            task = self.pending_tasks.pop(task_id, None)
+            job = None
+            if task:
                 task.status = TaskStatus.COMPLETED
-                self.completed_tasks[task_id] = task
-                del self.pending_tasks[task_id]
-                
-                # Update worker stats
-                if worker_id in self.workers:
-                    worker = self.workers[worker_id]
-                    worker.current_tasks = max(0, worker.current_tasks - 1)
-        
-        # Add result to queue
-        self.result_queue.put((task_id, result, None))
+                task.completed_at = time.time()
+                task.worker_id = worker_id
+                self.task_history.append(task.to_record())
+                self._tasks_completed += 1
+                job = self.jobs.get(task.job_id)
+                if job:
+                    job.pending.discard(task_id)
+                    job.tasks_completed += 1
+                    if not task.speculated:
+                        job.latencies.append(task.completed_at - task.assigned_at)
+            
+            self._task_left_worker(worker_id, task_id)
+            if task:
+                self._cancel_copies(task)
         
-        # Task distribution now happens in _handle_worker loop
+        # Deliver the result to the job that submitted the task
+        if job:
+            job.results.put((task_id, result, None))
     
     def _handle_task_error(self, worker_id: str, payload: dict):
         """Handle task error from worker."""
         task_id = payload["task_id"]
         error = payload["error"]
         
-        logger.error(f"Task {task_id[:8]} failed on worker {worker_id}: {error}")
+        logger.error(f"Task {task_id} failed on worker {worker_id}: {error}")
         
         with self._lock:
-            if task_id in self.pending_tasks:
-                task = self.pending_tasks[task_id]
+            task = self.pending_tasks.pop(task_id, None)
+            job = None
+            if task:
                 task.status = TaskStatus.FAILED
                 task.error = error
-                
-                # For now, mark as completed with error
-                self.completed_tasks[task_id] = task
-                del self.pending_tasks[task_id]
-                
-                # Update worker stats
-                if worker_id in self.workers:
-                    worker = self.workers[worker_id]
-                    worker.current_tasks = max(0, worker.current_tasks - 1)
+                task.completed_at = time.time()
+                task.worker_id = worker_id
+                self.task_history.append(task.to_record())
+                self._tasks_failed += 1
+                job = self.jobs.get(task.job_id)
+                if job:
+                    job.pending.discard(task_id)
+                    job.tasks_failed += 1
+            
+            self._task_left_worker(worker_id, task_id)
+            if task:
+                self._cancel_copies(task)
+        
+        # Deliver the error to the job that submitted the task
+        if job:
+            job.results.put((task_id, None, error))
+
+    def _handle_result_batch(self, worker_id: str, payload: dict):
+        """Handle several task results and errors coalesced into one frame."""
+        for msg_type, result_payload in payload["results"]:
+            if msg_type == MessageType.TASK_RESULT:
+                self._handle_task_result(worker_id, result_payload)
+            elif msg_type == MessageType.TASK_ERROR:
+                self._handle_task_error(worker_id, result_payload)
+    
+    def _handle_function_missing(self, worker_id: str, payload: dict):
+        """
+        Handle a worker that no longer has a task's function cached.
+        
+        The worker evicted the function from its cache, or could not load it
+        because a shared object it captures was evicted. Forget that these were
+        shipped and requeue the task; the next assignment re-sends them.
+        """
+        task_id = payload["task_id"]
+        func_hash = payload["func_hash"]
+        
+        logger.debug(f"Worker {worker_id} is missing function {func_hash[:8]}, requeueing task {task_id}")
         
-        # Add error to result queue
-        self.result_queue.put((task_id, None, error))
+        with self._lock:
+            worker = self.workers.get(worker_id)
+            if worker:
+                worker.known_functions.discard(func_hash)
+                worker.known_objects.difference_update(payload.get("object_hashes", ()))
+            self._task_left_worker(worker_id, task_id, requeue=True)
 
+    def _handle_object_missing(self, worker_id: str, payload: dict):
+        """
+        Handle a worker that no longer has shared objects a task needs.
+        
+        The objects are shipped again with the requeued task. If one has been
+        released from the store in the meantime, the task fails instead.
+        """
+        task_id = payload["task_id"]
+        object_hashes = payload["object_hashes"]
+        
+        released = [object_hash for object_hash in object_hashes if object_hash not in self.object_store]
+        if released:
+            self._handle_task_error(worker_id, {
+                "task_id": task_id,
+                "error": f"Shared object {released[0][:8]} was released before the task ran",
+            })
+            return
+        
+        logger.debug(f"Worker {worker_id} is missing {len(object_hashes)} object(s), requeueing task {task_id}")
+        
+        with self._lock:
+            worker = self.workers.get(worker_id)
+            if worker:
+                worker.known_objects.difference_update(object_hashes)
+            self._task_left_worker(worker_id, task_id, requeue=True)
+    
+    def _handle_tasks_revoked(self, worker_id: str, payload: dict):
+        """
+        Handle a worker's answer to TASK_REVOKE.
+        
+        Tasks the worker cancelled before starting them are requeued for other
+        workers; the rest are running and stay assigned. Workers send the same
+        answer, unasked, for tasks their full run queue turned away.
+        """
+        revoked = payload["revoked"]
+        if revoked:
+            logger.debug(f"Took back {len(revoked)} queued task(s) from worker {worker_id}")
+        
+        with self._lock:
+            worker = self.workers.get(worker_id)
+            requested = set()
+            if worker:
+                requested = worker.revoking.intersection(payload["task_ids"])
+                worker.revoking.difference_update(payload["task_ids"])
+            for task_id in revoked:
+                # Only stolen tasks count: not rejections, nor cancelled losing copies of speculative tasks
+                if task_id in requested and task_id in self.pending_tasks:
+                    self._tasks_stolen += 1
+                self._task_left_worker(worker_id, task_id, requeue=True)
+    
+    def _task_left_worker(self, worker_id: str, task_id: str, requeue: bool = False):
+        """
+        Take a finished or returned task off its worker and account for it in its job.
+        
+        With requeue, a task that is still pending goes back to the front of
+        its job's queue. Must be called with the lock held.
+        """
+        worker = self.workers.get(worker_id)
+        task = worker.remove_task(task_id) if worker else None
+        if task is None:
+            return
+        worker.revoking.discard(task_id)
+        self._reindex(worker)
+        self._unassign(task, worker_id, requeue)
+        self._dispatch_needed.set()
+    
+    def _unassign(self, task: Task, worker_id: str, requeue: bool):
+        """
+        Release one worker's copy of a task in its job's accounting.
+        
+        With requeue, a task that is still pending goes back to its job's
+        queue, unless another worker holds a speculative copy. Lock held.
+        """
+        task.holders.discard(worker_id)
+        job = self.jobs.get(task.job_id)
+        if job is None:
+            return  # The job is over; nobody waits for this task
+        if (requeue and not task.holders and task.task_id in self.pending_tasks
+                and task.status == TaskStatus.ASSIGNED):
+            task.status = TaskStatus.PENDING
+            task.worker_id = None
+            task.speculated = False
+            self._queue_for(job).requeue(job, task)
+        else:
+            self._queue_for(job).done(job)
+    
+    def _cancel_copies(self, task: Task):
+        """Revoke the other copies of a task that has its first result. Lock held."""
+        for worker_id in task.holders:
+            worker = self.workers.get(worker_id)
+            if worker and task.task_id not in worker.revoking:
+                # A copy that already started keeps running; its result is ignored
+                worker.revoking.add(task.task_id)
+                worker.send(MessageType.TASK_REVOKE, {"task_ids": [task.task_id]})
+    
     def _handle_client_job(self, client_socket: socket.socket, payload: dict):
         """Handle a client job submission and return results."""
         try:
@@ -496,8 +1197,14 @@ class Coordinator:
             iterable = payload["iterable"]
             timeout = payload.get("timeout")
             chunk_size = payload.get("chunk_size", 1)
+            compression = payload.get("compression")
+            weight = payload.get("weight", 1.0)
+            cache = payload.get("cache", False)
 
-            results = self.map(func, iterable, timeout=timeout, chunk_size=chunk_size)
+            results = self.map(
+                func, iterable, timeout=timeout, chunk_size=chunk_size,
+                compression=compression, weight=weight, cache=cache
+            )
 
             Protocol.send_message(client_socket, MessageType.JOB_RESULT, {
                 "results": results
@@ -512,55 +1219,273 @@ class Coordinator:
             except Exception:
                 pass
     
+    def _dispatch_loop(self):
+        """
+        Run a distribution pass whenever there may be something to assign.
+        
+        New tasks, worker registrations, finished tasks and requeues set
+        _dispatch_needed. The dispatcher sleeps until then instead of polling.
+        """
+        while self._running:
+            # Rebalancing is retried after REBALANCE_INTERVAL even if nothing else happens
+            self._dispatch_needed.wait(timeout=REBALANCE_INTERVAL if self._rebalance_pending else None)
+            self._dispatch_needed.clear()
+            if not self._running:
+                break
+            try:
+                self._distribute_tasks()
+            except Exception as e:
+                logger.error(f"Error distributing tasks: {e}")
+    
     def _distribute_tasks(self):
-        """Distribute pending tasks to available workers."""
+        """
+        Distribute pending tasks to available workers.
+        
+        Tasks are matched to workers under the lock, and each worker's new
+        tasks are queued as a single TASK_BATCH frame. The worker's writer
+        thread sends them once the lock is released. Once the queue is empty,
+        work is rebalanced onto idle workers.
+        """
         with self._lock:
-            if not self.task_queue:
-                return
-            
-            available_workers = [
-                w for w in self.workers.values()
-                if w.is_alive and w.current_tasks < w.max_tasks
-            ]
-            
-            if not available_workers:
-                return
-            
-            # Sort workers by current load (least loaded first)
-            available_workers.sort(key=lambda w: w.current_tasks / w.max_tasks)
-            
-            while self.task_queue and available_workers:
-                task = self.task_queue.popleft()
-                worker = available_workers[0]
-                
-                try:
-                    # Send task to worker
-                    task_data = task.to_dict()
-                    Protocol.send_message(worker.socket, MessageType.TASK_ASSIGNMENT, task_data)
+            now = time.time()
+            assignments = {}  # worker_id -> (worker, [tasks])
+            # Coroutine tasks go to the workers' async slots, the rest to their execution slots
+            for task_queue, worker_index in ((self.task_queue, self._worker_index),
+                                             (self.async_task_queue, self._async_index)):
+                while task_queue:
+                    worker = worker_index.pop()
+                    if worker is None:
+                        break
                     
+                    task = task_queue.pop()
                     task.status = TaskStatus.ASSIGNED
                     task.worker_id = worker.worker_id
-                    worker.current_tasks += 1
-                    
-                    logger.debug(f"Assigned task {task.task_id[:8]} to worker {worker.name}")
-                    
-                    # Re-sort workers
-                    available_workers.sort(key=lambda w: w.current_tasks / w.max_tasks)
+                    task.holders.add(worker.worker_id)
+                    task.assigned_at = now
+                    worker.add_task(task)
+                    assignments.setdefault(worker.worker_id, (worker, []))[1].append(task)
                     
-                    # Remove workers that are now at max capacity
-                    available_workers = [
-                        w for w in available_workers
-                        if w.current_tasks < w.max_tasks
-                    ]
+                    logger.debug(f"Assigned task {task.task_id} to worker {worker.name}")
                     
-                except Exception as e:
-                    logger.error(f"Failed to assign task to worker {worker.name}: {e}")
-                    worker.is_alive = False
-                    # Unregister from auth manager
-                    self.auth_manager.unregister_connection(worker.name)
-                    # Put task back in queue
-                    self.task_queue.appendleft(task)
-                    available_workers.remove(worker)
+                    # Put the worker back at its new load, unless it is now full
+                    worker_index.update(worker)
+            
+            for worker, tasks in assignments.values():
+                self._send_tasks(worker, tasks)
+            
+            if not self.task_queue:
+                self._rebalance()
+    
+    def _reindex(self, worker: WorkerInfo):
+        """Re-index a worker in both worker indexes after its tasks or liveness changed. Lock held."""
+        self._worker_index.update(worker)
+        self._async_index.update(worker)
+    
+    def _rebalance(self):
+        """
+        Move work onto idle workers once nothing is left in the queue.
+        
+        Runs at most every REBALANCE_INTERVAL seconds; a skipped or unfinished
+        pass makes the dispatcher run again after the interval. Must be called
+        with the lock held.
+        """
+        now = time.monotonic()
+        if now - self._last_rebalance < REBALANCE_INTERVAL:
+            self._rebalance_pending = True
+            return
+        self._last_rebalance = now
+        self._rebalance_pending = False
+        
+        self._steal_tasks()
+        if self.speculation:
+            self._speculate()
+    
+    def _steal_tasks(self):
+        """
+        Take back queued tasks from backlogged workers while others sit idle.
+        
+        With prefetching, a slow worker can hold a queue of tasks that a fast,
+        idle worker could already be running. Each backlogged worker is asked
+        to give back half of the tasks it has queued beyond its slots, newest
+        first, up to the free capacity (slots and prefetch) of the workers with
+        an idle slot. Tasks are only requeued once
+        the worker confirms it cancelled them, see _handle_tasks_revoked().
+        Must be called with the lock held.
+        """
+        demand = 0  # Tasks the idle workers can take
+        backlogged = []  # (queued tasks not yet asked back, worker)
+        for worker in self.workers.values():
+            if not worker.is_alive:
+                continue
+            if worker.current_tasks < worker.max_tasks:
+                demand += worker.capacity - worker.current_tasks
+            demand -= len(worker.revoking)
+            backlog = worker.current_tasks - worker.max_tasks - len(worker.revoking)
+            if backlog > 0:
+                backlogged.append((backlog, worker))
+        
+        if demand <= 0 or not backlogged:
+            return
+        
+        backlogged.sort(key=lambda entry: entry[0], reverse=True)
+        for backlog, worker in backlogged:
+            count = min((backlog + 1) // 2, demand)
+            task_ids = []
+            for task_id, task in reversed(worker.in_flight.items()):
+                if len(task_ids) == count:
+                    break
+                if task_id not in worker.revoking and not task.is_async:
+                    task_ids.append(task_id)
+            if not task_ids:
+                continue  # Every queued task is already being asked back
+            
+            worker.revoking.update(task_ids)
+            worker.send(MessageType.TASK_REVOKE, {"task_ids": task_ids})
+            demand -= len(task_ids)
+            if demand <= 0:
+                break
+
+    def _speculate(self):
+        """
+        Start backup copies of straggling tasks on idle workers.
+
+        A running task is a straggler once it has run longer than its job's
+        straggler threshold (see Job.straggler_threshold()). Each straggler
+        gets one backup on an idle worker, oldest first; whichever copy
+        finishes first supplies the result and the other is revoked. Must be
+        called with the lock held.
+        """
+        now = time.time()
+        thresholds = {}  # job_id -> seconds, or None while the job has too few samples
+        stragglers = []
+        watching = False  # Some task may still become a straggler
+        for worker in self.workers.values():
+            if not worker.is_alive:
+                continue
+            # Only the tasks that occupy the worker's slots can be running
+            slot_tasks = (task for task in worker.in_flight.values() if not task.is_async)
+            for task in itertools.islice(slot_tasks, worker.max_tasks):
+                if task.speculated or task.task_id not in self.pending_tasks:
+                    continue
+                job = self.jobs.get(task.job_id)
+                if job is None:
+                    continue
+                if task.job_id not in thresholds:
+                    threshold = job.straggler_threshold(SPECULATION_PERCENTILE, SPECULATION_FACTOR)
+                    thresholds[task.job_id] = threshold and max(threshold, SPECULATION_MIN_TIME)
+                threshold = thresholds[task.job_id]
+                if threshold is None:
+                    continue
+                watching = True
+                if now - task.assigned_at > threshold:
+                    stragglers.append((task, job))
+
+        if watching:
+            # Look again after REBALANCE_INTERVAL even if no message arrives
+            self._rebalance_pending = True
+
+        stragglers.sort(key=lambda entry: entry[0].assigned_at)
+        for task, job in stragglers:
+            target = self._worker_index.pop()
+            if target is None:
+                break
+            if target.current_tasks >= target.max_tasks:
+                # Only idle slots take backups, so tasks queued behind others are not delayed
+                self._worker_index.update(target)
+                break
+            if target.worker_id in task.holders:
+                self._worker_index.update(target)
+                continue
+
+            task.speculated = True
+            task.holders.add(target.worker_id)
+            target.add_task(task)
+            self.task_queue.assigned(job)
+            self._worker_index.update(target)
+            self._send_tasks(target, [task])
+            self._tasks_speculated += 1
+            logger.info(f"Started a backup of straggling task {task.task_id} on worker {target.name}")
+
+    def _send_tasks(self, worker: WorkerInfo, tasks: List[Task]):
+        """Queue tasks for a worker, preceded by any objects and functions it has not seen yet."""
+        # Ship shared objects before the functions and tasks that reference them
+        object_hashes = set()
+        for func_hash in set(task.func_hash for task in tasks if task.func_hash):
+            object_hashes |= self.function_registry.get_refs(func_hash)
+        for task in tasks:
+            object_hashes |= find_refs(task.args) | find_refs(task.kwargs)
+        self._push_objects(worker, object_hashes)
+        
+        # Ship the function once per worker before the first task that needs it
+        for task in tasks:
+            if task.func_hash and task.func_hash not in worker.known_functions:
+                blob = self.function_registry.get(task.func_hash)
+                worker.send(MessageType.REGISTER_FUNCTION, {
+                    "func_hash": task.func_hash,
+                    "func_blob": blob,
+                })
+                worker.known_functions.add(task.func_hash)
+        
+        # Jobs may override compression; a mixed batch falls back to adaptive choice
+        compression = tasks[0].compression
+        if any(task.compression != compression for task in tasks):
+            compression = None
+        
+        for start in range(0, len(tasks), MAX_TASKS_PER_BATCH):
+            frame_tasks = tasks[start:start + MAX_TASKS_PER_BATCH]
+            if len(frame_tasks) == 1:
+                worker.send(MessageType.TASK_ASSIGNMENT, frame_tasks[0].to_dict(), compression)
+            else:
+                worker.send(
+                    MessageType.TASK_BATCH,
+                    {"tasks": [task.to_dict() for task in frame_tasks]},
+                    compression
+                )
+    
+    def _push_objects(self, worker: WorkerInfo, object_hashes):
+        """Send shared objects the worker has not received yet."""
+        for object_hash in object_hashes:
+            if object_hash in worker.known_objects:
+                continue
+            blob = self.object_store.get(object_hash)
+            if blob is None:
+                # Released; the worker reports it missing and the task fails
+                continue
+            worker.send(MessageType.PUT_OBJECT, {
+                "object_hash": object_hash,
+                "blob": blob,
+            })
+            worker.known_objects.add(object_hash)
+    
+    def _write_to_worker(self, worker: WorkerInfo):
+        """
+        Send a worker's queued messages until it stops.
+        
+        Each worker has its own writer thread, so serialization and a slow
+        worker's full TCP buffer never hold up the coordinator lock or other
+        workers. A failed send marks the worker dead, which requeues its tasks.
+        """
+        while True:
+            item = worker.outbox.get()
+            if item is None or not worker.is_alive:
+                break
+            msg_type, payload, compress = item
+            try:
+                Protocol.send_message(
+                    worker.socket, msg_type, payload,
+                    compress=compress, compressor=worker.compressor, backlog=not worker.outbox.empty()
+                )
+            except Exception as e:
+                logger.error(f"Failed to send to worker {worker.name}: {e}")
+                with self._lock:
+                    if worker.is_alive:
+                        self._mark_worker_dead(worker)
+                try:
+                    # Wake the worker's reader thread
+                    worker.socket.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                break
     
     def _check_worker_health(self):
         """Periodically check worker health and mark dead workers."""
@@ -570,25 +1495,35 @@ class Coordinator:
             current_time = time.time()
             
             with self._lock:
-                for worker_id, worker in self.workers.items():
+                for worker in list(self.workers.values()):
                     if worker.is_alive:
-                        time_since_heartbeat = current_time - worker.last_heartbeat
+                        time_since_heartbeat = current_time - worker.last_seen
                         
                         if time_since_heartbeat > self.worker_timeout:
                             logger.warning(f"Worker {worker.name} timed out")
-                            worker.is_alive = False
-                            
-                            # Unregister from auth manager
-                            self.auth_manager.unregister_connection(worker.name)
-                            
-                            # Redistribute its tasks
-                            for task_id, task in list(self.pending_tasks.items()):
-                                if task.worker_id == worker_id and task.status == TaskStatus.ASSIGNED:
-                                    logger.info(f"Redistributing task {task_id[:8]}")
-                                    task.status = TaskStatus.PENDING
-                                    task.worker_id = None
-                                    self.task_queue.append(task)
-    
-    def _redistribute_failed_tasks(self):
-        """Redistribute tasks from failed workers."""
-        self._distribute_tasks()
+                            self._mark_worker_dead(worker)
+    
+    def _mark_worker_dead(self, worker: WorkerInfo):
+        """
+        Mark a worker as dead, forget it and requeue every task assigned to it.
+        
+        This covers tasks still queued on the worker by prefetching as well as
+        running ones. They go back to the front of the queue in their original
+        order. Must be called with the lock held.
+        """
+        worker.is_alive = False
+        worker.close()  # Stop writing to the worker
+        self.workers.pop(worker.worker_id, None)
+        
+        # Unregister from auth manager
+        if self.auth_manager:
+            self.auth_manager.unregister_connection(worker.name)
+        
+        # Only the worker's own in-flight tasks are visited, not every pending task
+        for task in reversed(list(worker.in_flight.values())):
+            logger.info(f"Redistributing task {task.task_id}")
+            self._unassign(task, worker.worker_id, requeue=True)
+        worker.in_flight.clear()
+        worker.async_tasks = 0
+        self._reindex(worker)
+        self._dispatch_needed.set()
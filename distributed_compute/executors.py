@@ -0,0 +1,454 @@
+"""
+Execution backends used by workers to run tasks.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+import cloudpickle
+import psutil
+
+from .objects import ObjectCache, find_refs, resolve_refs, resolving
+from .registry import FunctionCache, hash_function_blob
+from .task import Task
+
+
+def execute_task(func: Callable, task_id: str, args: tuple, kwargs: dict, batch: bool = False) -> tuple:
+    """
+    Run a task and capture its outcome.
+
+    Returns:
+        Tuple of (ok, result or error message, execution time in seconds)
+    """
+    task = Task(func=func, args=args, kwargs=kwargs, task_id=task_id)
+    task.batch = batch
+    try:
+        result = task.execute()
+        return True, result, task.get_execution_time()
+    except Exception as e:
+        return False, str(e), task.get_execution_time()
+
+
+async def execute_task_async(func: Callable, task_id: str, args: tuple, kwargs: dict,
+                             batch: bool = False) -> tuple:
+    """Await a coroutine function's task and capture its outcome, like execute_task()."""
+    task = Task(func=func, args=args, kwargs=kwargs, task_id=task_id)
+    task.batch = batch
+    try:
+        result = await task.execute_async()
+        return True, result, task.get_execution_time()
+    except Exception as e:
+        return False, str(e), task.get_execution_time()
+
+
+# Functions and shared objects deserialized inside a pool child process
+_child_functions = FunctionCache()
+_child_objects = ObjectCache()
+
+# Reply of a child that was sent a function hash it no longer has cached
+_NEED_FUNCTION = "need_function"
+
+
+def _send_pickled(conn, obj):
+    """
+    Send an object over a child pipe with cloudpickle.
+
+    Connection.send() uses plain pickle, which cannot pickle instances of
+    classes that cloudpickle rebuilt by value from the caller's __main__.
+    """
+    conn.send_bytes(cloudpickle.dumps(obj))
+
+
+def _receive_pickled(conn):
+    return cloudpickle.loads(conn.recv_bytes())
+
+
+def _run_child(conn, spill_dir: str):
+    """
+    Main loop of a ProcessExecutor child: run tasks sent over conn until told to stop.
+
+    Each request is (func_hash, func_blob, task_id, args, kwargs, batch). The
+    blob is None when the parent has sent this child the function before; a
+    child that has since evicted it replies _NEED_FUNCTION instead.
+    """
+    _child_objects.spill_dir = spill_dir
+    while True:
+        try:
+            blob = conn.recv_bytes()
+        except EOFError:
+            return  # The worker process is gone
+        try:
+            request = cloudpickle.loads(blob)
+        except Exception as e:
+            # E.g. an argument's class cannot be imported in the child
+            _send_pickled(conn, (False, f"Failed to receive task: {e}", 0.0))
+            continue
+        if request is None:
+            return
+
+        func_hash, func_blob, task_id, args, kwargs, batch = request
+        try:
+            if func_blob is not None:
+                with resolving(_child_objects):
+                    _child_functions.add(func_hash, func_blob)
+            func = _child_functions.get(func_hash)
+            if func is None:
+                _send_pickled(conn, _NEED_FUNCTION)
+                continue
+            args = resolve_refs(args, _child_objects)
+            kwargs = resolve_refs(kwargs, _child_objects)
+            outcome = execute_task(func, task_id, args, kwargs, batch)
+        except Exception as e:
+            outcome = (False, str(e), 0.0)
+
+        try:
+            blob = cloudpickle.dumps(outcome)
+        except Exception as e:
+            blob = cloudpickle.dumps((False, f"Failed to send result: {e}", outcome[2]))
+        conn.send_bytes(blob)
+
+
+class _Child:
+    """A warm ProcessExecutor child and what the parent has sent it."""
+
+    def __init__(self, context, spill_dir: str):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_run_child, args=(child_conn, spill_dir), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.functions = set()  # Function hashes whose blob this child has received
+        self.tasks_run = 0
+
+    def rss(self) -> int:
+        """Resident memory of the child process in bytes."""
+        return psutil.Process(self.process.pid).memory_info().rss
+
+    def stop(self):
+        """Ask the child to exit once its current task is done, killing it if it does not."""
+        try:
+            _send_pickled(self.conn, None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class TaskExecutor:
+    """
+    Base class for worker execution backends.
+
+    Executors run tasks and return a Future resolving to the
+    (ok, value, execution_time) tuple produced by execute_task().
+    """
+
+    name = None
+    in_process = True  # Tasks run in the worker process and share its object cache
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+
+    def submit(self, func: Callable, task_data: dict, func_blob: Optional[bytes] = None) -> Future:
+        """
+        Schedule a task for execution.
+
+        Args:
+            func: Deserialized task function
+            task_data: Task payload received from the coordinator
+            func_blob: Serialized function, if available
+        """
+        raise NotImplementedError
+
+    def add_object(self, object_hash: str, blob: bytes):
+        """Make a shared object received by the worker available to tasks."""
+        pass
+
+    def discard_object(self, object_hash: str):
+        """Forget a shared object the worker evicted from its cache."""
+        pass
+
+    def shutdown(self):
+        """Release the backend's resources."""
+        pass
+
+
+class InlineExecutor(TaskExecutor):
+    """Runs each task synchronously in the calling thread."""
+
+    name = "inline"
+
+    def __init__(self, max_workers: Optional[int] = None):
+        super().__init__(1)
+
+    def submit(self, func: Callable, task_data: dict, func_blob: Optional[bytes] = None) -> Future:
+        future = Future()
+        future.set_result(execute_task(
+            func, task_data["task_id"], task_data["args"], task_data["kwargs"],
+            task_data.get("batch", False)
+        ))
+        return future
+
+
+class ThreadExecutor(TaskExecutor):
+    """Runs tasks on a fixed-size pool of reusable threads."""
+
+    name = "thread"
+
+    def __init__(self, max_workers: Optional[int] = None):
+        super().__init__(max_workers or 2)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="task")
+
+    def submit(self, func: Callable, task_data: dict, func_blob: Optional[bytes] = None) -> Future:
+        return self._pool.submit(
+            execute_task, func, task_data["task_id"], task_data["args"], task_data["kwargs"],
+            task_data.get("batch", False)
+        )
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+class AsyncExecutor(TaskExecutor):
+    """
+    Runs coroutine functions on a dedicated asyncio event loop thread.
+
+    Tasks await I/O concurrently on the one loop instead of each holding a
+    thread, so max_workers can be in the thousands.
+    """
+
+    name = "async"
+
+    def __init__(self, max_workers: Optional[int] = None):
+        super().__init__(max_workers or 1000)
+        self._loop = asyncio.new_event_loop()
+        self._slots = None  # Semaphore of max_workers, created on the loop
+        self._thread = threading.Thread(target=self._loop.run_forever, name="task-async", daemon=True)
+        self._thread.start()
+
+    def submit(self, func: Callable, task_data: dict, func_blob: Optional[bytes] = None) -> Future:
+        return asyncio.run_coroutine_threadsafe(self._execute(func, task_data), self._loop)
+
+    async def _execute(self, func: Callable, task_data: dict) -> tuple:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        async with self._slots:
+            return await execute_task_async(
+                func, task_data["task_id"], task_data["args"], task_data["kwargs"],
+                task_data.get("batch", False)
+            )
+
+    def shutdown(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+class ProcessExecutor(TaskExecutor):
+    """
+    Runs tasks on a pool of warm, long-lived child processes, one per CPU by default.
+
+    Each child is started once and fed tasks over its own pipe by a thread in
+    the worker, so tasks pay neither interpreter startup nor imports. A
+    function blob is sent to a child only the first time that child runs
+    the function; the child keeps the deserialized function, and the modules
+    it imported, for later tasks of the job. Shared objects are written to a
+    temporary directory that children load them from, once per child. A
+    file is deleted once the worker evicts its object and no queued or
+    running task refers to it.
+
+    Children can be recycled after max_tasks_per_child tasks or once their
+    resident memory exceeds max_child_memory bytes, to contain leaks in task
+    code; the replacement is started straight away, before the next task.
+    As with multiprocessing, scripts that start a worker with this backend
+    need an ``if __name__ == "__main__":`` guard.
+    """
+
+    name = "process"
+    in_process = False
+
+    def __init__(self, max_workers: Optional[int] = None, max_tasks_per_child: Optional[int] = None,
+                 max_child_memory: Optional[int] = None):
+        super().__init__(max_workers or psutil.cpu_count() or 1)
+        if max_tasks_per_child is not None and max_tasks_per_child < 1:
+            raise ValueError(f"max_tasks_per_child must be at least 1, got {max_tasks_per_child}")
+        self.max_tasks_per_child = max_tasks_per_child
+        self.max_child_memory = max_child_memory
+        self._context = multiprocessing.get_context()
+        self._spill_dir = tempfile.mkdtemp(prefix="distcompute-objects-")
+        # Also removes the directory if the worker exits without shutting down
+        self._remove_spill_dir = weakref.finalize(self, shutil.rmtree, self._spill_dir, ignore_errors=True)
+        self._queue = queue.Queue()  # (future, func_hash, func_blob, task_data, refs), or None to stop a feeder
+        self._object_users = {}  # object_hash -> number of unfinished tasks referring to it
+        self._discarded = set()  # Evicted objects whose files are kept for unfinished tasks
+        self._objects_lock = threading.Lock()
+        self._shutdown = False
+        self._threads = []
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._feed_child, name=f"task-process-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, func: Callable, task_data: dict, func_blob: Optional[bytes] = None) -> Future:
+        if self._shutdown:
+            raise RuntimeError("Executor has been shut down")
+
+        func_hash = task_data.get("func_hash")
+        if func_blob is None or func_hash is None:
+            func_blob = cloudpickle.dumps(func)
+            func_hash = hash_function_blob(func_blob)
+
+        # Keep the spill files of the task's objects until it is done
+        refs = find_refs(task_data["args"]) | find_refs(task_data["kwargs"])
+        with self._objects_lock:
+            for object_hash in refs:
+                self._object_users[object_hash] = self._object_users.get(object_hash, 0) + 1
+
+        future = Future()
+        self._queue.put((future, func_hash, func_blob, task_data, refs))
+        return future
+
+    def _feed_child(self):
+        """Run queued tasks on one child process, replacing the child when needed."""
+        child = _Child(self._context, self._spill_dir)
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            future, func_hash, func_blob, task_data, refs = item
+            if not future.set_running_or_notify_cancel():
+                self._release_objects(refs)
+                continue  # Revoked while queued
+
+            try:
+                outcome = self._run_on_child(child, func_hash, func_blob, task_data)
+            except (EOFError, OSError) as e:
+                # The child died (e.g. killed by the OS); start a fresh one
+                self._release_objects(refs)
+                future.set_exception(BrokenProcessPool(
+                    f"Child process exited unexpectedly (exit code {child.process.exitcode}): {e}"
+                ))
+                child.stop()
+                child = _Child(self._context, self._spill_dir)
+                continue
+            except Exception as e:
+                # The task itself could not be sent, e.g. unpicklable arguments
+                self._release_objects(refs)
+                future.set_exception(e)
+                continue
+
+            self._release_objects(refs)
+            future.set_result(outcome)
+            child.tasks_run += 1
+            if self._should_recycle(child):
+                child.stop()
+                child = _Child(self._context, self._spill_dir)
+        child.stop()
+
+    def _run_on_child(self, child: _Child, func_hash: str, func_blob: bytes, task_data: dict) -> tuple:
+        """Send a task to a child and wait for its (ok, value, execution_time) reply."""
+        request = [
+            func_hash, None if func_hash in child.functions else func_blob, task_data["task_id"],
+            task_data["args"], task_data["kwargs"], task_data.get("batch", False)
+        ]
+        _send_pickled(child.conn, tuple(request))
+        reply = _receive_pickled(child.conn)
+        if reply == _NEED_FUNCTION:
+            request[1] = func_blob
+            _send_pickled(child.conn, tuple(request))
+            reply = _receive_pickled(child.conn)
+        child.functions.add(func_hash)
+        return reply
+
+    def _should_recycle(self, child: _Child) -> bool:
+        if self.max_tasks_per_child and child.tasks_run >= self.max_tasks_per_child:
+            return True
+        if self.max_child_memory:
+            try:
+                return child.rss() > self.max_child_memory
+            except psutil.Error:
+                return True
+        return False
+
+    def add_object(self, object_hash: str, blob: bytes):
+        with self._objects_lock:
+            self._discarded.discard(object_hash)
+        path = os.path.join(self._spill_dir, object_hash)
+        if not os.path.exists(path):
+            # Write then rename so children never read a partial file
+            with open(path + ".tmp", "wb") as f:
+                f.write(blob)
+            os.replace(path + ".tmp", path)
+
+    def discard_object(self, object_hash: str):
+        with self._objects_lock:
+            if object_hash in self._object_users:
+                self._discarded.add(object_hash)
+                return
+        self._remove_object_file(object_hash)
+
+    def _release_objects(self, object_hashes: set):
+        """Drop a finished task's hold on its objects, deleting the files of evicted ones."""
+        unused = []
+        with self._objects_lock:
+            for object_hash in object_hashes:
+                count = self._object_users.pop(object_hash) - 1
+                if count:
+                    self._object_users[object_hash] = count
+                elif object_hash in self._discarded:
+                    self._discarded.discard(object_hash)
+                    unused.append(object_hash)
+        for object_hash in unused:
+            self._remove_object_file(object_hash)
+
+    def _remove_object_file(self, object_hash: str):
+        try:
+            os.remove(os.path.join(self._spill_dir, object_hash))
+        except FileNotFoundError:
+            pass
+
+    def shutdown(self):
+        if self._shutdown:
+            return
+        self._shutdown = True
+        # Drop queued tasks; children exit once their current task is done
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            item[0].cancel()
+        for _ in self._threads:
+            self._queue.put(None)
+        self._remove_spill_dir()
+
+
+EXECUTORS = {
+    InlineExecutor.name: InlineExecutor,
+    ThreadExecutor.name: ThreadExecutor,
+    ProcessExecutor.name: ProcessExecutor,
+}
+
+
+def create_executor(kind: str, max_workers: Optional[int] = None, **options) -> TaskExecutor:
+    """
+    Create an execution backend by name.
+
+    Args:
+        kind: One of "inline", "thread" or "process"
+        max_workers: Number of concurrent tasks; backend default if None
+        **options: Backend-specific options, such as max_tasks_per_child for "process"
+    """
+    try:
+        executor_class = EXECUTORS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown executor '{kind}', expected one of: {', '.join(EXECUTORS)}")
+    return executor_class(max_workers, **options)
@@ -0,0 +1,82 @@
+"""
+Job representation: the tasks, results and accounting of one map() call.
+"""
+
+import queue
+import time
+from collections import deque
+from typing import Optional
+
+
+# Number of recent task latencies kept per job, and the number needed to spot stragglers
+LATENCY_SAMPLES = 1000
+MIN_LATENCY_SAMPLES = 5
+
+
+class Job:
+    """
+    A batch of tasks submitted together by one map() call or client.
+
+    Each job has its own task queue and result channel, so concurrent jobs
+    on one coordinator never see each other's results. Worker slots are
+    shared between active jobs in proportion to their weights.
+    """
+
+    def __init__(self, job_id: str, weight: float = 1.0):
+        """
+        Initialize a job.
+
+        Args:
+            job_id: Unique job ID, also part of the job's task IDs
+            weight: Relative share of worker slots while other jobs compete for them
+
+        Raises:
+            ValueError: If weight is not positive
+        """
+        if not weight > 0:
+            raise ValueError(f"Job weight must be positive, got {weight!r}")
+
+        self.job_id = job_id
+        self.weight = weight
+        self.queue = deque()  # Tasks waiting for a worker
+        self.results = queue.Queue()  # (task_id, result, error) of finished tasks
+        self.active = 0  # Task copies assigned to workers that have not finished
+        self.pending = set()  # IDs of submitted tasks without a result yet
+        self.is_async = False  # The job's function is a coroutine function
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)  # Assignment-to-result seconds of recent tasks
+        self.tasks_submitted = 0
+        self.tasks_completed = 0
+        self.tasks_failed = 0
+        self.created_at = time.time()
+
+    def straggler_threshold(self, percentile: float, factor: float) -> Optional[float]:
+        """
+        Seconds after which a running task counts as a straggler.
+
+        This is factor times the given percentile (0-1) of recent task
+        latencies, or None until enough tasks have finished.
+        """
+        if len(self.latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[int(percentile * (len(latencies) - 1))] * factor
+
+    def task_id(self, suffix: str) -> str:
+        """Return a task ID that is unique across jobs, such as "task-0@job-3"."""
+        return f"{suffix}@{self.job_id}"
+
+    def get_stats(self) -> dict:
+        """Get the job's accounting."""
+        return {
+            "job_id": self.job_id,
+            "weight": self.weight,
+            "tasks_submitted": self.tasks_submitted,
+            "tasks_queued": len(self.queue),
+            "tasks_running": self.active,
+            "tasks_completed": self.tasks_completed,
+            "tasks_failed": self.tasks_failed,
+            "elapsed": time.time() - self.created_at,
+        }
+
+    def __repr__(self):
+        return f"Job(id={self.job_id}, weight={self.weight}, queued={len(self.queue)}, active={self.active})"
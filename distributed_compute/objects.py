@@ -0,0 +1,280 @@
+"""
+Content-addressed object store for large objects shared by many tasks.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Optional, Set
+
+import cloudpickle
+
+
+# find_refs() only looks this many containers deep, and skips larger containers
+REF_SCAN_DEPTH = 4
+REF_SCAN_ITEMS = 10000
+
+# Per-thread pickling state: refs seen while serializing, or the cache refs resolve from
+_state = threading.local()
+
+
+class ObjectRef:
+    """
+    Lightweight reference to an object placed in the coordinator's object store.
+
+    Pass it to map() as (part of) an item, or capture it in the task function.
+    Each worker fetches the object once; tasks receive the object itself.
+    """
+
+    __slots__ = ("object_hash", "size")
+
+    def __init__(self, object_hash: str, size: int):
+        self.object_hash = object_hash
+        self.size = size  # Serialized size in bytes
+
+    def __reduce__(self):
+        collected = getattr(_state, "collected", None)
+        if collected is not None:
+            collected.add(self.object_hash)
+        return _rebuild_ref, (self.object_hash, self.size)
+
+    def __eq__(self, other):
+        return isinstance(other, ObjectRef) and other.object_hash == self.object_hash
+
+    def __hash__(self):
+        return hash(self.object_hash)
+
+    def __repr__(self):
+        return f"ObjectRef({self.object_hash[:8]}, {self.size} bytes)"
+
+
+def _rebuild_ref(object_hash: str, size: int):
+    """Unpickle a ref, replacing it with the object itself inside resolving()."""
+    cache = getattr(_state, "cache", None)
+    if cache is not None:
+        obj = cache.load(object_hash)
+        if obj is not _MISSING:
+            return obj
+        _state.missing.add(object_hash)
+    return ObjectRef(object_hash, size)
+
+
+@contextmanager
+def collecting_refs():
+    """Collect the hashes of every ObjectRef pickled in this thread within the block."""
+    previous = getattr(_state, "collected", None)
+    collected = set()
+    _state.collected = collected
+    try:
+        yield collected
+    finally:
+        _state.collected = previous
+
+
+@contextmanager
+def resolving(cache: "ObjectCache"):
+    """
+    Replace ObjectRefs with their objects while unpickling in this thread.
+
+    Yields the set of hashes that could not be resolved; those refs are left
+    as ObjectRef instances.
+    """
+    previous = getattr(_state, "cache", None), getattr(_state, "missing", None)
+    missing = set()
+    _state.cache, _state.missing = cache, missing
+    try:
+        yield missing
+    finally:
+        _state.cache, _state.missing = previous
+
+
+def hash_object_blob(blob: bytes) -> str:
+    """Return the content hash used to identify a serialized object."""
+    return hashlib.sha256(blob).hexdigest()
+
+
+def find_refs(obj, depth: int = 0) -> Set[str]:
+    """Hashes of the ObjectRefs in obj, looking inside nested lists, tuples, sets and dicts."""
+    if isinstance(obj, ObjectRef):
+        return {obj.object_hash}
+
+    refs = set()
+    obj_type = type(obj)
+    if depth >= REF_SCAN_DEPTH:
+        return refs
+    if obj_type is dict and len(obj) <= REF_SCAN_ITEMS:
+        for value in obj.values():
+            refs |= find_refs(value, depth + 1)
+    elif obj_type in (list, tuple, set, frozenset) and len(obj) <= REF_SCAN_ITEMS:
+        for value in obj:
+            refs |= find_refs(value, depth + 1)
+    return refs
+
+
+def resolve_refs(obj, cache: "ObjectCache", depth: int = 0):
+    """
+    Replace the ObjectRefs found by find_refs() with their objects.
+
+    Raises:
+        KeyError: If a referenced object is not in the cache
+    """
+    if isinstance(obj, ObjectRef):
+        value = cache.load(obj.object_hash)
+        if value is _MISSING:
+            raise KeyError(f"Object {obj.object_hash[:8]} is not available on this worker")
+        return value
+
+    obj_type = type(obj)
+    if depth >= REF_SCAN_DEPTH:
+        return obj
+    if obj_type is dict and len(obj) <= REF_SCAN_ITEMS:
+        return {key: resolve_refs(value, cache, depth + 1) for key, value in obj.items()}
+    if obj_type in (list, tuple, set, frozenset) and len(obj) <= REF_SCAN_ITEMS:
+        return obj_type(resolve_refs(value, cache, depth + 1) for value in obj)
+    return obj
+
+
+class ObjectStore:
+    """
+    Coordinator-side store of serialized shared objects.
+
+    Objects are cloudpickled once and stored under the hash of their bytes,
+    so scattering the same object twice yields the same ref. Like functions
+    in the FunctionRegistry, entries are reference counted.
+    """
+
+    def __init__(self):
+        self._blobs = {}  # object_hash -> serialized object
+        self._refcounts = {}  # object_hash -> number of active scatters
+        self._lock = threading.Lock()
+
+    def put(self, obj: Any) -> ObjectRef:
+        """
+        Serialize an object and store it.
+
+        Args:
+            obj: The object to store
+
+        Returns:
+            A reference to the stored object
+        """
+        blob = cloudpickle.dumps(obj)
+        object_hash = hash_object_blob(blob)
+
+        with self._lock:
+            if object_hash not in self._blobs:
+                self._blobs[object_hash] = blob
+            self._refcounts[object_hash] = self._refcounts.get(object_hash, 0) + 1
+
+        return ObjectRef(object_hash, len(blob))
+
+    def release(self, object_hash: str):
+        """Drop one reference, discarding the blob once unused."""
+        with self._lock:
+            count = self._refcounts.get(object_hash, 0) - 1
+            if count <= 0:
+                self._refcounts.pop(object_hash, None)
+                self._blobs.pop(object_hash, None)
+            else:
+                self._refcounts[object_hash] = count
+
+    def get(self, object_hash: str) -> Optional[bytes]:
+        """Get the serialized object for a hash, or None if unknown."""
+        with self._lock:
+            return self._blobs.get(object_hash)
+
+    def __contains__(self, object_hash: str) -> bool:
+        with self._lock:
+            return object_hash in self._blobs
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._blobs)
+
+
+# Returned by ObjectCache.load() for objects it does not have
+_MISSING = object()
+
+
+class ObjectCache:
+    """
+    Worker-side LRU cache of deserialized shared objects, bounded in bytes.
+
+    The most recently added object is always kept, even if it alone exceeds
+    the limit. With a spill directory, objects that are not cached are loaded
+    from files named by their hash; process pool children use this to read
+    objects the worker process received.
+    """
+
+    def __init__(self, max_bytes: int = 1024 * 1024 * 1024, spill_dir: Optional[str] = None,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Maximum total serialized size of the cached objects (default: 1GB)
+            spill_dir: Directory to load uncached objects from, if any
+            on_evict: Called with the hash of each object evicted to stay within max_bytes
+        """
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.on_evict = on_evict
+        self._objects = OrderedDict()  # object_hash -> (object, serialized size)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def add(self, object_hash: str, blob) -> Any:
+        """
+        Deserialize an object blob and cache it.
+
+        Returns:
+            The deserialized object
+        """
+        with self._lock:
+            if object_hash in self._objects:
+                self._objects.move_to_end(object_hash)
+                return self._objects[object_hash][0]
+
+        obj = cloudpickle.loads(blob)
+
+        evicted = []
+        with self._lock:
+            if object_hash not in self._objects:
+                self._objects[object_hash] = (obj, len(blob))
+                self._size += len(blob)
+            self._objects.move_to_end(object_hash)
+            while self._size > self.max_bytes and len(self._objects) > 1:
+                evicted_hash, (_, size) = self._objects.popitem(last=False)
+                self._size -= size
+                evicted.append(evicted_hash)
+
+        if self.on_evict:
+            for evicted_hash in evicted:
+                self.on_evict(evicted_hash)
+        return obj
+
+    def load(self, object_hash: str) -> Any:
+        """Get an object, reading it from the spill directory if needed; _MISSING if unavailable."""
+        with self._lock:
+            entry = self._objects.get(object_hash)
+            if entry is not None:
+                self._objects.move_to_end(object_hash)
+                return entry[0]
+
+        if self.spill_dir:
+            try:
+                with open(os.path.join(self.spill_dir, object_hash), "rb") as f:
+                    return self.add(object_hash, f.read())
+            except FileNotFoundError:
+                pass
+        return _MISSING
+
+    def __contains__(self, object_hash: str) -> bool:
+        with self._lock:
+            return object_hash in self._objects
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._objects)
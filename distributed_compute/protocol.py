@@ -2,17 +2,48 @@
 Network protocol definitions for communication between coordinator and workers.
 """
 
-import json
+import pickle
 import struct
 import socket
 import cloudpickle
-import zlib
+from collections import deque
+from typing import List, Optional, Union
+
+from .compression import AdaptiveCompressor, decompress, parse_option, timed_compress
 
 
 # Maximum size for a single message chunk (4MB)
 MAX_CHUNK_SIZE = 4 * 1024 * 1024
-# Compress payloads larger than this threshold (512KB)
+# Without a negotiated compressor, compress payloads larger than this threshold (512KB)
 COMPRESSION_THRESHOLD = 512 * 1024
+# Compression used when forced on, or above the threshold without a compressor
+DEFAULT_COMPRESSION = ("zlib", 6)
+
+# Frame header: [4 bytes length][1 byte flags]
+HEADER = struct.Struct('!IB')
+# Frame flags
+FLAG_COMPRESSED = 0x01
+FLAG_RAW = 0x02  # Frame carries a raw slice of a chunked message, not a pickled message
+FLAG_OUT_OF_BAND = 0x04  # Raw pickle protocol 5 buffers follow the frame
+FLAG_COMPACT = 0x08  # Frame body is a struct-encoded control message, not a pickle
+# Bits 4-5 hold the codec id of a compressed frame (0 = zlib)
+CODEC_SHIFT = 4
+CODEC_MASK = 0x30
+
+# Pickle protocol 5 out-of-band buffers (Python 3.8+)
+HAS_OUT_OF_BAND = hasattr(pickle, "PickleBuffer")
+# Buffers at least this large are sent as raw data after the pickle (64KB)
+OUT_OF_BAND_THRESHOLD = 64 * 1024
+# How deep and how wide payload containers are scanned for large bytes objects; each
+# assignment or result of a batch frame is scanned as deep as a message of its own
+OUT_OF_BAND_SCAN_DEPTH = 4
+OUT_OF_BAND_SCAN_ITEMS = 10000
+# Buffer table of an out-of-band frame: [4 bytes count] then per buffer
+# [8 bytes size on the wire][1 byte codec: 0 = raw, otherwise codec id + 1]
+BUFFER_COUNT = struct.Struct('!I')
+BUFFER_ENTRY = struct.Struct('!QB')
+# Maximum number of buffers handed to a single sendmsg() call
+MAX_IOVECS = 64
 
 
 class MessageType:
@@ -29,122 +60,551 @@ class MessageType:
     SUBMIT_JOB = "submit_job"
     JOB_RESULT = "job_result"
     JOB_ERROR = "job_error"
+    # Function registry: functions are shipped once per worker, tasks carry the hash
+    REGISTER_FUNCTION = "register_function"
+    FUNCTION_MISSING = "function_missing"
+    # Several assignments or results packed into one frame
+    TASK_BATCH = "task_batch"
+    RESULT_BATCH = "result_batch"
+    # Object store: shared objects are shipped once per worker, tasks carry ObjectRefs
+    PUT_OBJECT = "put_object"
+    OBJECT_MISSING = "object_missing"
+    # Work stealing: the coordinator takes back queued tasks a worker has not started
+    TASK_REVOKE = "task_revoke"
+    TASKS_REVOKED = "tasks_revoked"
     # New message types for chunked transmission
     CHUNK_START = "chunk_start"
     CHUNK_DATA = "chunk_data"
     CHUNK_END = "chunk_end"
 
 
+# Numeric message type codes used in compact frames
+MESSAGE_CODES = {
+    message_type: code for code, message_type in enumerate([
+        MessageType.REGISTER_WORKER,
+        MessageType.WORKER_REGISTERED,
+        MessageType.AUTH_FAILED,
+        MessageType.HEARTBEAT,
+        MessageType.TASK_ASSIGNMENT,
+        MessageType.TASK_RESULT,
+        MessageType.TASK_ERROR,
+        MessageType.WORKER_STATUS,
+        MessageType.SHUTDOWN,
+        MessageType.SUBMIT_JOB,
+        MessageType.JOB_RESULT,
+        MessageType.JOB_ERROR,
+        MessageType.REGISTER_FUNCTION,
+        MessageType.FUNCTION_MISSING,
+        MessageType.CHUNK_START,
+        MessageType.CHUNK_DATA,
+        MessageType.CHUNK_END,
+        MessageType.TASK_BATCH,
+        MessageType.RESULT_BATCH,
+        MessageType.PUT_OBJECT,
+        MessageType.OBJECT_MISSING,
+        MessageType.TASK_REVOKE,
+        MessageType.TASKS_REVOKED,
+    ], start=1)
+}
+MESSAGE_NAMES = {code: message_type for message_type, code in MESSAGE_CODES.items()}
+
+# Messages that carry user functions or user data need cloudpickle, which also
+# serializes functions and classes defined in __main__ by value. Everything
+# else is built by the library itself and uses the faster plain pickle.
+CLOUDPICKLE_MESSAGE_TYPES = frozenset([
+    MessageType.TASK_ASSIGNMENT,
+    MessageType.TASK_RESULT,
+    MessageType.TASK_BATCH,
+    MessageType.RESULT_BATCH,
+    MessageType.SUBMIT_JOB,
+    MessageType.JOB_RESULT,
+])
+
+# Compact frame header: [1 byte type code][1 byte value tag][2 bytes field mask]
+# [1 byte task id length][1 byte worker id length], followed by the ids
+COMPACT_HEADER = struct.Struct('!BBHBB')
+# Value tags for the single value carried by a compact frame
+VALUE_NONE = 0
+VALUE_FALSE = 1
+VALUE_TRUE = 2
+VALUE_INT = 3
+VALUE_FLOAT = 4
+VALUE_STR = 5
+VALUE_BYTES = 6
+INT64 = struct.Struct('!q')
+FLOAT64 = struct.Struct('!d')
+# Strings and bytes results up to this size are sent compactly
+MAX_COMPACT_VALUE_SIZE = 1024
+# Heartbeat fields in bit order of the field mask; a heartbeat may carry any subset
+HEARTBEAT_FIELDS = (
+    ("current_tasks", struct.Struct('!I')),
+    ("tasks_completed", struct.Struct('!Q')),
+    ("tasks_failed", struct.Struct('!Q')),
+    ("cpu_percent", FLOAT64),
+    ("memory_available", struct.Struct('!Q')),
+    ("running_tasks", struct.Struct('!I')),
+    ("queued_tasks", struct.Struct('!I')),
+    ("async_tasks", struct.Struct('!I')),
+)
+_TASK_RESULT_KEYS = frozenset(["task_id", "result", "worker_id", "execution_time"])
+_TASK_ERROR_KEYS = frozenset(["task_id", "error", "worker_id"])
+
+
+def _encode_value(value) -> Optional[tuple]:
+    """Encode a scalar as (tag, data), or None if it has no compact form."""
+    value_type = type(value)
+    if value is None:
+        return VALUE_NONE, b''
+    if value_type is bool:
+        return (VALUE_TRUE if value else VALUE_FALSE), b''
+    if value_type is int:
+        if -2 ** 63 <= value < 2 ** 63:
+            return VALUE_INT, INT64.pack(value)
+        return None
+    if value_type is float:
+        return VALUE_FLOAT, FLOAT64.pack(value)
+    if value_type is str and len(value) <= MAX_COMPACT_VALUE_SIZE:
+        return VALUE_STR, value.encode('utf-8')
+    if value_type is bytes and len(value) <= MAX_COMPACT_VALUE_SIZE:
+        return VALUE_BYTES, value
+    return None
+
+
+def _decode_value(tag: int, data):
+    if tag == VALUE_NONE:
+        return None
+    if tag == VALUE_FALSE:
+        return False
+    if tag == VALUE_TRUE:
+        return True
+    if tag == VALUE_INT:
+        return INT64.unpack_from(data)[0]
+    if tag == VALUE_FLOAT:
+        return FLOAT64.unpack_from(data)[0]
+    if tag == VALUE_STR:
+        return bytes(data).decode('utf-8')
+    if tag == VALUE_BYTES:
+        return bytes(data)
+    raise ValueError(f"Unknown compact value tag {tag}")
+
+
+def _compact_header(message_type: str, tag: int, mask: int, task_id: str, worker_id) -> Optional[bytes]:
+    if type(task_id) is not str or type(worker_id) is not str:
+        return None
+    task_id = task_id.encode('utf-8')
+    worker_id = worker_id.encode('utf-8')
+    if len(task_id) > 255 or len(worker_id) > 255:
+        return None
+    return COMPACT_HEADER.pack(
+        MESSAGE_CODES[message_type], tag, mask, len(task_id), len(worker_id)
+    ) + task_id + worker_id
+
+
+def _encode_compact(message_type: str, payload: dict) -> Optional[bytes]:
+    """
+    Encode a hot control message without pickle.
+    
+    Handles heartbeats, task results with scalar values and task errors.
+    
+    Returns: The frame body, or None if the message has no compact form
+    """
+    if message_type == MessageType.HEARTBEAT:
+        mask = 0
+        parts = []
+        for bit, (key, field) in enumerate(HEARTBEAT_FIELDS):
+            if key in payload:
+                try:
+                    parts.append(field.pack(payload[key]))
+                except struct.error:
+                    return None
+                mask |= 1 << bit
+        if len(parts) + 1 != len(payload):
+            return None  # Unknown keys or no worker id
+        header = _compact_header(message_type, VALUE_NONE, mask, "", payload.get("worker_id"))
+        return header and header + b''.join(parts)
+    
+    if message_type == MessageType.TASK_RESULT:
+        if payload.keys() != _TASK_RESULT_KEYS or type(payload["execution_time"]) is not float:
+            return None
+        value = _encode_value(payload["result"])
+        if value is None:
+            return None
+        tag, data = value
+        header = _compact_header(message_type, tag, 0, payload["task_id"], payload["worker_id"])
+        return header and header + FLOAT64.pack(payload["execution_time"]) + data
+    
+    if message_type == MessageType.TASK_ERROR:
+        if payload.keys() != _TASK_ERROR_KEYS or type(payload["error"]) is not str:
+            return None
+        header = _compact_header(message_type, VALUE_STR, 0, payload["task_id"], payload["worker_id"])
+        return header and header + payload["error"].encode('utf-8')
+    
+    return None
+
+
+def _decode_compact(data) -> tuple:
+    """Decode a frame body produced by _encode_compact. Returns (message_type, payload)."""
+    code, tag, mask, task_id_length, worker_id_length = COMPACT_HEADER.unpack_from(data)
+    message_type = MESSAGE_NAMES[code]
+    data = memoryview(data)
+    offset = COMPACT_HEADER.size
+    task_id = bytes(data[offset:offset + task_id_length]).decode('utf-8')
+    offset += task_id_length
+    worker_id = bytes(data[offset:offset + worker_id_length]).decode('utf-8')
+    offset += worker_id_length
+    
+    if message_type == MessageType.HEARTBEAT:
+        payload = {"worker_id": worker_id}
+        for bit, (key, field) in enumerate(HEARTBEAT_FIELDS):
+            if mask & (1 << bit):
+                payload[key] = field.unpack_from(data, offset)[0]
+                offset += field.size
+        return message_type, payload
+    
+    if message_type == MessageType.TASK_RESULT:
+        execution_time = FLOAT64.unpack_from(data, offset)[0]
+        return message_type, {
+            "task_id": task_id,
+            "result": _decode_value(tag, data[offset + FLOAT64.size:]),
+            "worker_id": worker_id,
+            "execution_time": execution_time,
+        }
+    
+    if message_type == MessageType.TASK_ERROR:
+        return message_type, {
+            "task_id": task_id,
+            "error": _decode_value(tag, data[offset:]),
+            "worker_id": worker_id,
+        }
+    
+    raise ValueError(f"Message type {message_type} has no compact encoding")
+
+
+class _OutOfBandBytes:
+    """Wrapper that pickles a bytes object as an out-of-band buffer."""
+    
+    __slots__ = ("data",)
+    
+    def __init__(self, data: bytes):
+        self.data = data
+    
+    def __reduce_ex__(self, protocol):
+        # Rebuilt with a single copy out of the receive buffer
+        return bytes, (pickle.PickleBuffer(self.data),)
+
+
+def _mark_out_of_band(obj, depth: int = 0, memo: Optional[dict] = None):
+    """
+    Wrap large bytes and bytearray objects so that they are pickled out-of-band.
+    
+    The pickler writes bytes and bytearray in-band without consulting any
+    hook, so payload containers are scanned (to a bounded depth and width)
+    and rebuilt with wrapped values. Containers without large buffers are
+    returned as they are, and memo maps the id of each scanned object to
+    its replacement, so objects shared within the payload stay shared on
+    the receiving side. Objects with their own protocol 5 support, such as
+    NumPy arrays, need no wrapping.
+    """
+    obj_type = type(obj)
+    if obj_type is bytes or obj_type is bytearray:
+        if len(obj) < OUT_OF_BAND_THRESHOLD:
+            return obj
+    elif depth >= OUT_OF_BAND_SCAN_DEPTH or not (obj_type is dict or obj_type is list or obj_type is tuple):
+        return obj
+    elif len(obj) > OUT_OF_BAND_SCAN_ITEMS:
+        return obj
+    
+    if memo is None:
+        memo = {}
+    marked = memo.get(id(obj))
+    if marked is not None:
+        return marked
+    
+    if obj_type is bytes:
+        marked = _OutOfBandBytes(obj)
+    elif obj_type is bytearray:
+        # A writable PickleBuffer is rebuilt as the receive buffer itself, without copying
+        marked = pickle.PickleBuffer(obj)
+    elif obj_type is dict:
+        values = {key: _mark_out_of_band(value, depth + 1, memo) for key, value in obj.items()}
+        changed = any(values[key] is not value for key, value in obj.items())
+        marked = values if changed else obj
+    else:
+        values = [_mark_out_of_band(value, depth + 1, memo) for value in obj]
+        changed = any(new is not old for new, old in zip(values, obj))
+        marked = obj_type(values) if changed else obj
+    memo[id(obj)] = marked
+    return marked
+
+
+def _mark_message(message_type: str, payload: dict, memo: dict) -> dict:
+    """Mark the out-of-band buffers of a payload, scanning each message of a batch from its own root."""
+    if message_type == MessageType.TASK_BATCH:
+        return dict(payload, tasks=[_mark_out_of_band(task, 0, memo) for task in payload["tasks"]])
+    if message_type == MessageType.RESULT_BATCH:
+        return dict(payload, results=[
+            (result_type, _mark_out_of_band(result, 0, memo)) for result_type, result in payload["results"]
+        ])
+    return _mark_out_of_band(payload, 0, memo)
+
+
 class Protocol:
     """Handles message serialization and deserialization."""
     
     @staticmethod
-    def serialize_message(message_type: str, payload: dict, compress: bool = None) -> bytes:
+    def serialize_message(message_type: str, payload: dict, compress: Union[bool, str] = None,
+                          compressor: Optional[AdaptiveCompressor] = None) -> bytes:
         """
         Serialize a message with type and payload.
         
         Format: [4 bytes length][1 byte flags][message data]
-        Flags: bit 0 = compressed
+        Flags: bit 0 = compressed, bit 1 = raw chunk, bit 2 = out-of-band buffers follow,
+               bit 3 = compact control message, bits 4-5 = codec id
         
         Args:
             message_type: Type of message
             payload: Message payload
-            compress: Force compression on/off. If None, auto-decide based on size
+            compress: Force compression on/off, or a codec option such as "zlib-9" or "lz4".
+                      If None (or "auto"), the compressor decides, or it is based on size
+            compressor: The connection's adaptive compressor, if codecs were negotiated
         """
+        frame, _ = Protocol._serialize(message_type, payload, compress, compressor, out_of_band=False)
+        return frame
+    
+    @staticmethod
+    def serialize_frames(message_type: str, payload: dict, compress: Union[bool, str] = None,
+                         compressor: Optional[AdaptiveCompressor] = None) -> tuple:
+        """
+        Serialize a message, keeping large binary buffers out of the pickle.
+        
+        Buffers of at least OUT_OF_BAND_THRESHOLD bytes are collected through
+        pickle protocol 5 instead of being copied into the pickle stream. They
+        must be sent as raw data directly after the frame, in order. When
+        compression is forced, everything stays in-band so that it is all
+        compressed; in adaptive mode each buffer is compressed on its own.
+        
+        Returns: (frame, buffers)
+        """
+        out_of_band = HAS_OUT_OF_BAND and (compress is None or compress in ("auto", "none", False))
+        return Protocol._serialize(message_type, payload, compress, compressor, out_of_band)
+    
+    @staticmethod
+    def _compression_option(compress: Union[bool, str, None], size: int,
+                            compressor: Optional[AdaptiveCompressor]) -> Optional[tuple]:
+        """Decide how to compress data of the given size; None means uncompressed."""
+        if compress is None or compress == "auto":
+            if compressor is not None:
+                return compressor.choose(size)
+            return DEFAULT_COMPRESSION if size > COMPRESSION_THRESHOLD else None
+        if compress is True:
+            return DEFAULT_COMPRESSION
+        if compress is False:
+            return None
+        if compressor is not None:
+            return compressor.resolve(compress)
+        return parse_option(compress)
+    
+    @staticmethod
+    def _serialize(message_type: str, payload: dict, compress: Union[bool, str, None],
+                   compressor: Optional[AdaptiveCompressor], out_of_band: bool) -> tuple:
+        """Build a frame and the list of out-of-band buffers that follow it."""
+        body = _encode_compact(message_type, payload)
+        if body is not None:
+            return HEADER.pack(len(body), FLAG_COMPACT) + body, []
+        
         message = {
             "type": message_type,
             "payload": payload
         }
         
-        # Use cloudpickle to serialize the entire message (supports functions)
-        serialized = cloudpickle.dumps(message)
+        # Only user functions and data need cloudpickle
+        pickler = cloudpickle if message_type in CLOUDPICKLE_MESSAGE_TYPES else pickle
+        buffers = []
+        if out_of_band:
+            def collect(buffer):
+                try:
+                    raw = buffer.raw()
+                except BufferError:
+                    return True  # Non-contiguous buffers stay in-band
+                if raw.nbytes < OUT_OF_BAND_THRESHOLD:
+                    return True
+                buffers.append(raw)
+                return False
+            
+            marked = {"type": message_type, "payload": _mark_message(message_type, payload, {})}
+            serialized = Protocol._pickle(pickler, marked, protocol=5, buffer_callback=collect)
+        else:
+            serialized = Protocol._pickle(pickler, message, protocol=pickle.HIGHEST_PROTOCOL)
         
         # Decide on compression
         flags = 0
-        if compress is None:
-            compress = len(serialized) > COMPRESSION_THRESHOLD
-        
-        if compress:
-            serialized = zlib.compress(serialized, level=6)
-            flags |= 0x01  # Set compression flag
+        option = Protocol._compression_option(compress, len(serialized), compressor)
+        if option is not None:
+            serialized, codec_id = timed_compress(serialized, option, compressor)
+            flags |= FLAG_COMPRESSED | (codec_id << CODEC_SHIFT)
+        
+        if buffers:
+            flags |= FLAG_OUT_OF_BAND
+            table = [BUFFER_COUNT.pack(len(buffers))]
+            for i, buffer in enumerate(buffers):
+                codec = 0
+                option = Protocol._compression_option(compress, buffer.nbytes, compressor)
+                if option is not None:
+                    buffers[i], codec_id = timed_compress(buffer, option, compressor)
+                    codec = codec_id + 1
+                table.append(BUFFER_ENTRY.pack(len(buffers[i]), codec))
+            serialized = b''.join(table) + serialized
         
         # Prepend length (4 bytes) and flags (1 byte)
-        length = struct.pack('!I', len(serialized))
-        flags_byte = struct.pack('B', flags)
-        
-        return length + flags_byte + serialized
+        return HEADER.pack(len(serialized), flags) + serialized, buffers
+    
+    @staticmethod
+    def _pickle(pickler, message: dict, **kwargs) -> bytes:
+        """Pickle a message, falling back to cloudpickle if plain pickle cannot handle it."""
+        if pickler is cloudpickle:
+            return cloudpickle.dumps(message, **kwargs)
+        try:
+            return pickle.dumps(message, **kwargs)
+        except Exception:
+            return cloudpickle.dumps(message, **kwargs)
     
     @staticmethod
-    def deserialize_message(data: bytes, flags: int) -> tuple:
+    def deserialize_message(data, flags: int, buffers: Optional[List] = None) -> tuple:
         """
         Deserialize a message into type and payload.
         
         Args:
-            data: Serialized message data
+            data: Serialized message data (any bytes-like object, e.g. a memoryview)
             flags: Flags byte indicating compression, etc.
+            buffers: Out-of-band buffers received after the frame, if any
         
         Returns: (message_type, payload)
         """
+        if flags & FLAG_COMPACT:
+            return _decode_compact(data)
+        
+        if flags & FLAG_OUT_OF_BAND:
+            # Skip the buffer table; its sizes were used to receive the buffers
+            count = BUFFER_COUNT.unpack_from(data)[0]
+            data = memoryview(data)[BUFFER_COUNT.size + BUFFER_ENTRY.size * count:]
+        
         # Check if compressed
-        if flags & 0x01:
-            data = zlib.decompress(data)
+        if flags & FLAG_COMPRESSED:
+            data = decompress(data, (flags & CODEC_MASK) >> CODEC_SHIFT)
         
-        message = cloudpickle.loads(data)
+        if buffers:
+            message = cloudpickle.loads(data, buffers=buffers)
+        else:
+            message = cloudpickle.loads(data)
         return message["type"], message["payload"]
     
     @staticmethod
-    def send_message(sock: socket.socket, message_type: str, payload: dict, compress: bool = None):
+    def send_message(sock: socket.socket, message_type: str, payload: dict,
+                     compress: Union[bool, str] = None,
+                     compressor: Optional[AdaptiveCompressor] = None,
+                     backlog: bool = False):
         """
         Send a message through a socket.
-        For large messages, automatically chunks the transmission.
+        Large binary buffers are written straight from the payload objects with
+        scatter-gather I/O; other large messages are chunked automatically.
         
         Args:
             sock: Socket to send through
             message_type: Type of message
             payload: Message payload
-            compress: Force compression on/off
+            compress: Force compression on/off, or a codec option such as "zlib-9"
+            compressor: The connection's adaptive compressor; also fed with send timings
+            backlog: More messages are queued behind this one, so the compressor's
+                     send window stays open and the link is measured over all of them
+        """
+        data, buffers = Protocol.serialize_frames(
+            message_type, payload, compress=compress, compressor=compressor
+        )
+        
+        if compressor is not None:
+            compressor.open_window()
+        Protocol._send_frames(sock, message_type, data, buffers)
+        if compressor is not None:
+            compressor.record_written(len(data) + sum(len(buffer) for buffer in buffers))
+            if not backlog:
+                compressor.close_window()
+    
+    @staticmethod
+    def send_buffer_size(sock: socket.socket) -> int:
+        """Size of a socket's send buffer, or 0 if unknown."""
+        try:
+            return sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+        except (OSError, AttributeError):
+            return 0
+    
+    @staticmethod
+    def _send_frames(sock: socket.socket, message_type: str, data: bytes, buffers: list):
+        """Write a serialized frame and its out-of-band buffers."""
+        Protocol._send_buffers(sock, Protocol.frame_buffers(message_type, data, buffers))
+    
+    @staticmethod
+    def frame_buffers(message_type: str, data: bytes, buffers: list) -> list:
+        """
+        Lay out a serialized frame for writing.
+        
+        Large in-band messages are split into a CHUNK_START frame, raw chunk
+        frames and a CHUNK_END frame. The pieces are views of data, not copies.
+        
+        Returns: List of bytes-like objects to write in order
         """
-        data = Protocol.serialize_message(message_type, payload, compress=compress)
+        if buffers:
+            return [data] + buffers
         
         # If message is small enough, send directly
         if len(data) <= MAX_CHUNK_SIZE:
-            sock.sendall(data)
-            return
+            return [data]
         
         # For large messages, send in chunks
         total_size = len(data)
         num_chunks = (total_size + MAX_CHUNK_SIZE - 1) // MAX_CHUNK_SIZE
         
         # Send chunk metadata first
-        metadata = Protocol.serialize_message(MessageType.CHUNK_START, {
+        pieces = [Protocol.serialize_message(MessageType.CHUNK_START, {
             "original_type": message_type,
             "total_size": total_size,
             "num_chunks": num_chunks
-        }, compress=False)
-        sock.sendall(metadata)
+        }, compress=False)]
         
-        # Send data chunks
+        # Send data chunks as raw frames so the receiver can read them in place
+        view = memoryview(data)
         offset = 0
-        chunk_num = 0
         while offset < total_size:
             chunk_size = min(MAX_CHUNK_SIZE, total_size - offset)
-            chunk_data = data[offset:offset + chunk_size]
-            
-            chunk_msg = Protocol.serialize_message(MessageType.CHUNK_DATA, {
-                "chunk_num": chunk_num,
-                "data": chunk_data
-            }, compress=False)  # Already compressed if needed
-            
-            sock.sendall(chunk_msg)
-            
+            pieces.append(HEADER.pack(chunk_size, FLAG_RAW))
+            pieces.append(view[offset:offset + chunk_size])
             offset += chunk_size
-            chunk_num += 1
         
         # Send end marker
-        end_msg = Protocol.serialize_message(MessageType.CHUNK_END, {
+        pieces.append(Protocol.serialize_message(MessageType.CHUNK_END, {
             "original_type": message_type
-        }, compress=False)
-        sock.sendall(end_msg)
+        }, compress=False))
+        return pieces
+    
+    @staticmethod
+    def _send_buffers(sock: socket.socket, buffers: list):
+        """Send several buffers without joining them, using sendmsg() where available."""
+        if not hasattr(sock, "sendmsg"):
+            for buffer in buffers:
+                sock.sendall(buffer)
+            return
+        
+        pending = deque(memoryview(buffer).cast('B') for buffer in buffers)
+        while pending:
+            sent = sock.sendmsg([pending[i] for i in range(min(len(pending), MAX_IOVECS))])
+            # Drop fully sent buffers and trim a partially sent one
+            while sent and pending:
+                if sent >= pending[0].nbytes:
+                    sent -= pending.popleft().nbytes
+                else:
+                    pending[0] = pending[0][sent:]
+                    sent = 0
+            while pending and not pending[0].nbytes:
+                pending.popleft()
     
     @staticmethod
     def receive_message(sock: socket.socket, timeout: float = None) -> tuple:
@@ -152,31 +612,31 @@ class Protocol:
         Receive a message from a socket.
         Handles chunked messages automatically.
         
+        The timeout only applies while waiting for a message to start; once a
+        frame header has arrived the rest of the frame is always read fully.
+        
         Returns: (message_type, payload)
         """
         if timeout:
             sock.settimeout(timeout)
         
-        # Read the message length (4 bytes)
-        length_data = Protocol._recv_exact(sock, 4)
-        if not length_data:
+        header = Protocol._recv_header(sock)
+        if header is None:
             return None, None
+        length, flags = header
         
-        length = struct.unpack('!I', length_data)[0]
-        
-        # Read the flags byte
-        flags_data = Protocol._recv_exact(sock, 1)
-        if not flags_data:
+        # Read the message data into a single preallocated buffer
+        message_data = bytearray(length)
+        if not Protocol._recv_into(sock, memoryview(message_data)):
             return None, None
         
-        flags = struct.unpack('B', flags_data)[0]
-        
-        # Read the message data
-        message_data = Protocol._recv_exact(sock, length)
-        if not message_data:
-            return None, None
+        buffers = None
+        if flags & FLAG_OUT_OF_BAND:
+            buffers = Protocol._receive_buffers(sock, message_data)
+            if buffers is None:
+                return None, None
         
-        msg_type, payload = Protocol.deserialize_message(message_data, flags)
+        msg_type, payload = Protocol.deserialize_message(memoryview(message_data), flags, buffers)
         
         # If this is a chunked message, receive all chunks
         if msg_type == MessageType.CHUNK_START:
@@ -185,21 +645,80 @@ class Protocol:
         return msg_type, payload
     
     @staticmethod
-    def _recv_exact(sock: socket.socket, num_bytes: int) -> bytes:
-        """Receive exactly num_bytes from socket."""
-        data = b''
-        while len(data) < num_bytes:
-            chunk = sock.recv(num_bytes - len(data))
-            if not chunk:
+    def _receive_buffers(sock: socket.socket, message_data: bytearray) -> Optional[list]:
+        """
+        Receive the out-of-band buffers announced in a frame's buffer table.
+        
+        Each buffer is read into its own bytearray, which the unpickler then
+        uses directly as the backing memory of the rebuilt object.
+        
+        Returns: List of buffers, or None if the connection closed
+        """
+        count = BUFFER_COUNT.unpack_from(message_data)[0]
+        
+        buffers = []
+        for i in range(count):
+            size, codec = BUFFER_ENTRY.unpack_from(message_data, BUFFER_COUNT.size + i * BUFFER_ENTRY.size)
+            buffer = bytearray(size)
+            if not Protocol._recv_into(sock, memoryview(buffer)):
                 return None
-            data += chunk
-        return data
+            if codec:
+                # Compressed buffers need one extra copy to stay writable
+                buffer = bytearray(decompress(buffer, codec - 1))
+            buffers.append(buffer)
+        return buffers
+    
+    @staticmethod
+    def _recv_header(sock: socket.socket, wait: bool = True) -> Optional[tuple]:
+        """
+        Receive a frame header.
+        
+        Args:
+            sock: Socket to receive from
+            wait: If True, a socket timeout before the first byte is raised to the caller
+        
+        Returns: (length, flags), or None if the connection closed
+        """
+        header = bytearray(HEADER.size)
+        if not Protocol._recv_into(sock, memoryview(header), wait=wait):
+            return None
+        return HEADER.unpack(header)
+    
+    @staticmethod
+    def _recv_into(sock: socket.socket, view: memoryview, wait: bool = False) -> bool:
+        """
+        Fill a buffer from the socket without intermediate copies.
+        
+        Args:
+            sock: Socket to receive from
+            view: Writable memoryview to fill completely
+            wait: If True, a socket timeout before any data arrives is raised;
+                  otherwise timeouts are retried so a frame is never cut in half
+        
+        Returns: True if the buffer was filled, False if the connection closed
+        """
+        total = len(view)
+        offset = 0
+        while offset < total:
+            try:
+                received = sock.recv_into(view[offset:])
+            except socket.timeout:
+                if wait and offset == 0:
+                    raise
+                continue
+            if not received:
+                return False
+            offset += received
+        return True
     
     @staticmethod
     def _receive_chunked_message(sock: socket.socket, chunk_start_payload: dict) -> tuple:
         """
         Receive a chunked message.
         
+        Raw chunk frames are read straight into one buffer of the announced
+        total size, which is then deserialized in place.
+        
         Args:
             sock: Socket to receive from
             chunk_start_payload: Payload from CHUNK_START message
@@ -210,56 +729,159 @@ class Protocol:
         total_size = chunk_start_payload["total_size"]
         num_chunks = chunk_start_payload["num_chunks"]
         
-        # Receive all chunks
-        chunks = [None] * num_chunks
+        full_data = bytearray(total_size)
+        view = memoryview(full_data)
+        offset = 0
         
         for _ in range(num_chunks):
-            # Read chunk message
-            length_data = Protocol._recv_exact(sock, 4)
-            if not length_data:
+            header = Protocol._recv_header(sock, wait=False)
+            if header is None:
                 raise ConnectionError("Connection lost during chunked transfer")
             
-            length = struct.unpack('!I', length_data)[0]
+            length, flags = header
+            if not flags & FLAG_RAW:
+                raise ValueError("Expected raw chunk frame")
+            if offset + length > total_size:
+                raise ValueError("Chunked transfer exceeds announced size")
             
-            flags_data = Protocol._recv_exact(sock, 1)
-            if not flags_data:
+            if not Protocol._recv_into(sock, view[offset:offset + length]):
                 raise ConnectionError("Connection lost during chunked transfer")
+            offset += length
+        
+        # Read end marker
+        header = Protocol._recv_header(sock, wait=False)
+        if header is None:
+            raise ConnectionError("Connection lost during chunked transfer")
+        length, flags = header
+        end_data = bytearray(length)
+        if not Protocol._recv_into(sock, memoryview(end_data)):
+            raise ConnectionError("Connection lost during chunked transfer")
+        msg_type, _ = Protocol.deserialize_message(memoryview(end_data), flags)
+        if msg_type != MessageType.CHUNK_END:
+            raise ValueError(f"Expected CHUNK_END, got {msg_type}")
+        
+        # The reassembled buffer is itself a framed message
+        length, flags = HEADER.unpack_from(full_data)
+        _, payload = Protocol.deserialize_message(view[HEADER.size:HEADER.size + length], flags)
+        
+        return original_type, payload
+
+
+class FrameDecoder:
+    """
+    Incremental decoder for non-blocking sockets.
+    
+    Reassembles the same frames receive_message() reads, including compact,
+    out-of-band and chunked messages, from whatever bytes the socket has
+    available. Small frames are parsed out of one shared read buffer; the
+    remainder of a large body or buffer is received straight into its final
+    bytearray.
+    """
+    
+    # Size of the read buffer; larger pending reads go directly into their target
+    READ_SIZE = 256 * 1024
+    # Maximum recv() calls per receive(), so one busy peer cannot starve the others
+    MAX_READS = 16
+    
+    def __init__(self):
+        self._scratch = bytearray(self.READ_SIZE)
+        self._messages = []
+        self._parser = self._parse()
+        self._set_target(next(self._parser))
+    
+    def receive(self, sock: socket.socket) -> list:
+        """
+        Read what is available from a non-blocking socket.
+        
+        Returns: List of complete (message_type, payload) tuples, possibly empty
+        
+        Raises:
+            ConnectionError: If the peer closed the connection
+        """
+        for _ in range(self.MAX_READS):
+            remaining = len(self._view) - self._filled
+            try:
+                if remaining >= self.READ_SIZE:
+                    received = sock.recv_into(self._view[self._filled:])
+                else:
+                    received = sock.recv_into(self._scratch)
+            except (BlockingIOError, InterruptedError):
+                break
+            if not received:
+                raise ConnectionError("Connection closed by peer")
             
-            flags = struct.unpack('B', flags_data)[0]
+            if remaining >= self.READ_SIZE:
+                self._filled += received
+                self._complete_targets()
+            else:
+                self._consume(memoryview(self._scratch)[:received])
+        
+        messages, self._messages = self._messages, []
+        return messages
+    
+    def _consume(self, data: memoryview):
+        """Copy read-buffer data into successive targets; the parser always wants more."""
+        offset = 0
+        while offset < len(data):
+            count = min(len(data) - offset, len(self._view) - self._filled)
+            self._view[self._filled:self._filled + count] = data[offset:offset + count]
+            self._filled += count
+            offset += count
+            self._complete_targets()
+    
+    def _complete_targets(self):
+        while self._filled == len(self._view):
+            self._set_target(self._parser.send(self._target))
+    
+    def _set_target(self, request):
+        """Start filling a new bytearray of the requested size, or a given memoryview."""
+        self._target = bytearray(request) if isinstance(request, int) else request
+        self._view = memoryview(self._target)
+        self._filled = 0
+    
+    def _parse(self):
+        """Generator that yields what to fill next and receives it once filled."""
+        while True:
+            length, flags = HEADER.unpack((yield HEADER.size))
+            message_data = yield length
             
-            message_data = Protocol._recv_exact(sock, length)
-            if not message_data:
-                raise ConnectionError("Connection lost during chunked transfer")
+            buffers = None
+            if flags & FLAG_OUT_OF_BAND:
+                count = BUFFER_COUNT.unpack_from(message_data)[0]
+                buffers = []
+                for i in range(count):
+                    size, codec = BUFFER_ENTRY.unpack_from(
+                        message_data, BUFFER_COUNT.size + i * BUFFER_ENTRY.size
+                    )
+                    buffer = yield size
+                    if codec:
+                        buffer = bytearray(decompress(buffer, codec - 1))
+                    buffers.append(buffer)
             
-            msg_type, chunk_payload = Protocol.deserialize_message(message_data, flags)
+            msg_type, payload = Protocol.deserialize_message(memoryview(message_data), flags, buffers)
             
-            if msg_type != MessageType.CHUNK_DATA:
-                raise ValueError(f"Expected CHUNK_DATA, got {msg_type}")
+            if msg_type == MessageType.CHUNK_START:
+                original_type = payload["original_type"]
+                full_data = bytearray(payload["total_size"])
+                view = memoryview(full_data)
+                offset = 0
+                for _ in range(payload["num_chunks"]):
+                    length, flags = HEADER.unpack((yield HEADER.size))
+                    if not flags & FLAG_RAW:
+                        raise ValueError("Expected raw chunk frame")
+                    if offset + length > len(full_data):
+                        raise ValueError("Chunked transfer exceeds announced size")
+                    yield view[offset:offset + length]
+                    offset += length
+                
+                length, flags = HEADER.unpack((yield HEADER.size))
+                end_type, _ = Protocol.deserialize_message(memoryview((yield length)), flags)
+                if end_type != MessageType.CHUNK_END:
+                    raise ValueError(f"Expected CHUNK_END, got {end_type}")
+                
+                # The reassembled buffer is itself a framed message
+                length, flags = HEADER.unpack_from(full_data)
+                _, payload = Protocol.deserialize_message(view[HEADER.size:HEADER.size + length], flags)
+                msg_type = original_type
             
-            chunk_num = chunk_payload["chunk_num"]
-            chunks[chunk_num] = chunk_payload["data"]
-        
-        # Read end marker
-        length_data = Protocol._recv_exact(sock, 4)
-        if length_data:
-            length = struct.unpack('!I', length_data)[0]
-            flags_data = Protocol._recv_exact(sock, 1)
-            if flags_data:
-                flags = struct.unpack('B', flags_data)[0]
-                message_data = Protocol._recv_exact(sock, length)
-                if message_data:
-                    msg_type, end_payload = Protocol.deserialize_message(message_data, flags)
-                    if msg_type != MessageType.CHUNK_END:
-                        raise ValueError(f"Expected CHUNK_END, got {msg_type}")
-        
-        # Reconstruct full message
-        full_data = b''.join(chunks)
-        
-        # Extract flags from first 5 bytes of reconstructed data
-        length = struct.unpack('!I', full_data[:4])[0]
-        flags = struct.unpack('B', full_data[4:5])[0]
-        
-        # Deserialize the full message
-        _, payload = Protocol.deserialize_message(full_data[5:5+length], flags)
-        
-        return original_type, payload
+            self._messages.append((msg_type, payload))
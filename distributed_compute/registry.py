@@ -0,0 +1,158 @@
+"""
+Function registry for shipping task functions once per worker instead of once per task.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Set
+
+import cloudpickle
+
+from .objects import collecting_refs
+
+
+def hash_function_blob(blob: bytes) -> str:
+    """Return the content hash used to identify a serialized function."""
+    return hashlib.sha256(blob).hexdigest()
+
+
+class FunctionRegistry:
+    """
+    Coordinator-side registry of serialized task functions.
+
+    Each function is cloudpickled once and stored under the hash of its bytes.
+    Registrations are reference counted so that concurrent jobs sharing the
+    same function keep the blob alive until the last one releases it.
+    """
+
+    def __init__(self):
+        self._blobs = {}  # func_hash -> serialized function
+        self._refcounts = {}  # func_hash -> number of active registrations
+        self._refs = {}  # func_hash -> hashes of the shared objects the function references
+        self._lock = threading.Lock()
+
+    def register(self, func: Callable) -> str:
+        """
+        Serialize a function and register it.
+
+        Args:
+            func: The function to register
+
+        Returns:
+            The content hash identifying the function
+        """
+        with collecting_refs() as refs:
+            blob = cloudpickle.dumps(func)
+        func_hash = hash_function_blob(blob)
+
+        with self._lock:
+            if func_hash not in self._blobs:
+                self._blobs[func_hash] = blob
+                self._refs[func_hash] = frozenset(refs)
+            self._refcounts[func_hash] = self._refcounts.get(func_hash, 0) + 1
+
+        return func_hash
+
+    def release(self, func_hash: str):
+        """Drop one registration, discarding the blob once unused."""
+        with self._lock:
+            count = self._refcounts.get(func_hash, 0) - 1
+            if count <= 0:
+                self._refcounts.pop(func_hash, None)
+                self._blobs.pop(func_hash, None)
+                self._refs.pop(func_hash, None)
+            else:
+                self._refcounts[func_hash] = count
+
+    def get(self, func_hash: str) -> Optional[bytes]:
+        """Get the serialized function for a hash, or None if unknown."""
+        with self._lock:
+            return self._blobs.get(func_hash)
+
+    def get_refs(self, func_hash: str) -> Set[str]:
+        """Get the hashes of the ObjectRefs captured by a registered function."""
+        with self._lock:
+            return self._refs.get(func_hash, frozenset())
+
+    def __contains__(self, func_hash: str) -> bool:
+        with self._lock:
+            return func_hash in self._blobs
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._blobs)
+
+
+class FunctionCache:
+    """
+    Worker-side bounded LRU cache of deserialized task functions.
+
+    The cache outlives individual jobs, so repeated map() calls with the
+    same function never pay for deserialization twice.
+    """
+
+    def __init__(self, max_size: int = 128):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of functions to keep
+        """
+        self.max_size = max_size
+        self._functions = OrderedDict()  # func_hash -> (callable, serialized blob)
+        self._lock = threading.Lock()
+
+    def add(self, func_hash: str, blob: bytes) -> Callable:
+        """
+        Deserialize a function blob and cache it.
+
+        Args:
+            func_hash: Content hash of the blob
+            blob: Serialized function
+
+        Returns:
+            The deserialized function
+        """
+        with self._lock:
+            if func_hash in self._functions:
+                self._functions.move_to_end(func_hash)
+                return self._functions[func_hash][0]
+
+        func = cloudpickle.loads(blob)
+
+        with self._lock:
+            self._functions[func_hash] = (func, blob)
+            self._functions.move_to_end(func_hash)
+            while len(self._functions) > self.max_size:
+                self._functions.popitem(last=False)
+
+        return func
+
+    def get(self, func_hash: str) -> Optional[Any]:
+        """Get a cached function, or None if it is not (or no longer) cached."""
+        with self._lock:
+            entry = self._functions.get(func_hash)
+            if entry is None:
+                return None
+            self._functions.move_to_end(func_hash)
+            return entry[0]
+
+    def get_blob(self, func_hash: str) -> Optional[bytes]:
+        """Get the serialized form of a cached function, or None if not cached."""
+        with self._lock:
+            entry = self._functions.get(func_hash)
+            return entry[1] if entry else None
+
+    def discard(self, func_hash: str):
+        """Remove a function from the cache, if present."""
+        with self._lock:
+            self._functions.pop(func_hash, None)
+
+    def __contains__(self, func_hash: str) -> bool:
+        with self._lock:
+            return func_hash in self._functions
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._functions)
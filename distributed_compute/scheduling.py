@@ -0,0 +1,170 @@
+"""
+Indexes used by the coordinator to pick tasks and the workers that run them.
+"""
+
+import heapq
+import itertools
+
+
+class _LazyHeap:
+    """
+    Min-heap of keyed items with lazy deletion.
+
+    push() adds a fresh entry for a key, superseding the key's previous one,
+    and discard() forgets the key. Superseded entries stay in the heap and
+    are skipped when they surface, so both cost O(log n). Ties go to the
+    entry pushed first.
+    """
+
+    def __init__(self):
+        self._heap = []  # (priority, sequence, key, item)
+        self._entries = {}  # key -> sequence of the key's live entry
+        self._sequence = itertools.count()
+
+    def push(self, key, priority, item):
+        sequence = next(self._sequence)
+        self._entries[key] = sequence
+        heapq.heappush(self._heap, (priority, sequence, key, item))
+        self._compact()
+
+    def discard(self, key):
+        self._entries.pop(key, None)
+        self._compact()
+
+    def pop(self):
+        """Remove and return the item of the live entry with the lowest priority, or None."""
+        while self._heap:
+            _, sequence, key, item = heapq.heappop(self._heap)
+            if self._entries.get(key) == sequence:
+                del self._entries[key]
+                return item
+        return None
+
+    def _compact(self):
+        # Drop stale entries once they outnumber live ones
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [entry for entry in self._heap if self._entries.get(entry[2]) == entry[1]]
+            heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class WorkerIndex:
+    """
+    Priority index of the workers that can take another task, least loaded first.
+
+    Load is current_tasks / max_tasks, the same ordering the scheduler has
+    always used. The index is a _LazyHeap: update() pushes a fresh entry
+    whenever a worker's load changes and older entries are skipped when
+    they surface. Picking a worker therefore costs O(log W) instead of
+    re-sorting every worker for every assignment. Ties go to the worker
+    whose entry was pushed first.
+
+    Not thread-safe; the coordinator calls it with its lock held.
+    """
+
+    def __init__(self):
+        self._heap = _LazyHeap()  # Workers by load
+
+    def update(self, worker):
+        """Re-index a worker after its load, capacity or liveness changed."""
+        if worker.is_alive and self._has_room(worker):
+            self._heap.push(worker.worker_id, self._load(worker), worker)
+        else:
+            self._heap.discard(worker.worker_id)
+
+    def pop(self):
+        """Remove and return the least loaded worker with a free slot, or None."""
+        return self._heap.pop()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def _has_room(self, worker) -> bool:
+        return worker.current_tasks < worker.capacity
+
+    def _load(self, worker) -> float:
+        return worker.current_tasks / worker.max_tasks
+
+
+class AsyncWorkerIndex(WorkerIndex):
+    """
+    WorkerIndex over the workers' async slots, used for jobs of coroutine functions.
+
+    Async tasks run on a worker's event loop rather than its execution slots,
+    so they have their own, much larger, per-worker limit.
+    """
+
+    def _has_room(self, worker) -> bool:
+        return worker.async_tasks < worker.async_slots
+
+    def _load(self, worker) -> float:
+        return worker.async_tasks / worker.async_slots
+
+
+class JobQueue:
+    """
+    Queued tasks of every active job, handed out by weighted fair share.
+
+    Each job keeps its own FIFO of tasks. pop() takes the next task of the
+    job with the fewest active tasks (assigned and not finished) relative to
+    its weight, so concurrent jobs split the worker slots in proportion to
+    their weights whatever their size or task duration. Jobs are kept in a
+    _LazyHeap like the workers of a WorkerIndex.
+
+    Not thread-safe; the coordinator calls it with its lock held.
+    """
+
+    def __init__(self):
+        self._heap = _LazyHeap()  # Jobs with queued tasks by active / weight
+        self._size = 0
+
+    def push(self, job, task):
+        """Queue a new task at the back of its job's queue."""
+        job.queue.append(task)
+        self._size += 1
+        self._update(job)
+
+    def requeue(self, job, task):
+        """Put an assigned task back at the front of its job's queue."""
+        job.active -= 1
+        job.queue.appendleft(task)
+        self._size += 1
+        self._update(job)
+
+    def assigned(self, job):
+        """Record a copy of a task assigned without pop(), such as a speculative backup."""
+        job.active += 1
+        self._update(job)
+
+    def done(self, job):
+        """Record that one of the job's assigned tasks finished."""
+        job.active -= 1
+        self._update(job)
+
+    def pop(self):
+        """Remove and return the next task by fair share, or None if nothing is queued."""
+        job = self._heap.pop()
+        if job is None:
+            return None
+        task = job.queue.popleft()
+        self._size -= 1
+        job.active += 1
+        self._update(job)
+        return task
+
+    def remove(self, job):
+        """Drop every queued task of a job."""
+        self._size -= len(job.queue)
+        job.queue.clear()
+        self._heap.discard(job.job_id)
+
+    def _update(self, job):
+        if job.queue:
+            self._heap.push(job.job_id, job.active / job.weight, job)
+        else:
+            self._heap.discard(job.job_id)
+
+    def __len__(self) -> int:
+        return self._size
@@ -0,0 +1,297 @@
+"""
+Single-threaded network engine for the coordinator built on selectors.
+"""
+
+import logging
+import queue
+import selectors
+import socket
+import threading
+from collections import deque
+from .protocol import Protocol, MessageType, FrameDecoder, MAX_IOVECS
+
+logger = logging.getLogger(__name__)
+
+
+class _Connection:
+    """State of one client connection on the event loop."""
+
+    def __init__(self, sock: socket.socket, address: tuple):
+        self.sock = sock
+        self.address = address
+        self.decoder = FrameDecoder()
+        self.worker = None  # WorkerInfo once registered
+        self.pending = deque()  # memoryviews waiting to be written
+        self.closing = False  # Close once pending is written
+        self.events = selectors.EVENT_READ
+
+
+class SelectorEngine:
+    """
+    Runs every worker connection on one event loop thread.
+
+    Sockets are non-blocking: incoming bytes are fed to a FrameDecoder per
+    connection, and messages queued in a worker's outbox are serialized and
+    written as the socket accepts them. There are no per-connection threads,
+    so a coordinator can serve thousands of workers. Message handling,
+    registration and the scheduler are shared with the threaded engine.
+    """
+
+    def __init__(self, coordinator):
+        self.coordinator = coordinator
+        self._selector = selectors.DefaultSelector()
+        self._connections = {}  # socket -> _Connection
+        self._by_worker = {}  # worker_id -> _Connection
+        self._ready = deque()  # Workers with newly queued messages
+        self._wake_pending = False
+        self._stopping = False
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+
+    def run(self, server_socket: socket.socket):
+        """Serve connections until the coordinator stops."""
+        server_socket.setblocking(False)
+        self._selector.register(server_socket, selectors.EVENT_READ, "accept")
+        self._selector.register(self._wake_reader, selectors.EVENT_READ, "wake")
+
+        while not self._stopping:
+            for key, mask in self._selector.select(timeout=1.0):
+                if key.data == "accept":
+                    self._accept(server_socket)
+                elif key.data == "wake":
+                    self._handle_wake()
+                else:
+                    connection = key.data
+                    if mask & selectors.EVENT_READ:
+                        self._read(connection)
+                    if mask & selectors.EVENT_WRITE and connection.sock in self._connections:
+                        self._flush(connection)
+
+        # Write out what stop_server() queued, such as SHUTDOWN messages
+        self._handle_wake()
+        for connection in list(self._connections.values()):
+            self._close(connection)
+        self._selector.close()
+        self._wake_reader.close()
+        self._wake_writer.close()
+
+    def stop(self):
+        """Stop the loop after writing what is queued, such as SHUTDOWN messages."""
+        self._stopping = True
+        self.wake()
+
+    def wake(self):
+        """Interrupt select() from another thread."""
+        if self._wake_pending:
+            return
+        self._wake_pending = True
+        try:
+            self._wake_writer.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def _on_queued(self, worker):
+        """Outbox hook: hand newly queued messages to the loop."""
+        self._ready.append(worker)
+        self.wake()
+
+    def _handle_wake(self):
+        try:
+            while self._wake_reader.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+        # Clear the flag only after draining, so a wake() from now on sends a new byte
+        self._wake_pending = False
+
+        while self._ready:
+            worker = self._ready.popleft()
+            connection = self._by_worker.get(worker.worker_id)
+            if connection is not None:
+                self._drain_outbox(connection)
+
+    def _accept(self, server_socket: socket.socket):
+        while True:
+            try:
+                client_socket, address = server_socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                if self.coordinator._running:
+                    logger.error(f"Error accepting connection: {e}")
+                return
+
+            # Increase socket buffer sizes for large transfers (2MB)
+            try:
+                client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 2 * 1024 * 1024)
+                client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 2 * 1024 * 1024)
+            except OSError:
+                pass  # Continue with system defaults
+
+            # Enable TCP keepalive and disable Nagle's algorithm
+            try:
+                client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError:
+                pass
+
+            client_socket.setblocking(False)
+            connection = _Connection(client_socket, address)
+            self._connections[client_socket] = connection
+            self._selector.register(client_socket, connection.events, connection)
+            logger.debug(f"New connection from {address}")
+
+    def _read(self, connection: _Connection):
+        try:
+            messages = connection.decoder.receive(connection.sock)
+        except Exception as e:
+            if connection.worker is not None:
+                logger.warning(f"Worker {connection.worker.name} closed the connection: {e}")
+            self._close(connection)
+            return
+
+        for msg_type, payload in messages:
+            if connection.worker is None:
+                if connection.closing:
+                    return  # Rejected; the reply is still being written
+                if not self._handle_first_message(connection, msg_type, payload):
+                    return
+                continue
+
+            try:
+                keep_open = self.coordinator._handle_worker_message(connection.worker, msg_type, payload)
+            except Exception as e:
+                logger.error(f"Error handling worker: {e}")
+                keep_open = False
+            if not keep_open:
+                self._close(connection)
+                return
+
+    def _handle_first_message(self, connection: _Connection, msg_type: str, payload: dict) -> bool:
+        """Register a worker, or hand a client job to its own thread. Returns False if not registered."""
+        if msg_type == MessageType.SUBMIT_JOB:
+            # map() blocks until the job is done, so run the job off the loop
+            self._detach(connection)
+            connection.sock.setblocking(True)
+            threading.Thread(
+                target=self.coordinator._handle_client_job,
+                args=(connection.sock, payload),
+                daemon=True
+            ).start()
+            return False
+
+        if msg_type != MessageType.REGISTER_WORKER:
+            logger.error("Expected registration message")
+            self._close(connection)
+            return False
+
+        worker = self.coordinator._register_worker(
+            connection.sock, connection.address, payload, on_queued=self._on_queued,
+            on_rejected=lambda msg_type, reply: self._reject(connection, msg_type, reply)
+        )
+        if worker is None:
+            return False
+
+        connection.worker = worker
+        self._by_worker[worker.worker_id] = connection
+        self._drain_outbox(connection)
+        return True
+
+    def _reject(self, connection: _Connection, msg_type: str, payload: dict):
+        """Write a last message to an unregistered connection, then close it."""
+        data, buffers = Protocol.serialize_frames(msg_type, payload)
+        for buffer in Protocol.frame_buffers(msg_type, data, buffers):
+            connection.pending.append(memoryview(buffer).cast('B'))
+        connection.closing = True
+        self._flush(connection)
+
+    def _drain_outbox(self, connection: _Connection):
+        """Serialize the worker's queued messages and start writing them."""
+        worker = connection.worker
+        while not connection.closing:
+            try:
+                item = worker.outbox.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                connection.closing = True
+                break
+
+            msg_type, payload, compress = item
+            try:
+                data, buffers = Protocol.serialize_frames(
+                    msg_type, payload, compress=compress, compressor=worker.compressor
+                )
+            except Exception as e:
+                logger.error(f"Failed to serialize message for worker {worker.name}: {e}")
+                self._close(connection)
+                return
+            for buffer in Protocol.frame_buffers(msg_type, data, buffers):
+                connection.pending.append(memoryview(buffer).cast('B'))
+
+        self._flush(connection)
+
+    def _flush(self, connection: _Connection):
+        """
+        Write as much pending data as the socket takes without blocking.
+        
+        The worker's compressor measures the link over each stretch of time
+        that data is pending, from the first write until the backlog clears.
+        """
+        pending = connection.pending
+        compressor = connection.worker.compressor if connection.worker is not None else None
+        if pending and compressor is not None:
+            compressor.open_window()
+        try:
+            while pending:
+                sent = connection.sock.sendmsg([pending[i] for i in range(min(len(pending), MAX_IOVECS))])
+                if compressor is not None:
+                    compressor.record_written(sent)
+                while sent and pending:
+                    if sent >= pending[0].nbytes:
+                        sent -= pending.popleft().nbytes
+                    else:
+                        pending[0] = pending[0][sent:]
+                        sent = 0
+                while pending and not pending[0].nbytes:
+                    pending.popleft()
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError as e:
+            if connection.worker is not None:
+                logger.error(f"Failed to send to worker {connection.worker.name}: {e}")
+            self._close(connection)
+            return
+
+        if not pending and compressor is not None:
+            compressor.close_window()
+        
+        if not pending and connection.closing:
+            self._close(connection)
+            return
+
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if pending else 0)
+        if events != connection.events:
+            connection.events = events
+            self._selector.modify(connection.sock, events, connection)
+
+    def _detach(self, connection: _Connection):
+        """Stop watching a connection without closing its socket."""
+        self._connections.pop(connection.sock, None)
+        try:
+            self._selector.unregister(connection.sock)
+        except (KeyError, ValueError):
+            pass
+
+    def _close(self, connection: _Connection):
+        self._detach(connection)
+        try:
+            connection.sock.close()
+        except OSError:
+            pass
+        worker = connection.worker
+        if worker is not None:
+            self._by_worker.pop(worker.worker_id, None)
+            connection.worker = None
+            self.coordinator._worker_disconnected(worker)
@@ -2,10 +2,11 @@
 Task representation and management.
 """
 
+import asyncio
 import uuid
 import time
 from enum import Enum
-from typing import Any, Callable
+from typing import Any, Callable, NamedTuple, Optional
 
 
 class TaskStatus(Enum):
@@ -17,6 +18,16 @@ class TaskStatus(Enum):
     FAILED = "failed"
 
 
+class TaskRecord(NamedTuple):
+    """Compact summary of a finished task, kept after the task itself is released."""
+    task_id: str
+    job_id: Optional[str]
+    worker_id: Optional[str]
+    status: TaskStatus
+    error: Optional[str]
+    completed_at: Optional[float]
+
+
 class Task:
     """Represents a computational task to be executed."""
     
@@ -31,6 +42,7 @@ class Task:
             task_id: Optional task ID (generated if not provided)
         """
         self.task_id = task_id or str(uuid.uuid4())
+        self.job_id = None  # Set when the task belongs to a coordinator job
         self.func = func
         self.args = args or ()
         self.kwargs = kwargs or {}
@@ -38,16 +50,27 @@ class Task:
         self.result = None
         self.error = None
         self.worker_id = None
+        self.holders = set()  # Workers holding a copy of the task (two with a speculative backup)
+        self.speculated = False  # A speculative backup copy has been assigned
+        self.assigned_at = None  # When the coordinator last assigned the task
         self.created_at = time.time()
         self.started_at = None
         self.completed_at = None
         self.retry_count = 0
         self.max_retries = 0
+        self.func_hash = None  # Set when the function is shipped through the registry
+        self.batch = False  # When True, args is ([items],) and func is applied to each item
+        self.is_async = False  # func is a coroutine function, run on a worker's event loop
+        self.compression = None  # Per-job compression override for task and result messages
     
     def execute(self) -> Any:
         """
         Execute the task and return the result.
         
+        For batch tasks the result is a list with one (ok, value) pair per item,
+        where value is the item's result or its error message. A failing item
+        does not stop the rest of the batch.
+        
         Returns:
             The result of the function execution
         
@@ -58,7 +81,37 @@ class Task:
         self.started_at = time.time()
         
         try:
-            self.result = self.func(*self.args, **self.kwargs)
+            if self.batch:
+                self.result = self._execute_batch()
+            else:
+                self.result = self.func(*self.args, **self.kwargs)
+            self.status = TaskStatus.COMPLETED
+            self.completed_at = time.time()
+            return self.result
+        except Exception as e:
+            self.status = TaskStatus.FAILED
+            self.error = str(e)
+            self.completed_at = time.time()
+            raise
+    
+    async def execute_async(self) -> Any:
+        """
+        Await the task's coroutine function and return the result.
+        
+        The async counterpart of execute(); the items of a batch task are
+        awaited concurrently.
+        
+        Raises:
+            Exception: Any exception raised during function execution
+        """
+        self.status = TaskStatus.RUNNING
+        self.started_at = time.time()
+        
+        try:
+            if self.batch:
+                self.result = await self._execute_batch_async()
+            else:
+                self.result = await self.func(*self.args, **self.kwargs)
             self.status = TaskStatus.COMPLETED
             self.completed_at = time.time()
             return self.result
@@ -68,16 +121,52 @@ class Task:
             self.completed_at = time.time()
             raise
     
+    def _execute_batch(self) -> list:
+        """Apply the function to every item of a batch, capturing per-item errors."""
+        outcomes = []
+        for item in self.args[0]:
+            try:
+                outcomes.append((True, self.func(item, **self.kwargs)))
+            except Exception as e:
+                outcomes.append((False, str(e)))
+        return outcomes
+    
+    async def _execute_batch_async(self) -> list:
+        """Await the function on every item of a batch at once, capturing per-item errors."""
+        values = await asyncio.gather(
+            *(self.func(item, **self.kwargs) for item in self.args[0]), return_exceptions=True
+        )
+        return [(False, str(value)) if isinstance(value, BaseException) else (True, value) for value in values]
+    
     def to_dict(self) -> dict:
-        """Convert task to dictionary for serialization."""
-        return {
+        """
+        Convert task to dictionary for serialization.
+        
+        Registered functions are referenced by hash only; the worker resolves
+        the hash against the functions it has already received.
+        """
+        data = {
             "task_id": self.task_id,
-            "func": self.func,
             "args": self.args,
             "kwargs": self.kwargs,
             "status": self.status.value,
             "retry_count": self.retry_count,
         }
+        if self.batch:
+            data["batch"] = True
+        if self.compression:
+            data["compression"] = self.compression
+        if self.func_hash:
+            data["func_hash"] = self.func_hash
+        else:
+            data["func"] = self.func
+        return data
+    
+    def to_record(self) -> TaskRecord:
+        """Summarize the task without its function, arguments or result."""
+        return TaskRecord(
+            self.task_id, self.job_id, self.worker_id, self.status, self.error, self.completed_at
+        )
     
     def get_execution_time(self) -> float:
         """Get task execution time in seconds."""
@@ -90,4 +179,4 @@ class Task:
         return self.retry_count < self.max_retries
     
     def __repr__(self):
-        return f"Task(id={self.task_id[:8]}, status={self.status.value}, func={self.func.__name__})"
+        return f"Task(id={self.task_id}, status={self.status.value}, func={self.func.__name__})"
@@ -2,6 +2,7 @@
 Worker node implementation.
 """
 
+import inspect
 import socket
 import threading
 import time
@@ -10,13 +11,21 @@ import psutil
 from typing import Optional
 
 from .protocol import Protocol, MessageType
-from .task import Task, TaskStatus
 from .exceptions import WorkerConnectionError
+from .registry import FunctionCache
+from .objects import ObjectCache, find_refs, resolve_refs, resolving
+from .executors import AsyncExecutor, create_executor
+from .compression import AdaptiveCompressor, available_codecs
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Maximum number of results coalesced into one RESULT_BATCH frame
+MAX_RESULTS_PER_BATCH = 256
+# Seconds between samples of the worker's CPU and memory usage
+RESOURCE_SAMPLE_INTERVAL = 1.0
+
 
 class Worker:
     """
@@ -27,10 +36,18 @@ class Worker:
         self,
         coordinator_host: str,
         coordinator_port: int,
-        max_concurrent_tasks: int = 2,
+        max_concurrent_tasks: Optional[int] = None,
         name: Optional[str] = None,
         heartbeat_interval: float = 5.0,
         password: Optional[str] = None,
+        function_cache_size: int = 128,
+        executor: str = "thread",
+        result_batch_delay: float = 0.002,
+        prefetch_depth: Optional[int] = None,
+        object_cache_size: int = 1024 * 1024 * 1024,
+        max_tasks_per_child: Optional[int] = None,
+        max_child_memory: Optional[int] = None,
+        async_concurrency: int = 1000,
     ):
         """
         Initialize a worker node.
@@ -39,16 +56,43 @@ class Worker:
             coordinator_host: IP address or hostname of the coordinator
             coordinator_port: Port number of the coordinator
             max_concurrent_tasks: Maximum number of tasks to run concurrently
+                                  (default: 2 threads, or one process per CPU)
             name: Optional name for this worker
-            heartbeat_interval: Seconds between heartbeat messages
+            heartbeat_interval: Seconds between reports of changed worker state, and the
+                                longest the worker stays silent before sending a heartbeat
             password: Optional password for coordinator authentication
+            function_cache_size: Maximum number of deserialized task functions to keep cached
+            executor: Execution backend: "inline", "thread" (default) or "process".
+                      Use "process" for CPU-bound pure-Python work to use every core.
+            result_batch_delay: Maximum seconds a finished result waits, while other tasks
+                                are running or queued, so that results finishing close
+                                together share one frame (0 disables)
+            prefetch_depth: Extra tasks to keep queued locally so a slot starts its next
+                            task without waiting for the coordinator (default: one per slot)
+            object_cache_size: Maximum bytes of shared objects from Coordinator.scatter()
+                               to keep cached (default: 1GB)
+            max_tasks_per_child: With the "process" executor, replace a child process
+                                 after it has run this many tasks (default: never)
+            max_child_memory: With the "process" executor, replace a child process once
+                              its resident memory exceeds this many bytes (default: never)
+            async_concurrency: Maximum number of ``async def`` tasks to run at once; they
+                               run on one event loop thread, whatever the executor
         """
         self.coordinator_host = coordinator_host
         self.coordinator_port = coordinator_port
-        self.max_concurrent_tasks = max_concurrent_tasks
+        options = {}
+        if max_tasks_per_child is not None or max_child_memory is not None:
+            options = {"max_tasks_per_child": max_tasks_per_child, "max_child_memory": max_child_memory}
+        self.executor = create_executor(executor, max_concurrent_tasks, **options)
+        self.async_executor = AsyncExecutor(async_concurrency)
+        self.max_concurrent_tasks = self.executor.max_workers
+        self.prefetch_depth = self.max_concurrent_tasks if prefetch_depth is None else prefetch_depth
+        # Tasks accepted at once, running or in the executor's local run queue
+        self.run_queue_size = self.max_concurrent_tasks + self.prefetch_depth
         self.name = name or f"worker-{socket.gethostname()}"
         self.heartbeat_interval = heartbeat_interval
         self.password = password
+        self.result_batch_delay = result_batch_delay
         
         self.worker_id = None
         self.socket = None
@@ -56,10 +100,25 @@ class Worker:
         self.current_tasks = 0
         self.tasks_completed = 0
         self.tasks_failed = 0
+        self.cpu_percent = 0.0  # Latest background sample, in whole percent
+        self.memory_available = 0  # Latest background sample, in whole MiB
+        self.function_cache = FunctionCache(max_size=function_cache_size)
+        self.object_cache = ObjectCache(max_bytes=object_cache_size, on_evict=self.executor.discard_object)
+        self.compressor = None  # Created once codecs are negotiated at registration
+        self._function_errors = {}  # func_hash -> deserialization error message
+        self._function_missing_objects = {}  # func_hash -> objects missing when it was loaded
+        self._futures = {}  # task_id -> Future of each submitted task until it finishes
+        self._async_tasks = set()  # Ids of the submitted tasks running on the event loop
         
         self._lock = threading.Lock()
         self._threads = []
         self._send_lock = threading.Lock()  # Lock for sending messages
+        self._last_sent = time.monotonic()  # When the coordinator last heard from this worker
+        self._report_lock = threading.Lock()
+        self._reported = {}  # Heartbeat fields as last reported to the coordinator
+        self._last_report = 0.0  # monotonic time of the last report of changed fields
+        self._results = []  # (message_type, payload, compression) waiting to be flushed
+        self._results_ready = threading.Condition()
     
     def start(self, block: bool = False):
         """Start the worker and connect to the coordinator.
@@ -89,6 +148,12 @@ class Worker:
             heartbeat_thread.start()
             self._threads.append(heartbeat_thread)
             
+            # Start result flushing thread
+            if self.result_batch_delay > 0:
+                flush_thread = threading.Thread(target=self._flush_results, daemon=True)
+                flush_thread.start()
+                self._threads.append(flush_thread)
+            
             if block:
                 listen_thread.join()
             
@@ -105,8 +170,14 @@ class Worker:
         logger.info(f"Stopping worker '{self.name}'...")
         self.running = False
         
+        with self._results_ready:
+            pending, self._results = self._results, []
+            self._results_ready.notify_all()
+        
         if self.socket:
             try:
+                if pending:
+                    self._send_results(pending)
                 Protocol.send_message(self.socket, MessageType.SHUTDOWN, {
                     "worker_id": self.worker_id
                 })
@@ -114,6 +185,9 @@ class Worker:
             except:
                 pass
         
+        self.executor.shutdown()
+        self.async_executor.shutdown()
+        
         logger.info(f"Worker stopped. Completed: {self.tasks_completed}, Failed: {self.tasks_failed}")
     
     def _connect_to_coordinator(self):
@@ -155,9 +229,12 @@ class Worker:
         payload = {
             "name": self.name,
             "max_concurrent_tasks": self.max_concurrent_tasks,
+            "prefetch_depth": self.prefetch_depth,
+            "async_concurrency": self.async_executor.max_workers,
             "cpu_count": cpu_count,
             "memory_total": memory.total,
             "memory_available": memory.available,
+            "codecs": available_codecs(),
         }
         
         # Add password if provided
@@ -171,6 +248,9 @@ class Worker:
         
         if msg_type == MessageType.WORKER_REGISTERED:
             self.worker_id = payload["worker_id"]
+            self.compressor = AdaptiveCompressor(
+                payload.get("codecs", ["zlib"]), send_buffer=Protocol.send_buffer_size(self.socket)
+            )
             logger.info(f"Registered with coordinator. Worker ID: {self.worker_id}")
         elif msg_type == MessageType.AUTH_FAILED:
             reason = payload.get("reason", "Authentication failed")
@@ -179,25 +259,29 @@ class Worker:
             raise WorkerConnectionError("Failed to register with coordinator")
     
     def _send_heartbeats(self):
-        """Send periodic heartbeat messages to the coordinator."""
+        """
+        Sample resource usage in the background and report state changes to the coordinator.
+        
+        Resources are sampled every RESOURCE_SAMPLE_INTERVAL seconds without
+        blocking. Any frame tells the coordinator that the worker is alive, so
+        a heartbeat is only sent after heartbeat_interval seconds of silence,
+        and carries only the fields that changed since the last report. While
+        results are flowing, they carry the reports instead (see _send_results()).
+        """
+        psutil.cpu_percent(interval=None)  # Start measuring; the first reading is meaningless
         while self.running:
             try:
-                cpu_percent = psutil.cpu_percent(interval=1)
-                memory = psutil.virtual_memory()
-                
-                payload = {
-                    "worker_id": self.worker_id,
-                    "current_tasks": self.current_tasks,
-                    "tasks_completed": self.tasks_completed,
-                    "tasks_failed": self.tasks_failed,
-                    "cpu_percent": cpu_percent,
-                    "memory_available": memory.available,
-                }
-                
-                with self._send_lock:
-                    Protocol.send_message(self.socket, MessageType.HEARTBEAT, payload)
+                time.sleep(min(self.heartbeat_interval, RESOURCE_SAMPLE_INTERVAL))
+                if not self.running:
+                    break
+                self.cpu_percent = float(round(psutil.cpu_percent(interval=None)))
+                # Whole MiB, so that small fluctuations are not reported
+                self.memory_available = psutil.virtual_memory().available >> 20 << 20
                 
-                time.sleep(self.heartbeat_interval)
+                if time.monotonic() - self._last_sent < self.heartbeat_interval:
+                    continue  # Recent frames showed liveness; result frames carry the reports
+                changes = self._take_changes() or {}
+                self._send(MessageType.HEARTBEAT, dict(changes, worker_id=self.worker_id))
             except Exception as e:
                 logger.error(f"Heartbeat error: {e}")
                 if self.running:
@@ -213,17 +297,28 @@ class Worker:
                 msg_type, payload = Protocol.receive_message(self.socket, timeout=1.0)
                 
                 if msg_type is None:
-                    continue
+                    # Coordinator closed the connection
+                    if self.running:
+                        logger.error("Connection to coordinator lost")
+                        self.stop()
+                    break
+                
+                if msg_type == MessageType.REGISTER_FUNCTION:
+                    # Deserialize here so assignments that follow on this socket find it
+                    self._register_function(payload)
                 
-                if msg_type == MessageType.TASK_ASSIGNMENT:
-                    # Execute task in a separate thread
-                    task_thread = threading.Thread(
-                        target=self._execute_task,
-                        args=(payload,),
-                        daemon=True
-                    )
-                    task_thread.start()
-                    self._threads.append(task_thread)
+                elif msg_type == MessageType.PUT_OBJECT:
+                    self._put_object(payload)
+                
+                elif msg_type == MessageType.TASK_ASSIGNMENT:
+                    self._submit_task(payload)
+                
+                elif msg_type == MessageType.TASK_BATCH:
+                    for task_data in payload["tasks"]:
+                        self._submit_task(task_data)
+                
+                elif msg_type == MessageType.TASK_REVOKE:
+                    self._revoke_tasks(payload["task_ids"])
                 
                 elif msg_type == MessageType.SHUTDOWN:
                     logger.info("Received shutdown command from coordinator")
@@ -238,59 +333,345 @@ class Worker:
                     self.stop()
                 break
     
-    def _execute_task(self, task_data: dict):
-        """Execute a task and send the result back to the coordinator."""
-        task = Task(
-            func=task_data["func"],
-            args=task_data["args"],
-            kwargs=task_data["kwargs"],
-            task_id=task_data["task_id"]
-        )
+    def _register_function(self, payload: dict):
+        """Deserialize a function shipped by the coordinator into the cache."""
+        func_hash = payload["func_hash"]
+        try:
+            with resolving(self.object_cache) as missing:
+                self.function_cache.add(func_hash, payload["func_blob"])
+            self._function_errors.pop(func_hash, None)
+            if missing:
+                # A shared object it captures was evicted; have both shipped again
+                self.function_cache.discard(func_hash)
+                self._function_missing_objects[func_hash] = missing
+        except Exception as e:
+            logger.error(f"Failed to load function {func_hash[:8]}: {e}")
+            self._function_errors[func_hash] = f"Failed to load function: {e}"
+    
+    def _put_object(self, payload: dict):
+        """Deserialize a shared object shipped by the coordinator into the cache."""
+        object_hash = payload["object_hash"]
+        try:
+            self.object_cache.add(object_hash, payload["blob"])
+            self.executor.add_object(object_hash, payload["blob"])
+        except Exception as e:
+            # Tasks that need it report it missing and fail once it cannot be shipped
+            logger.error(f"Failed to load object {object_hash[:8]}: {e}")
+    
+    def _resolve_function(self, task_data: dict):
+        """
+        Get the callable for a task.
+        
+        Returns None if the task references a function that has been evicted
+        from the cache; the coordinator must then ship it again.
+        """
+        if "func_hash" not in task_data:
+            return task_data["func"]
+        
+        func_hash = task_data["func_hash"]
+        func = self.function_cache.get(func_hash)
+        if func is None and func_hash in self._function_errors:
+            raise RuntimeError(self._function_errors[func_hash])
+        return func
+    
+    def _submit_task(self, task_data: dict):
+        """Hand a task to the execution backend; the result is sent when it finishes."""
+        task_id = task_data["task_id"]
+        try:
+            func = self._resolve_function(task_data)
+        except Exception as e:
+            self._send_task_error(task_id, e)
+            return
+        
+        if func is None:
+            logger.debug(f"Function {task_data['func_hash'][:8]} not cached, requesting it again")
+            try:
+                self._send(MessageType.FUNCTION_MISSING, {
+                    "task_id": task_id,
+                    "func_hash": task_data["func_hash"],
+                    "object_hashes": list(
+                        self._function_missing_objects.pop(task_data["func_hash"], ())
+                    ),
+                    "worker_id": self.worker_id,
+                })
+            except:
+                pass
+            return
+        
+        # Coroutine functions run on the event loop instead of the executor's slots
+        is_async = inspect.iscoroutinefunction(func)
+        executor = self.async_executor if is_async else self.executor
+        
+        refs = find_refs(task_data["args"]) | find_refs(task_data["kwargs"])
+        missing = [object_hash for object_hash in refs if object_hash not in self.object_cache]
+        if missing:
+            self._send_object_missing(task_id, missing)
+            return
+        # Replace ObjectRefs in the arguments with the cached objects now, so they
+        # cannot be evicted before the task runs. Process children resolve their own
+        # from spill files, which the executor keeps until the task is done.
+        if refs and executor.in_process:
+            task_data["args"] = resolve_refs(task_data["args"], self.object_cache)
+            task_data["kwargs"] = resolve_refs(task_data["kwargs"], self.object_cache)
         
         with self._lock:
-            self.current_tasks += 1
+            if is_async:
+                accepted = len(self._async_tasks) < self.async_executor.max_workers
+            else:
+                accepted = self.current_tasks - len(self._async_tasks) < self.run_queue_size
+            if accepted:
+                self.current_tasks += 1
+                if is_async:
+                    self._async_tasks.add(task_id)
+        if not accepted:
+            # More than the advertised capacity; let the coordinator run it elsewhere
+            logger.warning(f"Run queue full, giving back task {task_id}")
+            self._send_revoked([task_id], [task_id])
+            return
+        
+        logger.info(f"Executing task {task_id}...")
         
-        logger.info(f"Executing task {task.task_id[:8]}...")
+        func_blob = None
+        if "func_hash" in task_data:
+            func_blob = self.function_cache.get_blob(task_data["func_hash"])
         
         try:
-            result = task.execute()
-            
-            # Send result back to coordinator
-            payload = {
-                "task_id": task.task_id,
-                "result": result,
+            future = executor.submit(func, task_data, func_blob)
+        except Exception as e:
+            with self._lock:
+                self.current_tasks -= 1
+                self._async_tasks.discard(task_id)
+            self._send_task_error(task_id, e)
+            return
+        
+        with self._lock:
+            self._futures[task_id] = future
+        
+        compression = task_data.get("compression")
+        future.add_done_callback(lambda f: self._on_task_done(task_id, f, compression))
+    
+    def _revoke_tasks(self, task_ids: list):
+        """
+        Give back tasks the coordinator wants to run elsewhere.
+        
+        Only tasks that have not started can be cancelled. The reply lists
+        them, so the coordinator requeues exactly those and no task runs twice.
+        """
+        revoked = []
+        for task_id in task_ids:
+            with self._lock:
+                future = self._futures.get(task_id)
+            if future is not None and future.cancel():
+                revoked.append(task_id)
+        
+        if revoked:
+            logger.info(f"Gave back {len(revoked)} queued task(s) to the coordinator")
+        self._send_revoked(task_ids, revoked)
+    
+    def _send_revoked(self, task_ids: list, revoked: list):
+        """Tell the coordinator which of the given tasks it can requeue."""
+        try:
+            self._send(MessageType.TASKS_REVOKED, {
+                "task_ids": task_ids,
+                "revoked": revoked,
                 "worker_id": self.worker_id,
-                "execution_time": task.get_execution_time(),
+            })
+        except:
+            pass
+    
+    def _send(self, message_type: str, payload: dict, **kwargs):
+        """Send a message to the coordinator; every frame also tells it the worker is alive."""
+        with self._send_lock:
+            Protocol.send_message(self.socket, message_type, payload, **kwargs)
+            self._last_sent = time.monotonic()
+    
+    def _take_changes(self) -> Optional[dict]:
+        """
+        Return the heartbeat fields that changed since they were last reported.
+        
+        Returns None if nothing changed or the last report is less than
+        heartbeat_interval seconds old. The returned fields count as reported.
+        """
+        with self._report_lock:
+            now = time.monotonic()
+            if now - self._last_report < self.heartbeat_interval:
+                return None
+            running, queued = self._slot_usage()
+            fields = {
+                "current_tasks": self.current_tasks,
+                "running_tasks": running,
+                "queued_tasks": queued,
+                "async_tasks": len(self._async_tasks),
+                "tasks_completed": self.tasks_completed,
+                "tasks_failed": self.tasks_failed,
+                "cpu_percent": self.cpu_percent,
+                "memory_available": self.memory_available,
             }
+            changes = {key: value for key, value in fields.items() if self._reported.get(key) != value}
+            if not changes:
+                return None
+            self._reported.update(changes)
+            self._last_report = now
+            return changes
+    
+    def _slot_usage(self) -> tuple:
+        """Return (running, queued): busy execution slots and tasks waiting in the run queue."""
+        with self._lock:
+            futures = [future for task_id, future in self._futures.items() if task_id not in self._async_tasks]
+        running = sum(1 for future in futures if future.running())
+        return running, len(futures) - running
+    
+    def _send_object_missing(self, task_id: str, object_hashes: list):
+        """Ask the coordinator to ship evicted objects again and requeue the task."""
+        logger.debug(f"Task {task_id} needs {len(object_hashes)} uncached object(s)")
+        try:
+            self._send(MessageType.OBJECT_MISSING, {
+                "task_id": task_id,
+                "object_hashes": object_hashes,
+                "worker_id": self.worker_id,
+            })
+        except:
+            pass
+    
+    def _on_task_done(self, task_id: str, future, compression: Optional[str] = None):
+        """Queue a finished task's result or error for the coordinator."""
+        with self._lock:
+            self._futures.pop(task_id, None)
+            self._async_tasks.discard(task_id)
+            if future.cancelled():
+                # Revoked before it started; the coordinator runs it elsewhere
+                self.current_tasks -= 1
+                return
+        
+        try:
+            ok, value, execution_time = future.result()
+        except Exception as e:
+            # The backend itself failed, e.g. an unpicklable result from a child process
+            ok, value, execution_time = False, str(e), 0.0
+        
+        with self._lock:
+            self.current_tasks -= 1
+        
+        if not ok:
+            self._send_task_error(task_id, value)
+            return
+        
+        self._queue_result(MessageType.TASK_RESULT, {
+            "task_id": task_id,
+            "result": value,
+            "worker_id": self.worker_id,
+            "execution_time": execution_time,
+        }, compression)
+        
+        with self._lock:
+            self.tasks_completed += 1
+        
+        logger.info(f"Task {task_id} completed in {execution_time:.2f}s")
+    
+    def _send_task_error(self, task_id: str, error):
+        """Report a failed task back to the coordinator."""
+        logger.error(f"Task {task_id} failed: {error}")
+        
+        self._queue_result(MessageType.TASK_ERROR, {
+            "task_id": task_id,
+            "error": str(error),
+            "worker_id": self.worker_id,
+        })
+        
+        with self._lock:
+            self.tasks_failed += 1
+    
+    def _queue_result(self, message_type: str, payload: dict, compression: Optional[str] = None):
+        """
+        Send a result, or hold it briefly so it can share a frame with others.
+        
+        Results are only held while other local tasks are running or queued;
+        the last outstanding result goes out at once with any held ones.
+        """
+        if self.result_batch_delay <= 0:
+            self._send_results([(message_type, payload, compression)])
+            return
+        
+        with self._results_ready:
+            self._results.append((message_type, payload, compression))
+            if self.current_tasks > 0 and len(self._results) < MAX_RESULTS_PER_BATCH:
+                if len(self._results) == 1:
+                    self._results_ready.notify()
+                return
+            # Nothing else is running or queued, so no result could join the frame
+            results, self._results = self._results, []
+        self._send_results(results)
+    
+    def _flush_results(self):
+        """
+        Send queued results.
+        
+        The first queued result starts a flush window of result_batch_delay
+        seconds. Everything that finishes within the window goes out together;
+        the window closes early once no local task is left to finish.
+        """
+        while self.running:
+            with self._results_ready:
+                while self.running and not self._results:
+                    self._results_ready.wait(timeout=1.0)
+                
+                deadline = time.monotonic() + self.result_batch_delay
+                while self.running and self.current_tasks > 0 and len(self._results) < MAX_RESULTS_PER_BATCH:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._results_ready.wait(timeout=remaining)
+                
+                results, self._results = self._results, []
             
-            # Use send lock to prevent concurrent sends
-            with self._send_lock:
-                Protocol.send_message(self.socket, MessageType.TASK_RESULT, payload)
-            
-            with self._lock:
-                self.tasks_completed += 1
+            if results:
+                self._send_results(results)
+    
+    def _send_results(self, results: list):
+        """
+        Send results as individual messages or one RESULT_BATCH frame.
+        
+        When a heartbeat report is due, it rides along in a RESULT_BATCH, so
+        busy workers send no separate heartbeats. A lone result is sent on
+        its own to keep its compact encoding, followed by a due report as a
+        compact heartbeat.
+        """
+        changes = None
+        try:
+            if len(results) == 1:
+                message_type, payload, compression = results[0]
+                self._send(message_type, payload, compress=compression, compressor=self.compressor)
+                changes = self._take_changes()
+                if changes:
+                    self._send(MessageType.HEARTBEAT, dict(changes, worker_id=self.worker_id))
+                return
             
-            logger.info(f"Task {task.task_id[:8]} completed in {task.get_execution_time():.2f}s")
+            changes = self._take_changes()
+            # Jobs may override compression; a mixed batch falls back to adaptive choice
+            compression = results[0][2]
+            if any(result[2] != compression for result in results):
+                compression = None
             
+            batch = {"results": [(message_type, payload) for message_type, payload, _ in results]}
+            if changes:
+                batch["heartbeat"] = changes
+            self._send(MessageType.RESULT_BATCH, batch, compress=compression, compressor=self.compressor)
+        except (OSError, ConnectionError) as e:
+            logger.error(f"Failed to send results: {e}")
         except Exception as e:
-            logger.error(f"Task {task.task_id[:8]} failed: {e}")
-            
-            # Send error back to coordinator
-            payload = {
-                "task_id": task.task_id,
-                "error": str(e),
-                "worker_id": self.worker_id,
-            }
-            
-            try:
-                with self._send_lock:
-                    Protocol.send_message(self.socket, MessageType.TASK_ERROR, payload)
-            except:
-                pass
+            # A result could not be serialized; send the others and report that one as failed
+            if len(results) > 1:
+                for result in results:
+                    self._send_results([result])
+                if changes:
+                    self._send(MessageType.HEARTBEAT, dict(changes, worker_id=self.worker_id))
+                return
             
-            with self._lock:
-                self.tasks_failed += 1
-        
-        finally:
-            with self._lock:
-                self.current_tasks -= 1
+            message_type, payload, _ = results[0]
+            if message_type == MessageType.TASK_RESULT:
+                logger.error(f"Task {payload['task_id']} result could not be sent: {e}")
+                self._send_results([(MessageType.TASK_ERROR, {
+                    "task_id": payload["task_id"],
+                    "error": f"Result could not be sent: {e}",
+                    "worker_id": self.worker_id,
+                }, None)])
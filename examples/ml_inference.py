@@ -9,14 +9,13 @@ import random
 from distributed_compute import Coordinator, Worker
 
 
-def simulate_ml_inference(data_batch):
+def simulate_ml_inference(job):
     """
     Simulate ML model inference on a batch of data.
     
-    In a real scenario, this would load a model and run inference.
+    In a real scenario, the weights would come from a trained model.
     """
-    # Simulate loading model (cached after first call)
-    time.sleep(0.5)
+    weights, data_batch = job
     
     # Simulate inference time
     batch_size = len(data_batch)
@@ -24,7 +23,8 @@ def simulate_ml_inference(data_batch):
     time.sleep(inference_time)
     
     # Return mock predictions
-    predictions = [random.choice(['cat', 'dog', 'bird']) for _ in data_batch]
+    labels = weights["labels"]
+    predictions = [random.choice(labels) for _ in data_batch]
     return predictions
 
 
@@ -48,12 +48,20 @@ def main_coordinator():
     data_batches = [[f"image_{i*batch_size + j}" for j in range(batch_size)] 
                     for i in range(num_batches)]
     
+    # Ship the (large) model weights to each worker once instead of with every batch
+    weights = coordinator.broadcast({
+        "labels": ['cat', 'dog', 'bird'],
+        "layers": [bytes(1024 * 1024) for _ in range(8)],  # Stand-in for 8MB of weights
+    })
+    
     print(f"Processing {num_batches} batches ({num_batches * batch_size} items total)...\n")
     
     start_time = time.time()
     
     # Distribute inference across workers
-    results = coordinator.map(simulate_ml_inference, data_batches, timeout=300)
+    results = coordinator.map(
+        simulate_ml_inference, [(weights, batch) for batch in data_batches], timeout=300
+    )
     
     elapsed = time.time() - start_time
     
@@ -0,0 +1,70 @@
+"""Tests for the worker execution backends."""
+
+import os
+
+import cloudpickle
+import pytest
+
+from distributed_compute.executors import create_executor
+from distributed_compute.objects import ObjectCache, ObjectRef, hash_object_blob
+
+
+def caller_defined_types():
+    """A class and task function as a worker sees them: rebuilt by value by cloudpickle."""
+    class Point:
+        def __init__(self, x, y):
+            self.x = x
+            self.y = y
+
+    def double(point):
+        return Point(point.x * 2, point.y * 2)
+
+    return cloudpickle.loads(cloudpickle.dumps((Point, double)))
+
+
+@pytest.mark.parametrize("kind", ["inline", "thread", "process"])
+def test_caller_defined_class_round_trips(kind):
+    Point, double = caller_defined_types()
+    executor = create_executor(kind, 1)
+    try:
+        task_data = {"task_id": "task-0@job-0", "args": (Point(1, 2),), "kwargs": {}}
+        ok, result, _ = executor.submit(double, task_data).result(timeout=30)
+        assert ok, result
+        assert (type(result).__name__, result.x, result.y) == ("Point", 2, 4)
+    finally:
+        executor.shutdown()
+
+
+def test_process_batch_of_caller_defined_class():
+    Point, double = caller_defined_types()
+    executor = create_executor("process", 1)
+    try:
+        task_data = {"task_id": "task-0@job-0", "args": ([Point(1, 1), Point(2, 3)],), "kwargs": {}, "batch": True}
+        ok, outcomes, _ = executor.submit(double, task_data).result(timeout=30)
+        assert ok, outcomes
+        assert [(value.x, value.y) for _, value in outcomes] == [(2, 2), (4, 6)]
+    finally:
+        executor.shutdown()
+
+
+def test_process_spill_files_follow_the_worker_cache():
+    executor = create_executor("process", 1)
+    spill_dir = executor._spill_dir
+    cache = ObjectCache(max_bytes=100, on_evict=executor.discard_object)
+    hashes = []
+    try:
+        for value in (b"a" * 60, b"b" * 60, b"c" * 60):
+            blob = cloudpickle.dumps(value)
+            hashes.append(hash_object_blob(blob))
+            cache.add(hashes[-1], blob)
+            executor.add_object(hashes[-1], blob)
+            if len(hashes) == 1:
+                # A queued task keeps the file of an evicted object until it is done
+                task_data = {"task_id": "task-0@job-0", "args": (ObjectRef(hashes[0], 60),), "kwargs": {}}
+                future = executor.submit(len, task_data)
+        ok, value, _ = future.result(timeout=30)
+        assert ok and value == 60
+        assert os.listdir(spill_dir) == [hashes[-1]]
+    finally:
+        executor.shutdown()
+    assert not os.path.exists(spill_dir)
@@ -0,0 +1,189 @@
+"""Round-trip tests for the wire format: every frame kind through both receive paths."""
+
+import os
+import socket
+import threading
+
+import pytest
+
+from distributed_compute import protocol
+from distributed_compute.compression import AdaptiveCompressor
+from distributed_compute.protocol import (
+    FLAG_COMPACT,
+    FLAG_COMPRESSED,
+    FLAG_OUT_OF_BAND,
+    HEADER,
+    FrameDecoder,
+    MessageType,
+    Protocol,
+)
+
+
+class TrickleSocket:
+    """A socket stand-in that hands out a byte stream one byte per recv_into() call."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def recv_into(self, view):
+        if self.offset == len(self.data):
+            raise BlockingIOError
+        view[0] = self.data[self.offset]
+        self.offset += 1
+        return 1
+
+    def settimeout(self, timeout):
+        pass
+
+
+def encode(message_type, payload, compress=None, compressor=None) -> bytes:
+    """Serialize a message into exactly the bytes written to the socket."""
+    data, buffers = Protocol.serialize_frames(message_type, payload, compress=compress, compressor=compressor)
+    return b"".join(bytes(piece) for piece in Protocol.frame_buffers(message_type, data, buffers))
+
+
+def first_flags(stream: bytes) -> int:
+    return HEADER.unpack_from(stream)[1]
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """Chunk messages above 1KB, so that chunked frames stay cheap to trickle."""
+    monkeypatch.setattr(protocol, "MAX_CHUNK_SIZE", 1024)
+
+
+BLOB = os.urandom(protocol.OUT_OF_BAND_THRESHOLD)
+# Compresses to about half, so a compressed frame of it is still chunked above 1KB
+HEX_TEXT = os.urandom(4096).hex()
+
+MESSAGES = {
+    "compact-heartbeat": (MessageType.HEARTBEAT, {"worker_id": "w-1", "cpu_percent": 12.0, "running_tasks": 3}),
+    "compact-result": (MessageType.TASK_RESULT, {
+        "task_id": "task-1", "result": "done", "worker_id": "w-1", "execution_time": 0.25,
+    }),
+    "compact-error": (MessageType.TASK_ERROR, {"task_id": "task-1", "error": "boom", "worker_id": "w-1"}),
+    "pickled": (MessageType.TASK_ASSIGNMENT, {"task_id": "task-1", "args": ([1, 2], {"k": None}), "kwargs": {}}),
+    "out-of-band": (MessageType.TASK_ASSIGNMENT, {
+        "task_id": "task-1", "args": (BLOB, bytearray(BLOB)), "kwargs": {},
+    }),
+    "out-of-band-task-batch": (MessageType.TASK_BATCH, {"tasks": [
+        {"task_id": "task-1", "args": (BLOB,), "kwargs": {}},
+        {"task_id": "task-2", "args": (BLOB[::-1],), "kwargs": {}},
+    ]}),
+    "out-of-band-result-batch": (MessageType.RESULT_BATCH, {
+        "results": [(MessageType.TASK_RESULT, {
+            "task_id": "task-1", "result": BLOB, "worker_id": "w-1", "execution_time": 0.25,
+        })],
+        "heartbeat": {"running_tasks": 1},
+    }),
+}
+
+
+class TestFrameKinds:
+    def test_compact_frames(self):
+        for name in ("compact-heartbeat", "compact-result", "compact-error"):
+            assert first_flags(encode(*MESSAGES[name])) & FLAG_COMPACT, name
+
+    def test_out_of_band_frames(self):
+        for name in ("out-of-band", "out-of-band-task-batch", "out-of-band-result-batch"):
+            message_type, payload = MESSAGES[name]
+            frame, buffers = Protocol.serialize_frames(message_type, payload)
+            assert first_flags(frame) & FLAG_OUT_OF_BAND, name
+            assert buffers and len(frame) < len(BLOB), name
+
+    def test_chunked_frames(self, small_chunks):
+        message_type, payload = MESSAGES["pickled"]
+        for compress in ("none", "zlib-9"):
+            stream = encode(message_type, dict(payload, args=(HEX_TEXT,)), compress=compress)
+            length, flags = HEADER.unpack_from(stream)
+            chunk_type, _ = Protocol.deserialize_message(stream[HEADER.size:HEADER.size + length], flags)
+            assert chunk_type == MessageType.CHUNK_START, compress
+
+    def test_compressed_frames(self):
+        stream = encode(MessageType.TASK_ASSIGNMENT, {"args": ("x" * 100000,)}, compress="zlib")
+        assert first_flags(stream) & FLAG_COMPRESSED
+        assert len(stream) < 100000
+
+    def test_compressed_out_of_band_buffers(self):
+        frame, buffers = Protocol.serialize_frames(
+            MessageType.TASK_ASSIGNMENT, {"args": (b"z" * 100000,)}, compressor=AdaptiveCompressor(["zlib"])
+        )
+        size, codec = protocol.BUFFER_ENTRY.unpack_from(frame, HEADER.size + protocol.BUFFER_COUNT.size)
+        assert codec and size == len(buffers[0]) < 100000
+
+    def test_out_of_band_keeps_shared_objects_shared(self):
+        shared = [1, 2]
+        frame, buffers = Protocol.serialize_frames(
+            MessageType.TASK_ASSIGNMENT, {"args": (shared, shared, BLOB, BLOB)}
+        )
+        assert len(buffers) == 1
+        length, flags = HEADER.unpack_from(frame)
+        _, payload = Protocol.deserialize_message(
+            memoryview(frame)[HEADER.size:], flags, [bytearray(buffer) for buffer in buffers]
+        )
+        args = payload["args"]
+        assert args[0] is args[1] and args[2] is args[3] and args[2] == BLOB
+
+
+def round_trip_cases():
+    """(message_type, payload, compress, compressor) for every frame kind."""
+    cases = [(message_type, payload, None, None) for message_type, payload in MESSAGES.values()]
+    cases.append((MessageType.TASK_ASSIGNMENT, {"args": ("y" * 5000,)}, "none", None))  # Chunked
+    cases.append((MessageType.TASK_ASSIGNMENT, {"args": ("x" * 100000,)}, "zlib", None))  # Compressed
+    cases.append((MessageType.TASK_ASSIGNMENT, {"args": (HEX_TEXT,)}, "zlib-9", None))  # Compressed, chunked
+    # Out-of-band buffer compressed on its own by the adaptive compressor
+    cases.append((MessageType.TASK_ASSIGNMENT, {"args": (b"z" * 100000,)}, None, AdaptiveCompressor(["zlib"])))
+    return cases
+
+
+class TestRoundTrip:
+    def test_receive_message(self, small_chunks):
+        for message_type, payload, compress, compressor in round_trip_cases():
+            sock = TrickleSocket(encode(message_type, payload, compress, compressor))
+            assert Protocol.receive_message(sock) == (message_type, payload)
+            assert sock.offset == len(sock.data)
+
+    def test_frame_decoder_one_byte_at_a_time(self, small_chunks):
+        cases = round_trip_cases()
+        sock = TrickleSocket(b"".join(encode(*case) for case in cases))
+        decoder = FrameDecoder()
+        messages = []
+        while sock.offset < len(sock.data):
+            messages.extend(decoder.receive(sock))
+        assert messages == [(message_type, payload) for message_type, payload, _, _ in cases]
+
+    def test_out_of_band_types_survive(self):
+        message_type, payload = MESSAGES["out-of-band"]
+        _, received = Protocol.receive_message(TrickleSocket(encode(message_type, payload)))
+        assert type(received["args"][0]) is bytes and type(received["args"][1]) is bytearray
+
+    def test_large_messages_over_a_socket(self):
+        """Bodies and buffers above FrameDecoder.READ_SIZE are received straight into place."""
+        big = os.urandom(3 * FrameDecoder.READ_SIZE)
+        cases = [
+            (MessageType.TASK_ASSIGNMENT, {"args": (big,)}),
+            (MessageType.TASK_ASSIGNMENT, {"args": (os.urandom(protocol.MAX_CHUNK_SIZE).hex(),)}),  # Chunked
+            (MessageType.HEARTBEAT, {"worker_id": "w-1", "queued_tasks": 2}),
+        ]
+        for receive in ("blocking", "decoder"):
+            sender, receiver = socket.socketpair()
+            try:
+                writer = threading.Thread(target=lambda: [
+                    Protocol.send_message(sender, message_type, payload, compress="none")
+                    for message_type, payload in cases
+                ])
+                writer.start()
+                if receive == "blocking":
+                    messages = [Protocol.receive_message(receiver) for _ in cases]
+                else:
+                    receiver.setblocking(False)
+                    decoder = FrameDecoder()
+                    messages = []
+                    while len(messages) < len(cases):
+                        messages.extend(decoder.receive(receiver))
+                writer.join()
+                assert messages == cases, receive
+            finally:
+                sender.close()
+                receiver.close()